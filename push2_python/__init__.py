@@ -14,12 +14,15 @@ from .pads import Push2Pads, get_individual_pad_action_name
 from .buttons import Push2Buttons, get_individual_button_action_name
 from .encoders import Push2Encoders, get_individual_encoder_action_name
 from .touchstrip import Push2TouchStrip
+from .midi_routing import build_midi_routing_table, get_mido_message_route_data, get_route_index
+from .midi_event_queue import MIDIEventQueue
 from .push2_map import push2_map
 from .constants import is_push_midi_in_port_name, is_push_midi_out_port_name, PUSH2_MAP_FILE_PATH, ACTION_BUTTON_PRESSED, \
     ACTION_BUTTON_RELEASED, ACTION_TOUCHSTRIP_TOUCHED, ACTION_PAD_PRESSED, ACTION_PAD_RELEASED, ACTION_PAD_AFTERTOUCH, \
     ACTION_ENCODER_ROTATED, ACTION_ENCODER_TOUCHED, ACTION_ENCODER_RELEASED, PUSH2_RECONNECT_INTERVAL, ACTION_DISPLAY_CONNECTED, \
     ACTION_DISPLAY_DISCONNECTED, ACTION_MIDI_CONNECTED, ACTION_MIDI_DISCONNECTED, PUSH2_MIDI_ACTIVE_SENSING_MAX_INTERVAL, ACTION_SUSTAIN_PEDAL, \
-    MIDO_CONTROLCHANGE, PUSH2_SYSEX_PREFACE_BYTES, PUSH2_SYSEX_END_BYTES, DEFAULT_COLOR_PALETTE, DEFAULT_RGB_COLOR, DEFAULT_BW_COLOR
+    PUSH2_SYSEX_PREFACE_BYTES, PUSH2_SYSEX_END_BYTES, DEFAULT_COLOR_PALETTE, DEFAULT_RGB_COLOR, DEFAULT_BW_COLOR, \
+    MIDI_ACTIVE_SENSING, MIDI_EVENT_QUEUE_DEFAULT_MAX_SIZE, MIDI_EVENT_QUEUE_DROP_OLDEST
 
 from .simulator.simulator import start_simulator
 
@@ -40,23 +43,30 @@ class Push2(object):
     buttons = None
     encoders = None
     touchstrip = None
+    midi_routing_table = None
+    midi_event_queue = None
     use_user_midi_port = False
+    use_raw_midi_input = False
     last_active_sensing_received = None
     function_call_interval_limit_overwrite = PUSH2_RECONNECT_INTERVAL
     color_palette = DEFAULT_COLOR_PALETTE.copy()
     simulator_controller = None
 
 
-    def __init__(self, use_user_midi_port=False, run_simulator=False, simulator_port=6128, simulator_use_virtual_midi_out=False):
+    def __init__(self, use_user_midi_port=False, run_simulator=False, simulator_port=6128, simulator_use_virtual_midi_out=False,
+                 use_raw_midi_input=False):
         """Initializes object to interface with Ableton's Push2.
         This function will set up USB and MIDI connections with the hardware device.
         By default, MIDI connection will use LIVE MIDI port instead of USER MIDI port.
         USER MIDI port can be configured using the argument 'use_user_midi_port'. Alternatively
         a custom specific MIDI port name for Push can be provided using the argument 'push_midi_port_name'.
+        If 'use_raw_midi_input' is True, incoming MIDI messages are received directly from python-rtmidi as bytes
+        and dispatched without creating mido.Message objects for them (see 'on_raw_midi_message').
         See https://github.com/Ableton/push-interface/blob/master/doc/AbletonPush2MIDIDisplayInterface.asc
         """
 
         self.use_user_midi_port = use_user_midi_port
+        self.use_raw_midi_input = use_raw_midi_input
 
         # Load Push2 map from JSON file provided in Push2's interface doc
         # https://github.com/Ableton/push-interface/blob/master/doc/Push2-map.json
@@ -69,6 +79,10 @@ class Push2(object):
         self.encoders = Push2Encoders(self)
         self.touchstrip = Push2TouchStrip(self)
 
+        # Build MIDI routing table used to dispatch incoming MIDI messages to action handlers. Sections are given
+        # in the order in which they get to handle messages that several of them could handle
+        self.midi_routing_table = build_midi_routing_table([self.pads, self.buttons, self.encoders, self.touchstrip])
+
         # Initialize MIDI IN connection with push
         self.configure_midi(skip_midi_out=True)
         
@@ -117,14 +131,14 @@ class Push2(object):
         self.display.function_call_interval_limit_overwrite = new_interval
 
 
-    def trigger_action(self, *args, **kwargs):
-        action_name = args[0]
-        new_args = [self]
-        if len(args) > 1:
-            new_args += list(args[1:])
-        for action, func in action_handler_registry.items():
-            if action == action_name:
-                func[0](*new_args, **kwargs)  # TODO: why is func a 1-element list?
+    def trigger_action(self, action_name, *args, **kwargs):
+        """Calls all handlers registered for the given action (in the order they were registered) with this Push2
+        object and the given arguments. Handlers are looked up by action name, so the cost of triggering an action does
+        not depend on the number of handlers registered for other actions.
+        """
+        # NOTE: use "get" so that actions without handlers are not added to the registry by the defaultdict
+        for func in action_handler_registry.get(action_name, ()):
+            func(self, *args, **kwargs)
 
 
     @function_call_interval_limit(PUSH2_RECONNECT_INTERVAL)
@@ -183,7 +197,12 @@ class Push2(object):
                 # Disable Active Sense message filtering so we can receive those messages comming from Push and
                 # detect if Push MIDI gets disconnected
                 self.midi_in_port._rt.ignore_types(False, False, False)
-                self.midi_in_port.callback = self.on_midi_message
+                if self.use_raw_midi_input:
+                    # Replace mido's rtmidi callback (which creates a mido.Message for every message) with our own
+                    self.midi_in_port._rt.cancel_callback()
+                    self.midi_in_port._rt.set_callback(self.on_raw_midi_message)
+                else:
+                    self.midi_in_port.callback = self.on_midi_message
             except OSError as e:
                 raise Push2MIDIeviceNotFound
 
@@ -228,31 +247,122 @@ class Push2(object):
         """
         current_time = time.time()
         if (message.type == "active_sensing"):
-            active_sensing_was_none = self.last_active_sensing_received is None
-            self.last_active_sensing_received = current_time
-            if active_sensing_was_none:
-                # Means this is first active_sensing received message (possibly after Push2 restart) and therefore initial MIDI setup (if any) should be done
-                self.pads.reset_current_pads_state()  # Reset stored pads state (if any) to avoid messages not being sent because of state
-                self.trigger_action(ACTION_MIDI_CONNECTED)
-                self.last_action_midi_connection_action_triggered = current_time
+            self.on_active_sensing(current_time)
         else:
-            if self.last_active_sensing_received is not None and current_time - self.last_action_midi_connection_action_triggered > 1:
-                # Right after first "active sensing" message is received (which means MIDI IN conneciton with Push is properly set),
-                # ignore the next 1 second of MIDI in messages as for some reason these include a burst of messages from Push which we 
-                # are not interested in (probably some internal state which Ableton uses but we don't care about?)
-                
-                # Send received message to each "part" so it is processes accordingly
-                for func in [self.pads.on_midi_message, self.buttons.on_midi_message, self.encoders.on_midi_message, self.touchstrip.on_midi_message]:
-                    action_taken = func(message)
-                    if action_taken:
-                        break  # Early return from for loop to avoid running unnecessary checks
+            if self.is_receiving_midi_messages(current_time):
+                # Dispatch received message to the route of the "part" which processes it (if any)
+                self.dispatch_midi_message(message)
+
+        logging.debug('Received MIDI message from Push: %s', message)  # Only formatted if debug logging is enabled
+
+
+    def on_raw_midi_message(self, event, data=None):
+        """Handle incomming MIDI messages from Push when raw MIDI input is used (see 'use_raw_midi_input' in
+        'Push2.__init__'). This is the python-rtmidi callback, 'event' is a tuple with the list of message bytes and
+        the time since the previous message. Messages are dispatched the same way as in 'on_midi_message', but the status
+        and data bytes are used directly, so no mido.Message is created (except for logging when debug logging is
+        enabled, as action handlers never receive mido messages).
+        """
+        message_bytes = event[0]
+        status = message_bytes[0]
+        current_time = time.time()
+        if status == MIDI_ACTIVE_SENSING:
+            self.on_active_sensing(current_time)
+        elif status < 0xF0 and len(message_bytes) > 1:  # Only channel messages can be routed
+            if self.is_receiving_midi_messages(current_time):
+                data1 = message_bytes[1]
+                self.dispatch_midi_route(get_route_index(status >> 4, data1), data1,
+                                         message_bytes[2] if len(message_bytes) > 2 else 0)
+
+        if logging.getLogger().isEnabledFor(logging.DEBUG):
+            try:
+                logging.debug('Received MIDI message from Push: {0}'.format(mido.Message.from_bytes(message_bytes)))
+            except ValueError:
+                logging.debug('Received invalid MIDI message from Push: {0}'.format(message_bytes))
+
+
+    def dispatch_midi_message(self, message):
+        """Dispatches the given mido message with the MIDI routing table (see 'dispatch_midi_route'). This is also
+        used by the simulator to dispatch the messages of its virtual controls.
+        """
+        route_data = get_mido_message_route_data(message)
+        if route_data is not None:
+            status_nibble, data1, data2 = route_data
+            self.dispatch_midi_route(get_route_index(status_nibble, data1), data1, data2)
+
+
+    def dispatch_midi_route(self, route_index, data1, data2):
+        """Calls the route of the MIDI routing table at 'route_index' (if any), or queues it in the MIDI event queue
+        if it is enabled (see 'enable_midi_event_queue').
+        """
+        route = self.midi_routing_table[route_index]
+        if route is not None:
+            midi_event_queue = self.midi_event_queue
+            if midi_event_queue is not None:
+                midi_event_queue.put(route, data1, data2)
+            else:
+                route(self, data1, data2)
+
+
+    def enable_midi_event_queue(self, max_size=MIDI_EVENT_QUEUE_DEFAULT_MAX_SIZE, overflow_policy=MIDI_EVENT_QUEUE_DROP_OLDEST,
+                                use_worker_thread=True):
+        """Queues incoming pad, button, encoder, touchstrip and sustain pedal events instead of calling their action
+        handlers from the MIDI input thread, so slow action handlers do not delay the reception of MIDI messages.
+        The queue holds at most 'max_size' events, and 'overflow_policy' sets what happens when it is full (see
+        'push2_python.midi_event_queue.MIDIEventQueue'). If 'use_worker_thread' is True, action handlers are called from
+        a worker thread, otherwise the app must call 'process_midi_events' periodically (e.g. in its main loop).
+        MIDI connection/disconnection actions are not queued.
+        """
+        self.disable_midi_event_queue()
+        midi_event_queue = MIDIEventQueue(self, max_size=max_size, overflow_policy=overflow_policy)
+        if use_worker_thread:
+            midi_event_queue.start()
+        self.midi_event_queue = midi_event_queue
+
+
+    def disable_midi_event_queue(self):
+        """Stops queueing incoming MIDI events (action handlers are called from the MIDI input thread again). Events
+        which are still queued are discarded.
+        """
+        midi_event_queue = self.midi_event_queue
+        if midi_event_queue is not None:
+            self.midi_event_queue = None
+            midi_event_queue.stop()
+
+
+    def process_midi_events(self, max_events=None, timeout=0):
+        """Calls the action handlers of queued MIDI events in the current thread (see 'MIDIEventQueue.process_events').
+        Returns the number of events processed, or 0 if the MIDI event queue is not enabled.
+        """
+        if self.midi_event_queue is None:
+            return 0
+        return self.midi_event_queue.process_events(max_events=max_events, timeout=timeout)
+
+
+    def get_midi_event_queue_stats(self):
+        """Returns a dictionary with the depth of the MIDI event queue and its counters of queued, handled, dropped and
+        coalesced events (see 'MIDIEventQueue.get_stats'), or None if the MIDI event queue is not enabled.
+        """
+        if self.midi_event_queue is None:
+            return None
+        return self.midi_event_queue.get_stats()
+
+
+    def on_active_sensing(self, current_time):
+        active_sensing_was_none = self.last_active_sensing_received is None
+        self.last_active_sensing_received = current_time
+        if active_sensing_was_none:
+            # Means this is first active_sensing received message (possibly after Push2 restart) and therefore initial MIDI setup (if any) should be done
+            self.pads.reset_current_pads_state()  # Reset stored pads state (if any) to avoid messages not being sent because of state
+            self.trigger_action(ACTION_MIDI_CONNECTED)
+            self.last_action_midi_connection_action_triggered = current_time
 
-                # Also check for some other extra general message types here
-                if message.type == MIDO_CONTROLCHANGE:
-                    if message.control == 64:  # Sustain pedal
-                        self.trigger_action(ACTION_SUSTAIN_PEDAL, message.value >= 64)
 
-        logging.debug('Received MIDI message from Push: {0}'.format(message))
+    def is_receiving_midi_messages(self, current_time):
+        # Right after first "active sensing" message is received (which means MIDI IN conneciton with Push is properly set),
+        # ignore the next 1 second of MIDI in messages as for some reason these include a burst of messages from Push which we 
+        # are not interested in (probably some internal state which Ableton uses but we don't care about?)
+        return self.last_active_sensing_received is not None and current_time - self.last_action_midi_connection_action_triggered > 1
 
 
     def set_color_palette_entry(self, color_idx, color_name, rgb=None, bw=None, allow_overwrite=False):
@@ -426,7 +536,8 @@ def action_handler(action_name, button_name=None, pad_n=None, pad_ij=None, encod
             # name is given, include the encoder name in the action name so that it can be triggered individually
             action = get_individual_encoder_action_name(action_name, encoder_name=encoder_name)
         logging.debug('Registered handler {0} for action {1}'.format(func, action))
-        action_handler_registry[action].append(func)
+        # NOTE: action names are interned so that they can be compared by identity when looked up by trigger_action
+        action_handler_registry[sys.intern(action)].append(func)
         return func
     return wrapper
 
@@ -0,0 +1,385 @@
+"""Benchmarks for the display pipeline and for MIDI event handling which do not need a Push2 device connected.
+
+Run with:
+
+    python -m push2_python.benchmark [--suite display|midi|all] [--n-frames N] [--latency SECONDS] [--error-rate RATE]
+                                     [--threads N] [--json]
+
+For each benchmark, frames (or events) per second, latency percentiles (in milliseconds) and the peak amount of memory
+allocated per frame (as reported by tracemalloc) are reported.
+"""
+import argparse
+import json
+import random
+import time
+import tracemalloc
+import mido
+import numpy
+import usb.core
+from . import Push2, action_handler_registry
+from .display import Push2Display, rgb565_to_bgr565, rgb_to_bgr565
+from .display_transport import AsyncDisplayTransport, FakeTransferBackend
+from .pads import Push2Pads, get_individual_pad_action_name
+from .buttons import Push2Buttons
+from .encoders import Push2Encoders
+from .touchstrip import Push2TouchStrip
+from .push2_map import push2_map
+from .midi_routing import build_midi_routing_table
+from .constants import DISPLAY_LINE_PIXELS, DISPLAY_N_LINES, FRAME_FORMAT_BGR565, FRAME_FORMAT_RGB565, FRAME_FORMAT_RGB, \
+    FRAME_FORMAT_RGB888, FRAME_FORMAT_RGBA8888, FRAME_FORMAT_BGRA8888, FRAME_FORMAT_INDEXED8, FRAME_LAYOUT_COLUMN_MAJOR, \
+    FRAME_LAYOUT_ROW_MAJOR, DISPLAY_REDUCED_RESOLUTION_SCALES, ACTION_PAD_PRESSED, ACTION_PAD_RELEASED, \
+    ACTION_PAD_AFTERTOUCH, ACTION_ENCODER_ROTATED, ACTION_BUTTON_PRESSED, ACTION_BUTTON_RELEASED, \
+    MIDI_EVENT_QUEUE_DROP_OLDEST, MIDI_EVENT_QUEUE_COALESCE, DISPLAY_N_TRANSFERS_IN_FLIGHT
+
+
+class FakeUSBEndpoint(object):
+    """In-memory replacement for the pyusb endpoint used by Push2Display. Every write sleeps 'latency' seconds and
+    fails with usb.core.USBError with probability 'error_rate'. Number of writes and bytes written are recorded, as
+    well as the written data if 'record_data' is True.
+    """
+
+    def __init__(self, latency=0.0, error_rate=0.0, record_data=False, seed=0):
+        self.latency = latency
+        self.error_rate = error_rate
+        self.record_data = record_data
+        self.random = random.Random(seed)
+        self.n_writes = 0
+        self.n_bytes = 0
+        self.n_errors = 0
+        self.data = bytearray()
+
+    def write(self, data, timeout=None):
+        if self.latency > 0:
+            time.sleep(self.latency)
+        if self.error_rate > 0 and self.random.random() < self.error_rate:
+            self.n_errors += 1
+            raise usb.core.USBError('Fake USB error')
+        self.n_writes += 1
+        self.n_bytes += len(data)
+        if self.record_data:
+            self.data += bytes(data)
+        return len(data)
+
+
+class BenchmarkPush(object):
+    """Minimal stand-in for the Push2 object so Push2Display can be used without MIDI or USB devices.
+    """
+    simulator_controller = None
+
+    def __init__(self):
+        self.n_actions_triggered = 0
+
+    def trigger_action(self, *args, **kwargs):
+        self.n_actions_triggered += 1
+
+
+class ConnectedFakeDisplay(Push2Display):
+    """Push2Display which reconnects to a fake endpoint instead of scanning the USB bus after USB errors.
+    """
+
+    def __init__(self, push, endpoint):
+        super().__init__(push)
+        self.fake_endpoint = endpoint
+        self.usb_endpoint = endpoint
+
+    def configure_usb_device(self):
+        self.usb_endpoint = self.fake_endpoint
+
+
+class AsyncFakeDisplay(ConnectedFakeDisplay):
+    """Push2Display which sends frames with AsyncDisplayTransport through the given FakeTransferBackend.
+    """
+
+    def __init__(self, push, backend, n_transfers=DISPLAY_N_TRANSFERS_IN_FLIGHT):
+        super().__init__(push, FakeUSBEndpoint())
+        self.fake_backend = backend
+        self.use_async_transfers = True
+        self.n_transfers_in_flight = n_transfers
+        self.transport = self.make_transport(self.usb_endpoint)
+
+    def make_transport(self, usb_endpoint):
+        return AsyncDisplayTransport(self.fake_backend, n_transfers=self.n_transfers_in_flight)
+
+
+class MIDIBenchmarkPush(Push2):
+    """Push2 object with all sections used to handle MIDI messages, but without MIDI ports, display or threads.
+    """
+
+    def __init__(self):
+        self.push2_map = push2_map
+        self.pads = Push2Pads(self)
+        self.buttons = Push2Buttons(self)
+        self.encoders = Push2Encoders(self)
+        self.touchstrip = Push2TouchStrip(self)
+        self.midi_routing_table = build_midi_routing_table([self.pads, self.buttons, self.encoders, self.touchstrip])
+        # Pretend MIDI connection was set up long ago so messages are not ignored
+        self.last_active_sensing_received = time.time()
+        self.last_action_midi_connection_action_triggered = 0
+
+
+def make_test_midi_messages(n_messages=1000, seed=0):
+    """Returns a list of random pad, polyphonic aftertouch, encoder and button messages.
+    """
+    rng = random.Random(seed)
+    messages = []
+    for _ in range(0, n_messages):
+        message_type = rng.choice(['note_on', 'note_off', 'polytouch', 'polytouch', 'control_change'])
+        if message_type == 'control_change':
+            messages.append(mido.Message(message_type, control=rng.choice([71, 72, 85, 86]), value=rng.randint(0, 127)))
+        elif message_type == 'polytouch':
+            messages.append(mido.Message(message_type, note=rng.randint(36, 99), value=rng.randint(0, 127)))
+        else:
+            messages.append(mido.Message(message_type, note=rng.randint(36, 99), velocity=rng.randint(0, 127)))
+    return messages
+
+
+def make_test_frame(input_format, layout=FRAME_LAYOUT_COLUMN_MAJOR, seed=0):
+    rng = numpy.random.default_rng(seed)
+    if input_format in [FRAME_FORMAT_BGR565, FRAME_FORMAT_RGB565]:
+        shape = (DISPLAY_N_LINES, DISPLAY_LINE_PIXELS) if layout == FRAME_LAYOUT_ROW_MAJOR else (DISPLAY_LINE_PIXELS, DISPLAY_N_LINES)
+        return rng.integers(0, 2 ** 16, size=shape, dtype=numpy.uint16)
+    elif input_format == FRAME_FORMAT_INDEXED8:
+        shape = (DISPLAY_N_LINES, DISPLAY_LINE_PIXELS) if layout == FRAME_LAYOUT_ROW_MAJOR else (DISPLAY_LINE_PIXELS, DISPLAY_N_LINES)
+        return rng.integers(0, 256, size=shape, dtype=numpy.uint8)
+    elif input_format == FRAME_FORMAT_RGB:
+        return rng.random((DISPLAY_N_LINES, DISPLAY_LINE_PIXELS, 3))
+    else:
+        n_channels = 3 if input_format == FRAME_FORMAT_RGB888 else 4
+        return rng.integers(0, 256, size=(DISPLAY_N_LINES, DISPLAY_LINE_PIXELS, n_channels), dtype=numpy.uint8)
+
+
+def percentile(sorted_values, p):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(p / 100.0 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def run_benchmark(name, function, n_frames, stages=None):
+    """Calls 'function' 'n_frames' times (after a warm-up call) and returns a dictionary with results. If 'stages' is
+    given, it should be a function returning a dictionary of {stage name: duration} for the last call, which will be
+    used to compute per-stage latency percentiles.
+    """
+    function()  # Warm-up (allocates reusable buffers)
+    durations = []
+    stage_durations = {}
+    peak_allocations = []
+    tracemalloc.start()
+    try:
+        for _ in range(0, n_frames):
+            tracemalloc.reset_peak()
+            memory_before = tracemalloc.get_traced_memory()[0]
+            start_time = time.perf_counter()
+            function()
+            durations.append(time.perf_counter() - start_time)
+            peak_allocations.append(tracemalloc.get_traced_memory()[1] - memory_before)
+            if stages is not None:
+                for stage_name, duration in stages().items():
+                    stage_durations.setdefault(stage_name, []).append(duration)
+    finally:
+        tracemalloc.stop()
+
+    def summary(values):
+        values = sorted(values)
+        return {
+            'p50_ms': percentile(values, 50) * 1000,
+            'p90_ms': percentile(values, 90) * 1000,
+            'p99_ms': percentile(values, 99) * 1000,
+            'max_ms': values[-1] * 1000 if values else 0.0,
+        }
+
+    total_time = sum(durations)
+    result = {
+        'name': name,
+        'frames': n_frames,
+        'fps': n_frames / total_time if total_time > 0 else float('inf'),
+        'latency': summary(durations),
+        'peak_alloc_bytes_per_frame': int(sorted(peak_allocations)[len(peak_allocations) // 2]),
+    }
+    if stage_durations:
+        result['stages'] = {stage_name: summary(values) for stage_name, values in stage_durations.items()}
+    return result
+
+
+def benchmark_display_pipeline(n_frames=100, latency=0.0, error_rate=0.0, n_threads=None):
+    """Runs all display pipeline benchmarks and returns a list of results (see 'run_benchmark'). If 'n_threads' is
+    given, frames are prepared using parallel conversion with that number of threads.
+    """
+    results = []
+    push = BenchmarkPush()
+    display = Push2Display(push)
+    palette = numpy.random.default_rng(0).integers(0, 2 ** 16, size=256, dtype=numpy.uint16)
+    display.set_palette(palette)
+    if n_threads is not None:
+        display.enable_parallel_conversion(n_threads)
+    out = display.make_prepared_frame_buffer()
+
+    formats = [(FRAME_FORMAT_BGR565, FRAME_LAYOUT_COLUMN_MAJOR), (FRAME_FORMAT_BGR565, FRAME_LAYOUT_ROW_MAJOR),
+               (FRAME_FORMAT_RGB565, FRAME_LAYOUT_COLUMN_MAJOR), (FRAME_FORMAT_RGB565, FRAME_LAYOUT_ROW_MAJOR),
+               (FRAME_FORMAT_RGB, FRAME_LAYOUT_COLUMN_MAJOR), (FRAME_FORMAT_RGB888, FRAME_LAYOUT_COLUMN_MAJOR),
+               (FRAME_FORMAT_RGBA8888, FRAME_LAYOUT_COLUMN_MAJOR), (FRAME_FORMAT_BGRA8888, FRAME_LAYOUT_COLUMN_MAJOR),
+               (FRAME_FORMAT_INDEXED8, FRAME_LAYOUT_COLUMN_MAJOR), (FRAME_FORMAT_INDEXED8, FRAME_LAYOUT_ROW_MAJOR)]
+    for input_format, layout in formats:
+        frame = make_test_frame(input_format, layout=layout)
+        results.append(run_benchmark('prepare_frame[{0},{1}]'.format(input_format, layout),
+                                     lambda: display.prepare_frame(frame, input_format=input_format, layout=layout),
+                                     n_frames))
+        results.append(run_benchmark('prepare_frame_into[{0},{1}]'.format(input_format, layout),
+                                     lambda: display.prepare_frame_into(frame, out, input_format=input_format, layout=layout),
+                                     n_frames))
+
+    for scale in DISPLAY_REDUCED_RESOLUTION_SCALES:
+        for input_format in [FRAME_FORMAT_BGR565, FRAME_FORMAT_RGB888]:
+            frame = make_test_frame(input_format, layout=FRAME_LAYOUT_ROW_MAJOR)[::scale, ::scale].copy()
+            results.append(run_benchmark('prepare_frame_into[{0},{1},1/{2}]'.format(input_format, FRAME_LAYOUT_ROW_MAJOR, scale),
+                                         lambda: display.prepare_frame_into(frame, out, input_format=input_format,
+                                                                            layout=FRAME_LAYOUT_ROW_MAJOR),
+                                         n_frames))
+
+    rgb565_frame = make_test_frame(FRAME_FORMAT_RGB565)
+    results.append(run_benchmark('rgb565_to_bgr565', lambda: rgb565_to_bgr565(rgb565_frame), n_frames))
+    rgb_frame = make_test_frame(FRAME_FORMAT_RGB)
+    results.append(run_benchmark('rgb_to_bgr565', lambda: rgb_to_bgr565(rgb_frame), n_frames))
+
+    for input_format in [FRAME_FORMAT_BGR565, FRAME_FORMAT_RGB565, FRAME_FORMAT_RGBA8888, FRAME_FORMAT_INDEXED8]:
+        endpoint = FakeUSBEndpoint(latency=latency, error_rate=error_rate)
+        fake_display = ConnectedFakeDisplay(push, endpoint)
+        fake_display.set_palette(palette)
+        if n_threads is not None:
+            fake_display.enable_parallel_conversion(n_threads)
+        frame = make_test_frame(input_format)
+        result = run_benchmark('display_frame[{0}]'.format(input_format),
+                               lambda: fake_display.display_frame(frame, input_format=input_format),
+                               n_frames,
+                               stages=lambda: {'prepare': fake_display.last_prepare_duration,
+                                               'send': fake_display.last_send_duration})
+        result['usb_errors'] = endpoint.n_errors
+        result['bytes_sent'] = endpoint.n_bytes
+        results.append(result)
+        fake_display.disable_parallel_conversion()
+
+    # Same as above with asynchronous transfers, each chunk taking 'latency' seconds to be transferred
+    backend = FakeTransferBackend(transfer_time=latency)
+    async_display = AsyncFakeDisplay(push, backend)
+    frame = make_test_frame(FRAME_FORMAT_BGR565)
+    result = run_benchmark('display_frame[{0}, async transport]'.format(FRAME_FORMAT_BGR565),
+                           lambda: async_display.display_frame(frame, input_format=FRAME_FORMAT_BGR565),
+                           n_frames,
+                           stages=lambda: {'prepare': async_display.last_prepare_duration,
+                                           'send': async_display.last_send_duration})
+    async_display.transport.flush()
+    result['max_transfers_in_flight'] = backend.max_pending
+    result['bytes_sent'] = backend.n_bytes
+    results.append(result)
+
+    display.disable_parallel_conversion()
+    return results
+
+
+def benchmark_action_dispatch(n_events=1000, n_registered_actions=(0, 100, 1000, 10000)):
+    """Benchmarks triggering a pad pressed action with a generic and an individual pad handler, while handlers for
+    'n_registered_actions' other actions are registered, and handling incoming MIDI messages with 'on_midi_message' (for
+    mido messages) and 'on_raw_midi_message' (for raw bytes, also with the MIDI event queue enabled). Returns a list of results (see 'run_benchmark'), where each
+    frame is one triggered action or handled message. The handler registry is restored afterwards.
+    """
+    results = []
+    push = BenchmarkPush()
+    saved_registry = {action: list(handlers) for action, handlers in action_handler_registry.items()}
+    n_calls = [0]
+
+    def handler(*args):
+        n_calls[0] += 1
+
+    try:
+        for n_actions in n_registered_actions:
+            action_handler_registry.clear()
+            for i in range(0, n_actions):
+                action_handler_registry['benchmark action {0}'.format(i)].append(handler)
+            action_handler_registry[ACTION_PAD_PRESSED].append(handler)
+            action_handler_registry[get_individual_pad_action_name(ACTION_PAD_PRESSED, pad_n=36)].append(handler)
+            results.append(run_benchmark('trigger_action[{0} actions registered]'.format(n_actions),
+                                         lambda: Push2.trigger_action(push, ACTION_PAD_PRESSED, 36, (7, 0), 127),
+                                         n_events))
+
+        # Dispatch of incoming MIDI messages, with a generic handler for every pad, encoder and button action
+        action_handler_registry.clear()
+        for action in [ACTION_PAD_PRESSED, ACTION_PAD_RELEASED, ACTION_PAD_AFTERTOUCH, ACTION_ENCODER_ROTATED,
+                       ACTION_BUTTON_PRESSED, ACTION_BUTTON_RELEASED]:
+            action_handler_registry[action].append(handler)
+        midi_push = MIDIBenchmarkPush()
+        messages = make_test_midi_messages()
+        raw_messages = [(message.bytes(), 0.0) for message in messages]  # As received from python-rtmidi
+        message_index = [0]
+
+        def handle_next_message():
+            midi_push.on_midi_message(messages[message_index[0] % len(messages)])
+            message_index[0] += 1
+
+        def parse_and_handle_next_message():
+            # This is what happens when receiving messages through mido's callback
+            raw_message = raw_messages[message_index[0] % len(raw_messages)]
+            midi_push.on_midi_message(mido.Message.from_bytes(raw_message[0]))
+            message_index[0] += 1
+
+        def handle_next_raw_message():
+            midi_push.on_raw_midi_message(raw_messages[message_index[0] % len(raw_messages)])
+            message_index[0] += 1
+
+        results.append(run_benchmark('on_midi_message[mido]', handle_next_message, n_events))
+        results.append(run_benchmark('on_midi_message[mido, with parsing]', parse_and_handle_next_message, n_events))
+        results.append(run_benchmark('on_raw_midi_message', handle_next_raw_message, n_events))
+
+        # Same as above, but queueing events and processing them in batches as an app loop would
+        def handle_next_raw_message_queued():
+            handle_next_raw_message()
+            if message_index[0] % 16 == 0:
+                midi_push.process_midi_events()
+
+        for overflow_policy in [MIDI_EVENT_QUEUE_DROP_OLDEST, MIDI_EVENT_QUEUE_COALESCE]:
+            midi_push.enable_midi_event_queue(overflow_policy=overflow_policy, use_worker_thread=False)
+            results.append(run_benchmark('on_raw_midi_message[queue, {0}]'.format(overflow_policy),
+                                         handle_next_raw_message_queued, n_events))
+            midi_push.disable_midi_event_queue()
+    finally:
+        action_handler_registry.clear()
+        action_handler_registry.update(saved_registry)
+    return results
+
+
+def format_results(results):
+    lines = ['{0:<45} {1:>9} {2:>9} {3:>9} {4:>9} {5:>12}'.format(
+        'benchmark', 'fps', 'p50 ms', 'p90 ms', 'p99 ms', 'alloc/frame')]
+    for result in results:
+        lines.append('{0:<45} {1:>9.1f} {2:>9.3f} {3:>9.3f} {4:>9.3f} {5:>12}'.format(
+            result['name'], result['fps'], result['latency']['p50_ms'], result['latency']['p90_ms'],
+            result['latency']['p99_ms'], result['peak_alloc_bytes_per_frame']))
+        for stage_name, stage in result.get('stages', {}).items():
+            lines.append('    {0:<41} {1:>9} {2:>9.3f} {3:>9.3f} {4:>9.3f}'.format(
+                stage_name, '', stage['p50_ms'], stage['p90_ms'], stage['p99_ms']))
+    return '\n'.join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark push2-python without a Push2 device')
+    parser.add_argument('--suite', choices=['display', 'midi', 'all'], default='display',
+                        help='Benchmark the display pipeline, MIDI event handling or both')
+    parser.add_argument('--n-frames', type=int, default=100, help='Number of frames per benchmark')
+    parser.add_argument('--latency', type=float, default=0.0, help='Latency (in seconds) of each fake USB write')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='Probability of fake USB writes failing')
+    parser.add_argument('--threads', type=int, default=None, help='Prepare frames using parallel conversion with N threads')
+    parser.add_argument('--json', action='store_true', help='Output results as JSON')
+    args = parser.parse_args()
+    results = []
+    if args.suite in ['display', 'all']:
+        results += benchmark_display_pipeline(n_frames=args.n_frames, latency=args.latency, error_rate=args.error_rate,
+                                              n_threads=args.threads)
+    if args.suite in ['midi', 'all']:
+        results += benchmark_action_dispatch(n_events=args.n_frames * 10)
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        print(format_results(results))
+
+
+if __name__ == '__main__':
+    main()
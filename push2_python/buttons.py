@@ -1,5 +1,7 @@
 import mido
-from .constants import ANIMATION_DEFAULT, MIDO_CONTROLCHANGE, ACTION_BUTTON_PRESSED, ACTION_BUTTON_RELEASED, ANIMATION_STATIC
+import sys
+from .constants import ANIMATION_DEFAULT, MIDO_CONTROLCHANGE, ACTION_BUTTON_PRESSED, ACTION_BUTTON_RELEASED, ANIMATION_STATIC, \
+    MIDI_STATUS_CONTROLCHANGE
 from .classes import AbstractPush2Section
 
 
@@ -7,6 +9,23 @@ def get_individual_button_action_name(action_name, button_name):
         return '{0} - {1}'.format(action_name, button_name)
 
 
+def make_button_route(button_name):
+    """Returns a MIDI route (see 'push2_python.midi_routing') triggering the generic and individual button pressed
+    actions if the CC value is 127, and the button released actions otherwise.
+    """
+    pressed_action_name = sys.intern(get_individual_button_action_name(ACTION_BUTTON_PRESSED, button_name))
+    released_action_name = sys.intern(get_individual_button_action_name(ACTION_BUTTON_RELEASED, button_name))
+
+    def button_route(push, data1, data2):
+        if data2 == 127:
+            push.trigger_action(ACTION_BUTTON_PRESSED, button_name)  # Trigger generic button action
+            push.trigger_action(pressed_action_name)  # Trigger individual button action as well
+        else:
+            push.trigger_action(ACTION_BUTTON_RELEASED, button_name)
+            push.trigger_action(released_action_name)
+    return button_route
+
+
 class Push2Buttons(AbstractPush2Section):
     """Class to interface with Ableton's Push2 buttons.
     See https://github.com/Ableton/push-interface/blob/master/doc/AbletonPush2MIDIDisplayInterface.asc#Buttons
@@ -75,12 +94,9 @@ class Push2Buttons(AbstractPush2Section):
         for button_name in self.available_names:
             self.set_button_color(button_name, color=color, animation=animation, animation_end_color=animation_end_color)
         
-    def on_midi_message(self, message):
-        if message.type == MIDO_CONTROLCHANGE:
-            if message.control in self.button_map:  # CC number corresponds to one of the buttons
-                button = self.button_map[message.control]
-                action = ACTION_BUTTON_PRESSED if message.value == 127 else ACTION_BUTTON_RELEASED
-                self.push.trigger_action(action, button['Name'])  # Trigger generic button action
-                self.push.trigger_action(get_individual_button_action_name(action, button['Name']))  # Trigger individual button action as well
-                return True
-
+    def get_midi_routes(self):
+        """Returns a dictionary with the MIDI routes of the messages handled by the buttons, keyed by
+        (status nibble, data1). See 'push2_python.midi_routing'.
+        """
+        return {(MIDI_STATUS_CONTROLCHANGE, button_n): make_button_route(button['Name'])
+                for button_n, button in self.button_map.items()}
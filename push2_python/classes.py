@@ -1,6 +1,7 @@
 import weakref
 import functools
 import time 
+from .midi_routing import get_mido_message_route_data
 
 
 def function_call_interval_limit(interval):
@@ -47,6 +48,7 @@ class AbstractPush2Section(object):
     """
 
     main_push2_object = None
+    midi_routes = None  # Routes of the section used by 'on_midi_message', built on first use
 
     def __init__(self, main_push_object):
         self.main_push_object = weakref.ref(main_push_object)
@@ -54,3 +56,25 @@ class AbstractPush2Section(object):
     @property
     def push(self):
         return self.main_push_object()  # Return de-refernced main Push2 object
+
+    def get_midi_routes(self):
+        """Returns a dictionary with the MIDI routes of the messages handled by the section, keyed by
+        (status nibble, data1). See 'push2_python.midi_routing'.
+        """
+        return {}
+
+    def on_midi_message(self, message):
+        """Triggers the actions of the given mido message using the MIDI routes of the section, so messages are handled
+        the same way as when dispatched with the routing table. Returns True if the message was handled by the section.
+        """
+        route_data = get_mido_message_route_data(message)
+        if route_data is None:
+            return False
+        status_nibble, data1, data2 = route_data
+        if self.midi_routes is None:
+            self.midi_routes = self.get_midi_routes()
+        route = self.midi_routes.get((status_nibble, data1), None)
+        if route is None:
+            return False
+        route(self.push, data1, data2)
+        return True
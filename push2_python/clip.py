@@ -0,0 +1,195 @@
+import mmap
+import struct
+import threading
+import time
+from .constants import DISPLAY_FRAME_SIZE, DISPLAY_FRAME_CLOCK_DEFAULT_FPS, FRAME_FORMAT_BGR565, \
+    FRAME_LAYOUT_COLUMN_MAJOR, CLIP_FILE_MAGIC, CLIP_FILE_VERSION, CLIP_FILE_HEADER_SIZE
+
+# Clip files have a header of CLIP_FILE_HEADER_SIZE bytes (magic, version, number of frames, frame rate and frame size,
+# zero-padded) followed by the frames exactly as returned by 'Push2Display.prepare_frame' (filler bytes added and
+# XOR pattern applied), so they can be sent to Push2 without any conversion.
+CLIP_FILE_HEADER_FORMAT = '<6sHIfI'
+
+
+class ClipWriter(object):
+    """Writes a clip file with frames prepared to be sent to Push2 display. Frames can be added already prepared
+    ('add_prepared_frame') or in any of the formats supported by 'Push2Display.prepare_frame' ('add_frame', which
+    needs a 'display' object to prepare them). The header is written when the writer is closed.
+
+    Example:
+
+        with ClipWriter('intro.p2clip', fps=30, display=push.display) as writer:
+            for frame in intro_frames:
+                writer.add_frame(frame, input_format=push2_python.constants.FRAME_FORMAT_RGB888)
+    """
+
+    def __init__(self, path, fps=DISPLAY_FRAME_CLOCK_DEFAULT_FPS, display=None):
+        self.path = path
+        self.fps = fps
+        self.display = display
+        self.n_frames = 0
+        self.prepared_frame_buffer = None
+        self.file = open(path, 'wb')
+        self.file.write(bytes(CLIP_FILE_HEADER_SIZE))  # Placeholder, header is written on close
+
+    def add_prepared_frame(self, prepared_frame):
+        assert len(memoryview(prepared_frame).cast('B')) == DISPLAY_FRAME_SIZE, 'Wrong prepared frame size'
+        self.file.write(prepared_frame)
+        self.n_frames += 1
+
+    def add_frame(self, frame, input_format=FRAME_FORMAT_BGR565, layout=FRAME_LAYOUT_COLUMN_MAJOR):
+        assert self.display is not None, 'A display object is needed to prepare frames'
+        if self.prepared_frame_buffer is None:
+            self.prepared_frame_buffer = self.display.make_prepared_frame_buffer()
+        self.add_prepared_frame(self.display.prepare_frame_into(frame, self.prepared_frame_buffer,
+                                                                input_format=input_format, layout=layout))
+
+    def close(self):
+        if self.file is None:
+            return
+        header = struct.pack(CLIP_FILE_HEADER_FORMAT, CLIP_FILE_MAGIC, CLIP_FILE_VERSION, self.n_frames, self.fps,
+                             DISPLAY_FRAME_SIZE)
+        self.file.seek(0)
+        self.file.write(header)
+        self.file.close()
+        self.file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+class ClipPlayer(object):
+    """Plays a clip file (see 'ClipWriter') in Push2 display. The file is memory-mapped and frames are sent to the
+    display with 'Push2Display.display_prepared_frame' at the clip frame rate (or 'fps', if given), so playing a clip
+    does not need any frame conversion. Frames are scheduled at fixed monotonic deadlines, skipping frames if sending
+    them takes longer than the frame period. Playback happens in a separate thread (see 'play' and 'stop'), and the
+    current position can be changed at any time with 'seek'. When playback of a non-looping clip ends, the last frame
+    stays on the display.
+
+    Example:
+
+        player = ClipPlayer(push.display, 'intro.p2clip')
+        player.play(loop=True)
+        ...
+        player.stop()
+    """
+
+    def __init__(self, display, path, fps=None):
+        self.display = display
+        self.path = path
+        self.lock = threading.Lock()
+        self.stop_event = threading.Event()
+        self.thread = None
+        self.file = open(path, 'rb')
+        self.mmap = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        if len(self.mmap) < CLIP_FILE_HEADER_SIZE:
+            self.close()
+            raise ValueError('{0} is not a valid Push2 clip file'.format(path))
+        magic, version, n_frames, clip_fps, frame_size = struct.unpack_from(CLIP_FILE_HEADER_FORMAT, self.mmap, 0)
+        if magic != CLIP_FILE_MAGIC or version != CLIP_FILE_VERSION or frame_size != DISPLAY_FRAME_SIZE:
+            self.close()
+            raise ValueError('{0} is not a valid Push2 clip file'.format(path))
+        if len(self.mmap) < CLIP_FILE_HEADER_SIZE + n_frames * frame_size:
+            self.close()
+            raise ValueError('Clip file {0} is truncated'.format(path))
+        self.n_frames = n_frames
+        self.clip_fps = clip_fps
+        self.fps = fps if fps is not None else clip_fps
+        self.position = 0
+        self.loop = False
+
+    def get_prepared_frame(self, index):
+        """Returns a memoryview of the prepared frame with the given index (no data is copied).
+        """
+        assert 0 <= index < self.n_frames, 'Frame index out of range'
+        offset = CLIP_FILE_HEADER_SIZE + index * DISPLAY_FRAME_SIZE
+        return memoryview(self.mmap)[offset:offset + DISPLAY_FRAME_SIZE]
+
+    def display_frame(self, index):
+        frame = self.get_prepared_frame(index)
+        try:
+            self.display.display_prepared_frame(frame)
+        finally:
+            frame.release()  # Don't keep exported pointers to the mmap, or it can't be closed
+
+    def seek(self, index):
+        """Sets the index of the next frame to be played.
+        """
+        with self.lock:
+            self.position = max(0, min(index, self.n_frames - 1))
+
+    def is_playing(self):
+        return self.thread is not None and self.thread.is_alive()
+
+    def play(self, loop=False):
+        """Start playing the clip from the current position in a new thread. If 'loop' is True, playback continues
+        from the first frame when the last frame is reached.
+        """
+        self.stop()
+        self.loop = loop
+        self.stop_event.clear()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.stop_event.set()
+        if self.thread is not None and self.thread is not threading.current_thread():
+            self.thread.join()
+        self.thread = None
+
+    def run(self):
+        if self.n_frames == 0:
+            return
+        period = 1.0 / self.fps
+        next_deadline = time.monotonic()
+        while not self.stop_event.is_set():
+            wait_time = next_deadline - time.monotonic()
+            if wait_time > 0 and self.stop_event.wait(wait_time):
+                break
+
+            with self.lock:
+                index = self.position
+            self.display_frame(index)
+
+            # Advance one frame per period elapsed, skipping frames if sending took longer than the period
+            next_deadline += period
+            n_frames_advanced = 1
+            now = time.monotonic()
+            if now > next_deadline:
+                n_missed = int((now - next_deadline) / period) + 1
+                next_deadline += n_missed * period
+                n_frames_advanced += n_missed
+            with self.lock:
+                if self.position != index:
+                    continue  # Seeked while displaying the frame, play from the new position
+                self.position = index + n_frames_advanced
+                if self.position >= self.n_frames:
+                    if not self.loop:
+                        self.position = self.n_frames - 1
+                        break
+                    self.position %= self.n_frames
+
+    def close(self):
+        self.stop()
+        self.mmap.close()
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+def write_clip(path, frames, fps=DISPLAY_FRAME_CLOCK_DEFAULT_FPS, display=None, input_format=FRAME_FORMAT_BGR565,
+               layout=FRAME_LAYOUT_COLUMN_MAJOR):
+    """Writes all frames of the iterable 'frames' to a clip file at 'path' (see 'ClipWriter'). Returns the number of
+    frames written.
+    """
+    with ClipWriter(path, fps=fps, display=display) as writer:
+        for frame in frames:
+            writer.add_frame(frame, input_format=input_format, layout=layout)
+    return writer.n_frames
@@ -0,0 +1,127 @@
+import numpy
+from collections import OrderedDict
+from .constants import DISPLAY_LINE_PIXELS, DISPLAY_N_LINES, FRAME_FORMAT_BGR565, FRAME_LAYOUT_ROW_MAJOR, \
+    COMPOSITOR_DEFAULT_N_TILE_COLUMNS, COMPOSITOR_DEFAULT_N_TILE_ROWS
+
+
+class CompositorLayer(object):
+
+    def __init__(self, name, render_function, tiles=None):
+        self.name = name
+        self.render_function = render_function
+        self.tiles = set(tiles) if tiles is not None else None  # None means the layer can draw in all tiles
+        self.visible = True
+
+    def draws_in_tile(self, tile):
+        return self.visible and (self.tiles is None or tile in self.tiles)
+
+
+class DisplayCompositor(object):
+    """Composes Push2 display frames from a stack of named layers and only re-renders the parts of the frame that
+    changed. The display is divided in a grid of tiles (by default 8 columns of 120 pixels, matching the encoders
+    above the display). Tiles are marked as dirty using 'invalidate' and the next call to 'render' only redraws dirty
+    tiles in a persistent BGR565 canvas of shape 160x960 (row major layout).
+
+    Layers are drawn in the order they were added (the last added layer is drawn on top). Each layer has a render
+    function which is called as 'render_function(region, x, y)' for every dirty tile the layer draws in, 'region'
+    being a writable uint16 view of the canvas for that tile (of shape tile height x tile width) with BGR565 colors,
+    and 'x' and 'y' the position of the tile in the display.
+
+    Example:
+
+        compositor = DisplayCompositor()
+        compositor.add_layer('background', lambda region, x, y: region.fill(0x0821))
+        compositor.add_layer('meter', draw_meter, tiles=[(0, 0)])
+        ...
+        compositor.invalidate(layer_name='meter')  # Meter value changed
+        compositor.display(push.display)  # Only the first tile is redrawn
+    """
+
+    def __init__(self, n_tile_columns=COMPOSITOR_DEFAULT_N_TILE_COLUMNS, n_tile_rows=COMPOSITOR_DEFAULT_N_TILE_ROWS,
+                 background_color=0):
+        assert DISPLAY_LINE_PIXELS % n_tile_columns == 0, 'Number of tile columns must divide display width'
+        assert DISPLAY_N_LINES % n_tile_rows == 0, 'Number of tile rows must divide display height'
+        self.n_tile_columns = n_tile_columns
+        self.n_tile_rows = n_tile_rows
+        self.tile_width = DISPLAY_LINE_PIXELS // n_tile_columns
+        self.tile_height = DISPLAY_N_LINES // n_tile_rows
+        self.background_color = background_color
+        self.canvas = numpy.full((DISPLAY_N_LINES, DISPLAY_LINE_PIXELS), background_color, dtype=numpy.uint16)
+        self.layers = OrderedDict()
+        self.dirty_tiles = set(self.all_tiles())
+        self.n_tiles_rendered = 0
+
+    def all_tiles(self):
+        return [(column, row) for row in range(0, self.n_tile_rows) for column in range(0, self.n_tile_columns)]
+
+    def tile_rect(self, tile):
+        """Returns (x, y, width, height) of the given (column, row) tile in display coordinates.
+        """
+        column, row = tile
+        return column * self.tile_width, row * self.tile_height, self.tile_width, self.tile_height
+
+    def tiles_in_rect(self, x, y, width, height):
+        """Returns the list of (column, row) tiles which overlap with the given rectangle in display coordinates.
+        """
+        first_column = max(0, x // self.tile_width)
+        last_column = min(self.n_tile_columns - 1, (x + width - 1) // self.tile_width)
+        first_row = max(0, y // self.tile_height)
+        last_row = min(self.n_tile_rows - 1, (y + height - 1) // self.tile_height)
+        return [(column, row) for row in range(first_row, last_row + 1) for column in range(first_column, last_column + 1)]
+
+    def add_layer(self, name, render_function, tiles=None):
+        """Adds a layer on top of the existing ones. 'tiles' is an optional list of (column, row) tiles where the
+        layer draws, if not given the layer is drawn in all tiles. All tiles of the layer are invalidated.
+        """
+        assert name not in self.layers, 'A layer with name "{0}" already exists'.format(name)
+        self.layers[name] = CompositorLayer(name, render_function, tiles=tiles)
+        self.invalidate(layer_name=name)
+
+    def remove_layer(self, name):
+        self.invalidate(layer_name=name)
+        del self.layers[name]
+
+    def set_layer_visible(self, name, visible):
+        layer = self.layers[name]
+        if layer.visible != visible:
+            layer.visible = visible
+            self.invalidate(layer_name=name)
+
+    def invalidate(self, tiles=None, layer_name=None):
+        """Marks tiles as dirty so they are redrawn in the next call to 'render'. If 'tiles' is given, these tiles
+        are invalidated. Otherwise, if 'layer_name' is given, all tiles where that layer draws are invalidated. If
+        none is given, all tiles are invalidated.
+        """
+        if tiles is not None:
+            self.dirty_tiles.update(tiles)
+        elif layer_name is not None and self.layers[layer_name].tiles is not None:
+            self.dirty_tiles.update(self.layers[layer_name].tiles)
+        else:
+            self.dirty_tiles.update(self.all_tiles())
+
+    def invalidate_rect(self, x, y, width, height):
+        self.invalidate(tiles=self.tiles_in_rect(x, y, width, height))
+
+    def is_dirty(self):
+        return len(self.dirty_tiles) > 0
+
+    def render(self):
+        """Redraws all dirty tiles in the canvas and returns the canvas.
+        """
+        for tile in self.dirty_tiles:
+            x, y, width, height = self.tile_rect(tile)
+            region = self.canvas[y:y + height, x:x + width]
+            region.fill(self.background_color)
+            for layer in self.layers.values():
+                if layer.draws_in_tile(tile):
+                    layer.render_function(region, x, y)
+            self.n_tiles_rendered += 1
+        self.dirty_tiles.clear()
+        return self.canvas
+
+    def display(self, display, force=False):
+        """Renders dirty tiles and sends the canvas to the given Push2Display. If no tile is dirty, the frame is
+        only sent if 'force' is True.
+        """
+        if self.is_dirty() or force:
+            display.display_frame(self.render(), input_format=FRAME_FORMAT_BGR565, layout=FRAME_LAYOUT_ROW_MAJOR)
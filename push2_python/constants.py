@@ -8,6 +8,8 @@ PUSH2_MAP_FILE_PATH = os.path.join(os.path.dirname(__file__), 'Push2-map.json')
 ABLETON_VENDOR_ID = 0x2982
 PUSH2_PRODUCT_ID = 0x1967
 USB_TRANSFER_TIMEOUT = 1000
+PUSH2_DISPLAY_INTERFACE_NUMBER = 0
+PUSH2_DISPLAY_ENDPOINT_ADDRESS = 0x01
 
 # MIDI PORT NAMES
 
@@ -67,6 +69,22 @@ MIDO_AFTERTOUCH = 'aftertouch'
 MIDO_PITCWHEEL = 'pitchwheel'
 MIDO_CONTROLCHANGE = 'control_change'
 
+# Upper 4 bits of the status byte of MIDI channel messages (lower 4 bits are the MIDI channel)
+MIDI_STATUS_NOTEOFF = 0x8
+MIDI_STATUS_NOTEON = 0x9
+MIDI_STATUS_POLYAT = 0xA
+MIDI_STATUS_CONTROLCHANGE = 0xB
+MIDI_STATUS_AFTERTOUCH = 0xD
+MIDI_STATUS_PITCHWHEEL = 0xE
+MIDI_ACTIVE_SENSING = 0xFE  # Status byte of active sensing system messages
+MIDI_SUSTAIN_PEDAL_CC = 64
+MIDI_EVENT_QUEUE_DEFAULT_MAX_SIZE = 256
+MIDI_EVENT_QUEUE_DROP_OLDEST = 'drop_oldest'  # Overflow policies of the MIDI event queue
+MIDI_EVENT_QUEUE_COALESCE = 'coalesce'
+MIDI_EVENT_QUEUE_BLOCK = 'block'
+MIDI_ROUTE_COALESCE_VALUE = 'value'  # Ways of coalescing queued events of a MIDI route (see 'push2_python.midi_routing')
+MIDI_ROUTE_COALESCE_INCREMENT = 'increment'
+
 PUSH2_SYSEX_PREFACE_BYTES = [0xF0, 0x00, 0x21, 0x1D, 0x01, 0x01]
 PUSH2_SYSEX_END_BYTES = [0xF7]
 
@@ -83,11 +101,42 @@ DISPLAY_LINE_SIZE = DISPLAY_LINE_PIXELS * \
     DISPLAY_PIXEL_BYTES + DISPLAY_LINE_FILLER_BYTES
 DISPLAY_N_LINES_PER_BUFFER = 8
 DISPLAY_BUFFER_SIZE = DISPLAY_LINE_SIZE * DISPLAY_N_LINES_PER_BUFFER
+DISPLAY_FRAME_SIZE = DISPLAY_LINE_SIZE * DISPLAY_N_LINES  # Size in bytes of a prepared frame (including line filler bytes)
+DISPLAY_N_TRANSFERS_IN_FLIGHT = 4  # Number of simultaneous bulk transfers when using asynchronous display transfers
 DISPLAY_FRAME_XOR_PATTERN = [0xE7F3, 0xE7FF] * (
     ((DISPLAY_LINE_PIXELS + (DISPLAY_LINE_FILLER_BYTES // 2)) * DISPLAY_N_LINES) // 2)
+DISPLAY_REDUCED_RESOLUTION_SCALES = [2, 4]  # Frames can also be displayed at 480x80 and 240x40 pixels
+DISPLAY_FRAME_CLOCK_DEFAULT_FPS = 30
+DISPLAY_FRAME_CLOCK_MIN_FPS = 5
+DISPLAY_FRAME_CLOCK_STATS_WINDOW = 120  # Number of frames used to compute frame clock timing statistics
+DISPLAY_PARALLEL_CONVERSION_MIN_STRIPE_LINES = 40  # Smaller stripes are not worth the overhead of converting them in another thread
+DISPLAY_TIMING_STATS_WINDOW = 300  # Number of durations per stage kept by display timing stats
+DISPLAY_TIMING_HISTOGRAM_BOUNDS = [0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1]  # seconds
+DISPLAY_KEEP_ALIVE_INTERVAL = 1.0  # Push2 display goes black if no frame is received in 2 seconds
+DISPLAY_RECONNECT_MIN_INTERVAL = 0.05  # Reconnection attempts start with this interval and double until max interval
+DISPLAY_RECONNECT_MAX_INTERVAL = 2.0
+COMPOSITOR_DEFAULT_N_TILE_COLUMNS = 8  # One tile column per encoder above the display (120 pixels each)
+COMPOSITOR_DEFAULT_N_TILE_ROWS = 1
+TEXT_RENDERER_DEFAULT_FONT_SIZE = 16
+TEXT_RENDERER_STRING_CACHE_SIZE = 256  # Max number of rendered strings kept in cache
+DISPLAY_SERVER_DEFAULT_ADDRESS = None  # Per-user Unix socket, or DISPLAY_SERVER_TCP_ADDRESS if Unix sockets are not available
+DISPLAY_SERVER_TCP_ADDRESS = ('127.0.0.1', 6300)
+DISPLAY_SERVER_SOCKET_NAME = 'push2-python-display.sock'
+DISPLAY_SERVER_AUTHKEY_SIZE = 32
+DISPLAY_SERVER_N_BUFFERS = 3
+DISPLAY_FRAME_CACHE_DEFAULT_MAX_BYTES = 32 * 1024 * 1024  # About 100 prepared frames
+CLIP_FILE_MAGIC = b'P2CLIP'
+CLIP_FILE_VERSION = 1
+CLIP_FILE_HEADER_SIZE = 64  # bytes, prepared frames start right after the header
 FRAME_FORMAT_BGR565 = 'bgr565'
 FRAME_FORMAT_RGB565 = 'rgb565'
 FRAME_FORMAT_RGB = 'rgb'
+FRAME_FORMAT_RGB888 = 'rgb888'
+FRAME_FORMAT_RGBA8888 = 'rgba8888'
+FRAME_FORMAT_BGRA8888 = 'bgra8888'  # Memory layout of Cairo's FORMAT_ARGB32 and FORMAT_RGB24 in little endian machines
+FRAME_FORMAT_INDEXED8 = 'indexed8'  # 8 bit indexes to a palette of 256 colors (see Push2Display.set_palette)
+FRAME_LAYOUT_COLUMN_MAJOR = 'column_major'  # 16 bit frames of shape 960x160
+FRAME_LAYOUT_ROW_MAJOR = 'row_major'  # 16 bit frames of shape 160x960
 
 # LED rgb default color palette
 # Color palette is defined as a dictionary where keys are a color index [0..127] and
@@ -1,17 +1,41 @@
 import usb.core
 import usb.util
 import numpy
+import array
+import concurrent.futures
 import logging
+import os
+import threading
 import time
 from .classes import AbstractPush2Section, function_call_interval_limit
+from .frame_clock import DisplayFrameClock
+from .display_server import DisplayServer
+from .frame_cache import PreparedFrameCache
+from .display_watcher import DisplayConnectionWatcher
+from .display_stats import DisplayTimingStats
+from .display_transport import PyUSBDisplayTransport, AsyncDisplayTransport, Libusb1TransferBackend, \
+    async_transfers_available
 from .exceptions import Push2USBDeviceConfigurationError, Push2USBDeviceNotFound
 from .constants import ABLETON_VENDOR_ID, PUSH2_PRODUCT_ID, USB_TRANSFER_TIMEOUT, DISPLAY_FRAME_HEADER, \
     DISPLAY_BUFFER_SIZE, DISPLAY_FRAME_XOR_PATTERN, DISPLAY_N_LINES, DISPLAY_LINE_PIXELS, DISPLAY_LINE_FILLER_BYTES, \
     FRAME_FORMAT_BGR565, FRAME_FORMAT_RGB565, FRAME_FORMAT_RGB, PUSH2_RECONNECT_INTERVAL, ACTION_DISPLAY_CONNECTED, \
-    ACTION_DISPLAY_DISCONNECTED
+    ACTION_DISPLAY_DISCONNECTED, DISPLAY_FRAME_SIZE, DISPLAY_KEEP_ALIVE_INTERVAL, FRAME_FORMAT_RGB888, \
+    FRAME_FORMAT_RGBA8888, FRAME_FORMAT_BGRA8888, FRAME_LAYOUT_COLUMN_MAJOR, FRAME_LAYOUT_ROW_MAJOR, \
+    DISPLAY_N_TRANSFERS_IN_FLIGHT, DISPLAY_FRAME_CLOCK_DEFAULT_FPS, DISPLAY_FRAME_CLOCK_MIN_FPS, \
+    DISPLAY_SERVER_DEFAULT_ADDRESS, DISPLAY_SERVER_N_BUFFERS, \
+    DISPLAY_FRAME_CACHE_DEFAULT_MAX_BYTES, FRAME_FORMAT_INDEXED8, DISPLAY_REDUCED_RESOLUTION_SCALES, \
+    DISPLAY_TIMING_STATS_WINDOW, DISPLAY_TIMING_HISTOGRAM_BOUNDS, DISPLAY_PARALLEL_CONVERSION_MIN_STRIPE_LINES
 
 NP_DISPLAY_FRAME_XOR_PATTERN = numpy.array(DISPLAY_FRAME_XOR_PATTERN, dtype=numpy.uint16)  # Numpy array version of the constant
 
+# Prepared frames are sent to Push2 as little endian 16bit values, with lines of DISPLAY_LINE_PIXELS pixels followed by
+# DISPLAY_LINE_FILLER_BYTES filler bytes. The XOR pattern below is the one of NP_DISPLAY_FRAME_XOR_PATTERN but already
+# laid out in that byte order and shape, so it can be XORed in place against a prepared frame buffer.
+PREPARED_FRAME_LINE_PIXELS = DISPLAY_LINE_PIXELS + DISPLAY_LINE_FILLER_BYTES // 2
+PREPARED_FRAME_DTYPE = numpy.dtype('<u2')
+NP_PREPARED_FRAME_XOR_PATTERN = NP_DISPLAY_FRAME_XOR_PATTERN.byteswap().astype(PREPARED_FRAME_DTYPE).reshape(
+    DISPLAY_N_LINES, PREPARED_FRAME_LINE_PIXELS)
+
 
 def rgb565_to_bgr565(rgb565_frame):
     r_filter = int('1111100000000000', 2)
@@ -26,29 +50,247 @@ def rgb565_to_bgr565(rgb565_frame):
     return frame_r_shifted + frame_g_shifted + frame_b_shifted  # Combine all channels
 
 
-# Non-vectorized function for converting from rgb to bgr565
+def rgb888_to_bgr565(rgb888_frame, channel_indexes=(0, 1, 2), out=None, scratch=None):
+    """Converts a frame with 8 bit unsigned integer color channels (shape HxWxN) to a bgr565 frame (shape HxW).
+    "channel_indexes" indicates the position of the r, g and b channels in the last dimension of the input frame.
+    Results are written to "out" (and "scratch" is used for intermediate results) if given, otherwise new arrays are
+    allocated. The input frame is not modified.
+    """
+    frame_r = rgb888_frame[:, :, channel_indexes[0]]
+    frame_g = rgb888_frame[:, :, channel_indexes[1]]
+    frame_b = rgb888_frame[:, :, channel_indexes[2]]
+    if out is None:
+        out = numpy.empty(rgb888_frame.shape[0:2], dtype=numpy.uint16)
+    if scratch is None:
+        scratch = numpy.empty(rgb888_frame.shape[0:2], dtype=numpy.uint16)
+    numpy.right_shift(frame_r, 3, out=out)  # R goes to bits 0-4
+    numpy.bitwise_and(frame_g, 0b11111100, out=scratch)
+    numpy.left_shift(scratch, 3, out=scratch)  # G goes to bits 5-10
+    numpy.bitwise_or(out, scratch, out=out)
+    numpy.bitwise_and(frame_b, 0b11111000, out=scratch)
+    numpy.left_shift(scratch, 8, out=scratch)  # B goes to bits 11-15
+    numpy.bitwise_or(out, scratch, out=out)
+    return out
+
+
 def rgb_to_bgr565(rgb_frame):
-    rgb_frame *= 255
-    rgb_frame_r = rgb_frame[:, :, 0].astype(numpy.uint16)
-    rgb_frame_g = rgb_frame[:, :, 1].astype(numpy.uint16)
-    rgb_frame_b = rgb_frame[:, :, 2].astype(numpy.uint16)
-    frame_r_filtered = numpy.bitwise_and(rgb_frame_r, int('0000000011111000', 2))
-    frame_r_shifted = numpy.right_shift(frame_r_filtered, 3)
-    frame_g_filtered = numpy.bitwise_and(rgb_frame_g, int('0000000011111100', 2))
-    frame_g_shifted = numpy.left_shift(frame_g_filtered, 3)
-    frame_b_filtered = numpy.bitwise_and(rgb_frame_b, int('0000000011111000', 2))
-    frame_b_shifted = numpy.left_shift(frame_b_filtered, 8)
-    combined = frame_r_shifted + frame_g_shifted + frame_b_shifted  # Combine all channels
-    return combined.transpose()
+    """Converts a frame with float color channels in range [0.0, 1.0] (shape HxWx3) to a bgr565 frame of shape WxH.
+    The input frame is not modified.
+    """
+    rgb888_frame = numpy.multiply(rgb_frame, 255).astype(numpy.uint8)
+    return rgb888_to_bgr565(rgb888_frame).transpose()
+
+
+# Frame formats with one value per pixel (for which the "layout" argument applies)
+SINGLE_CHANNEL_FRAME_FORMATS = [FRAME_FORMAT_BGR565, FRAME_FORMAT_RGB565, FRAME_FORMAT_INDEXED8]
+
+# Frame formats whose color conversion does enough work per pixel to be split in stripes converted in parallel (the
+# others are only copied or looked up, which is faster than handing stripes to other threads)
+PARALLEL_CONVERSION_FRAME_FORMATS = [FRAME_FORMAT_RGB565, FRAME_FORMAT_RGB, FRAME_FORMAT_RGB888, FRAME_FORMAT_RGBA8888,
+                                     FRAME_FORMAT_BGRA8888]
+
+
+def get_frame_lines(frame, start, stop, input_format=FRAME_FORMAT_BGR565, layout=FRAME_LAYOUT_COLUMN_MAJOR):
+    """Returns a view of the display lines [start, stop) of a frame with the given format and layout (see
+    'Push2Display.prepare_frame'), in the same format and layout. No data is copied.
+    """
+    if input_format in SINGLE_CHANNEL_FRAME_FORMATS and layout == FRAME_LAYOUT_COLUMN_MAJOR:
+        return frame[:, start:stop]
+    return frame[start:stop]
+
+
+# Position of r, g and b channels for the frame formats with 8 bit unsigned integer color channels
+RGB888_FRAME_FORMATS_CHANNEL_INDEXES = {
+    FRAME_FORMAT_RGB888: (0, 1, 2),
+    FRAME_FORMAT_RGBA8888: (0, 1, 2),
+    FRAME_FORMAT_BGRA8888: (2, 1, 0),
+}
+
+
+class DisplayFrameSender(object):
+    """Sends prepared frames to Push2 display from a dedicated thread.
+    Frames are handed to the thread through a single-slot mailbox: if a new frame is submitted before the previous one
+    was picked by the thread, the previous one is dropped and only the latest frame will be sent. Prepared frame
+    buffers are recycled so no new buffers need to be allocated once the sender is running, but the latest submitted
+    buffer is never recycled until a newer one is submitted (so it can be used as the last prepared frame).
+    """
+
+    def __init__(self, send_function, make_buffer_function, n_buffers=3):
+        self.send_function = send_function
+        self.make_buffer_function = make_buffer_function
+        self.free_buffers = [make_buffer_function() for _ in range(0, n_buffers)]
+        self.pending_buffer = None
+        self.sending_buffer = None
+        self.latest_buffer = None
+        self.condition = threading.Condition()
+        self.stopping = False
+        self.n_frames_submitted = 0
+        self.n_frames_sent = 0
+        self.n_frames_dropped = 0
+        self.thread = threading.Thread(target=self.run, daemon=True)
+
+    def start(self):
+        self.thread.start()
+
+    def stop(self):
+        with self.condition:
+            self.stopping = True
+            self.condition.notify()
+        self.thread.join()
+
+    def get_free_buffer(self):
+        """Returns a prepared frame buffer which is not being used by the sender and can be written to. The buffer
+        should be passed to "submit" once the frame has been prepared.
+        """
+        with self.condition:
+            if self.free_buffers:
+                return self.free_buffers.pop()
+        # Only happens if frames are submitted from several threads at once
+        return self.make_buffer_function()
+
+    def submit(self, prepared_frame_buffer):
+        """Hands the given prepared frame buffer to the sender thread. If there is a pending frame which has not
+        been sent yet, it is dropped.
+        """
+        with self.condition:
+            previous_buffer = self.latest_buffer
+            self.latest_buffer = prepared_frame_buffer
+            if self.pending_buffer is prepared_frame_buffer:
+                pass  # Same buffer submitted again before being sent
+            elif self.pending_buffer is not None:
+                # Pending buffer is the previous latest buffer, which is not needed anymore (if it is also being sent
+                # because it was submitted again, it will be recycled once sent)
+                if self.pending_buffer is not self.sending_buffer:
+                    self.free_buffers.append(self.pending_buffer)
+                self.n_frames_dropped += 1
+            elif previous_buffer is not None and previous_buffer is not self.sending_buffer \
+                    and previous_buffer is not prepared_frame_buffer:
+                self.free_buffers.append(previous_buffer)
+            self.pending_buffer = prepared_frame_buffer
+            self.n_frames_submitted += 1
+            self.condition.notify()
+
+    def run(self):
+        while True:
+            with self.condition:
+                while self.pending_buffer is None and not self.stopping:
+                    self.condition.wait()
+                if self.stopping:
+                    return
+                prepared_frame_buffer = self.pending_buffer
+                self.pending_buffer = None
+                self.sending_buffer = prepared_frame_buffer
+            self.send_function(prepared_frame_buffer)
+            with self.condition:
+                self.sending_buffer = None
+                if prepared_frame_buffer is not self.latest_buffer and prepared_frame_buffer is not self.pending_buffer:
+                    self.free_buffers.append(prepared_frame_buffer)
+                self.n_frames_sent += 1
+
+    def get_stats(self):
+        with self.condition:
+            return {
+                'frames_submitted': self.n_frames_submitted,
+                'frames_sent': self.n_frames_sent,
+                'frames_dropped': self.n_frames_dropped,
+            }
+
+
+class DisplayKeepAlive(object):
+    """Re-sends the last prepared frame to Push2 display from a background thread whenever no frame has been sent in
+    the last 'interval' seconds, so that the display does not go black when the app stops sending frames. The thread
+    sleeps until the time at which the display would need a frame, so it uses almost no CPU while frames are being sent
+    and while the app is idle.
+    """
+
+    def __init__(self, display, interval=DISPLAY_KEEP_ALIVE_INTERVAL):
+        self.display = display
+        self.interval = interval
+        self.stop_event = threading.Event()
+        self.thread = None
+        self.n_keep_alive_frames = 0
+
+    def start(self):
+        self.stop_event.clear()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.stop_event.set()
+        if self.thread is not None and self.thread is not threading.current_thread():
+            self.thread.join()
+        self.thread = None
+
+    def run(self):
+        while not self.stop_event.is_set():
+            wait_time = self.display.last_frame_sent_time + self.interval - time.monotonic()
+            if wait_time > 0:
+                self.stop_event.wait(wait_time)
+                continue  # A frame could have been sent meanwhile, check again
+            if self.display.last_prepared_frame is None:
+                self.stop_event.wait(self.interval)  # Nothing displayed yet
+                continue
+            if self.display.display_last_frame():
+                self.n_keep_alive_frames += 1
+
+    def get_stats(self):
+        return {
+            'interval': self.interval,
+            'keep_alive_frames': self.n_keep_alive_frames,
+        }
+
 
 class Push2Display(AbstractPush2Section):
     """Class to interface with Ableton's Push2 display.
     See https://github.com/Ableton/push-interface/blob/master/doc/AbletonPush2MIDIDisplayInterface.asc#display-interface
     """
     usb_endpoint = None
-    last_prepared_frame = None
+    transport = None
+    use_async_transfers = False
+    n_transfers_in_flight = DISPLAY_N_TRANSFERS_IN_FLIGHT
+    last_prepared_frame = None  # Only valid until the next frame is displayed, as its buffer can then be reused
+    prepared_frame_buffer = None
+    conversion_scratch_buffer = None
+    index_scratch_buffer = None
+    reduced_lines_buffers = None
+    sender = None
+    skip_identical_frames = False
+    keep_alive_interval = DISPLAY_KEEP_ALIVE_INTERVAL
+    last_source_frame = None
+    last_source_frame_format = None
+    last_source_frame_layout = None
+    last_frame_sent_time = 0  # time.monotonic() time, so wall clock changes do not affect the keep-alive deadline
+    n_frames_checked = 0
+    n_frames_skipped = 0
+    n_keep_alive_frames = 0
+    last_prepare_duration = 0.0
+    last_send_duration = 0.0
+    n_measured_sends = 0  # Incremented every time 'last_send_duration' is updated
+    frame_clock = None
+    server = None
+    conversion_pool = None
+    conversion_stripes = None
+    frame_cache = None
+    connection_watcher = None
+    palette = None
+    palette_pair_lut = None
+    timing_stats = None
+    n_connections = 0
+    n_usb_errors = 0
+    n_usb_timeouts = 0
+    keep_alive = None
     function_call_interval_limit_overwrite = PUSH2_RECONNECT_INTERVAL
 
+    def __init__(self, main_push_object):
+        super().__init__(main_push_object)
+        # Frames can be sent from several threads (e.g. app and keep-alive thread), make sure they are not interleaved
+        # (reentrant as action handlers triggered while sending could display frames)
+        self.send_lock = threading.RLock()
+        # Held while replacing the last prepared frame and while reading it from other threads (e.g. keep-alive thread).
+        # Reentrant as action handlers triggered while re-sending the last frame could display frames. When both locks
+        # are needed, 'send_lock' must be acquired first.
+        self.last_prepared_frame_lock = threading.RLock()
+
 
     @function_call_interval_limit(PUSH2_RECONNECT_INTERVAL)
     def configure_usb_device(self):
@@ -61,6 +303,12 @@ class Push2Display(AbstractPush2Section):
 
         See https://github.com/Ableton/push-interface/blob/master/doc/AbletonPush2MIDIDisplayInterface.asc#31-usb-display-interface-access
         """
+        self.connect_usb_device()
+
+    def connect_usb_device(self):
+        """Same as 'configure_usb_device' but without limiting how often it can be called. Used by the display
+        connection watcher, which takes care of not calling it too often.
+        """
         usb_device = None
         try:
             usb_device = usb.core.find(
@@ -88,18 +336,21 @@ class Push2Display(AbstractPush2Section):
         try:
             # Try sending a framr header as a test...
             out_endpoint.write(DISPLAY_FRAME_HEADER, USB_TRANSFER_TIMEOUT)
-            black_frame = self.prepare_frame(self.make_black_frame(), input_format=FRAME_FORMAT_BGR565)
+            black_frame = self.prepare_frame_into(self.make_black_frame(), self.make_prepared_frame_buffer(), input_format=FRAME_FORMAT_BGR565)
             out_endpoint.write(black_frame, USB_TRANSFER_TIMEOUT)
         except usb.core.USBError:
             self.usb_endpoint = None
             return
         
         # ...if it works (no USBError exception) set self.usb_endpoint and trigger action
+        # (transport is set first as the endpoint could be used from another thread as soon as it is set)
+        self.transport = self.make_transport(out_endpoint)
         self.usb_endpoint = out_endpoint
+        self.n_connections += 1
         self.push.trigger_action(ACTION_DISPLAY_CONNECTED)            
         
             
-    def prepare_frame(self, frame, input_format=FRAME_FORMAT_BGR565):
+    def prepare_frame(self, frame, input_format=FRAME_FORMAT_BGR565, layout=FRAME_LAYOUT_COLUMN_MAJOR):
         """Prepare the given image frame to be shown in the Push2's display.
         Depending on the input_format argument, "frame" must be a numpy array with the following characteristics:
 
@@ -109,9 +360,28 @@ class Push2Display(AbstractPush2Section):
         * for FRAME_FORMAT_RGB565: numpy array of shape 910x160 and of uint16. Each uint16 element specifies rgb
           color with the following bit position meaning: [r4 r3 r2 r1 r0 g5 g4 g3 g2 g1 g0 b4 b3 b2 b1 b0].
 
-        * for FRAME_FORMAT_RGB: numpy array of shape 910x160x3 with the third dimension representing rgb colors
+        * for FRAME_FORMAT_RGB: numpy array of shape 160x960x3 with the third dimension representing rgb colors
           with separate float values for rgb channels (float values in range [0.0, 1.0]).
 
+        * for FRAME_FORMAT_RGB888, FRAME_FORMAT_RGBA8888 and FRAME_FORMAT_BGRA8888: numpy array of shape 160x960x3
+          (160x960x4 for the formats with alpha channel) and of uint8, with the third dimension representing the color
+          channels in the order given by the format name. This is the layout used by most drawing libraries (e.g.
+          FRAME_FORMAT_BGRA8888 corresponds to Cairo's ARGB32 surfaces in little endian machines). Alpha channel is ignored.
+
+        * for FRAME_FORMAT_INDEXED8: numpy array of shape 960x160 and of uint8. Each element is the index of the
+          color of the pixel in the palette set with "set_palette". Expanding palette indexes to colors is done with a
+          lookup table which also applies the XOR pattern, so this is the fastest format to prepare.
+
+        The "layout" argument only applies to FRAME_FORMAT_BGR565, FRAME_FORMAT_RGB565 and FRAME_FORMAT_INDEXED8. With the default
+        FRAME_LAYOUT_COLUMN_MAJOR, frames have shape 960x160 as described above. With FRAME_LAYOUT_ROW_MAJOR, frames
+        must have shape 160x960 (one row per display line), which is the layout produced by drawing libraries and
+        avoids transposing the frame. Formats with separate color channels always have one row per display line.
+
+        Frames can also be given at 1/2 or 1/4 of the display resolution (480x80 or 240x40 pixels, with the shapes
+        described above scaled accordingly, e.g. 240x40 for a FRAME_FORMAT_BGR565 frame at 1/4 resolution). These are
+        upscaled to the display resolution by repeating every pixel (nearest neighbour) while they are prepared, so
+        colors are only converted for the pixels of the reduced frame. Resolution is detected from the frame shape.
+
         Preferred format is brg565 as it requires no conversion before sending to Push2. Using brg565 is also very fast
         as color conversion is required but numpy handles it pretty well. You should be able to get frame rates higher than
         30 fps, depending on the speed of your computer. However, using the rgb format (FRAME_FORMAT_RGB) will result in very 
@@ -119,39 +389,331 @@ class Push2Display(AbstractPush2Section):
         but currently the library does not handle this format as nively. All numpy array elements are expected to be big endian.
         In addition to format conversion (if needed), "prepare_frame" prepares the frame to be sent to push by adding
         filler bytes and performing bitwise XOR as decribed in the Push2 specification.
+
+        This method returns a new bytes object for every call. Use "prepare_frame_into" to prepare frames in a
+        preallocated buffer instead.
         See https://github.com/Ableton/push-interface/blob/master/doc/AbletonPush2MIDIDisplayInterface.asc#326-allocating-libusb-transfers
         """
+        prepared_frame = self.prepare_frame_into_using_cache(frame, self.make_prepared_frame_buffer(),
+                                                             input_format=input_format, layout=layout)
+        with self.last_prepared_frame_lock:
+            self.last_prepared_frame = prepared_frame
+        return prepared_frame.tobytes()
+
+
+    def make_prepared_frame_buffer(self):
+        """Returns a new buffer with the size of a prepared frame (DISPLAY_FRAME_SIZE bytes) which can be passed to
+        "prepare_frame_into" and then to "send_to_display". The buffer is an array.array of bytes so that pyusb can
+        send it without making any extra copies.
+        """
+        return array.array('B', bytes(DISPLAY_FRAME_SIZE))
+
+
+    def prepare_frame_into(self, frame, out, input_format=FRAME_FORMAT_BGR565, layout=FRAME_LAYOUT_COLUMN_MAJOR):
+        """Prepare the given image frame to be shown in the Push2's display and write the result in the "out" buffer.
+        "frame", "input_format" and "layout" have the same meaning as in "prepare_frame". "out" must be a writable buffer of
+        DISPLAY_FRAME_SIZE bytes like the ones returned by "make_prepared_frame_buffer". Conversion, filler bytes and
+        the XOR pattern are all applied in place so, except for FRAME_FORMAT_RGB frames, no frame-sized arrays are
+        allocated when calling this method. Returns "out".
+        """
+
+        prepared_frame = numpy.frombuffer(out, dtype=PREPARED_FRAME_DTYPE).reshape(
+            DISPLAY_N_LINES, PREPARED_FRAME_LINE_PIXELS)
+        scale = self.get_frame_scale(frame, input_format=input_format, layout=layout)
+        if scale != 1:
+            self.prepare_reduced_frame_into(frame, prepared_frame, scale, input_format=input_format, layout=layout)
+        elif self.conversion_pool is None or input_format not in PARALLEL_CONVERSION_FRAME_FORMATS:
+            self.prepare_stripe_into(frame, prepared_frame, 0, DISPLAY_N_LINES, input_format=input_format, layout=layout)
+        else:
+            futures = [self.conversion_pool.submit(self.prepare_stripe_into, get_frame_lines(frame, start, stop,
+                       input_format=input_format, layout=layout), prepared_frame, start, stop,
+                       input_format=input_format, layout=layout) for start, stop in self.conversion_stripes]
+            for future in futures:
+                future.result()  # Wait for all stripes (and raise exceptions from conversion threads, if any)
+        return out
+
+
+    def get_frame_scale(self, frame, input_format=FRAME_FORMAT_BGR565, layout=FRAME_LAYOUT_COLUMN_MAJOR):
+        """Returns the factor by which the given frame must be upscaled to fill the display (1 for full resolution
+        frames, or one of DISPLAY_REDUCED_RESOLUTION_SCALES for reduced resolution frames).
+        """
+        n_frame_lines = frame.shape[1] if input_format in SINGLE_CHANNEL_FRAME_FORMATS and \
+            layout == FRAME_LAYOUT_COLUMN_MAJOR else frame.shape[0]
+        if n_frame_lines == DISPLAY_N_LINES:
+            return 1
+        for scale in DISPLAY_REDUCED_RESOLUTION_SCALES:
+            if n_frame_lines * scale == DISPLAY_N_LINES:
+                return scale
+        raise AssertionError('Wrong number of lines in frame ({0})'.format(n_frame_lines))
+
+
+    def prepare_reduced_frame_into(self, frame, prepared_frame, scale, input_format=FRAME_FORMAT_BGR565,
+                                   layout=FRAME_LAYOUT_COLUMN_MAJOR):
+        """Prepares a reduced resolution frame (see "prepare_frame") in the prepared frame (a uint16 array with one row
+        per display line, including filler pixels). The frame is converted at its resolution and then every pixel is
+        repeated in a 'scale'x'scale' block (nearest neighbour upscaling) directly in the prepared frame.
+        """
+        timing_stats = self.timing_stats
+        if timing_stats is not None:
+            start_time = time.perf_counter()
+        reduced_lines = self.get_reduced_lines_buffer(scale)
+        self.convert_frame_into(frame, reduced_lines, input_format=input_format, layout=layout)
+        if timing_stats is not None:
+            convert_end_time = time.perf_counter()
+            timing_stats.add('convert', convert_end_time - start_time)
+        n_lines, n_line_pixels = reduced_lines.shape
+        # Repeat pixels of the reduced lines in full width lines of the conversion scratch buffer through a view of
+        # them as groups of 'scale' pixels (splitting axes never copies data), then copy these lines to every line of
+        # the prepared frame. This is faster than broadcasting to blocks of 'scale'x'scale' pixels at once as whole
+        # lines are copied, and lines are copied from a separate buffer as copying lines of the prepared frame to other
+        # lines of it would make numpy allocate a temporary copy.
+        upscaled_lines = self.get_conversion_scratch_buffer()[0:n_lines]
+        numpy.copyto(upscaled_lines.reshape(n_lines, n_line_pixels, scale), reduced_lines[:, :, numpy.newaxis])
+        for i in range(0, scale):
+            prepared_frame[i::scale, 0:DISPLAY_LINE_PIXELS] = upscaled_lines
+        if timing_stats is not None:
+            upscale_end_time = time.perf_counter()
+            timing_stats.add('upscale', upscale_end_time - convert_end_time)
+        prepared_frame[:, DISPLAY_LINE_PIXELS:] = 0
+        numpy.bitwise_xor(prepared_frame, NP_PREPARED_FRAME_XOR_PATTERN, out=prepared_frame)
+        if timing_stats is not None:
+            timing_stats.add('xor', time.perf_counter() - upscale_end_time)
+
+
+    def get_reduced_lines_buffer(self, scale):
+        if self.reduced_lines_buffers is None:
+            self.reduced_lines_buffers = {}
+        buffer = self.reduced_lines_buffers.get(scale, None)
+        if buffer is None:
+            buffer = numpy.zeros((DISPLAY_N_LINES // scale, DISPLAY_LINE_PIXELS // scale), dtype=numpy.uint16)
+            self.reduced_lines_buffers[scale] = buffer
+        return buffer
+
+
+    def prepare_frame_into_using_cache(self, frame, out, input_format=FRAME_FORMAT_BGR565,
+                                       layout=FRAME_LAYOUT_COLUMN_MAJOR):
+        """Same as "prepare_frame_into", but if the frame cache is enabled (see "enable_frame_cache") the prepared
+        frame is copied from the cache if the same frame was prepared before, and added to the cache otherwise.
+        """
+        if self.frame_cache is None or input_format == FRAME_FORMAT_INDEXED8:
+            # NOTE: indexed frames are not cached as expanding them is cheaper than hashing them
+            return self.prepare_frame_into(frame, out, input_format=input_format, layout=layout)
+        key = self.frame_cache.make_key(frame, input_format, layout)
+        if not self.frame_cache.get_into(key, out):
+            self.prepare_frame_into(frame, out, input_format=input_format, layout=layout)
+            self.frame_cache.put(key, out)
+        return out
+
+
+    def prepare_stripe_into(self, frame_lines, prepared_frame, start, stop, input_format=FRAME_FORMAT_BGR565,
+                            layout=FRAME_LAYOUT_COLUMN_MAJOR):
+        """Converts, pads and XORs lines [start, stop) of the prepared frame (a uint16 array with one row per
+        display line, including filler pixels). 'frame_lines' must contain only these lines of the source frame.
+        """
+        lines = prepared_frame[start:stop]
+        # Stages are only timed when the whole frame is prepared at once (i.e. not in parallel stripes)
+        timing_stats = self.timing_stats if stop - start == DISPLAY_N_LINES else None
+        if timing_stats is not None:
+            start_time = time.perf_counter()
+        if input_format == FRAME_FORMAT_INDEXED8 and self.palette_pair_lut is not None:
+            # Expand pairs of pixels at once with the palette lookup table, which already includes the XOR pattern
+            frame_lines = self.get_single_channel_frame_lines(frame_lines, lines.shape[0], DISPLAY_LINE_PIXELS,
+                                                              numpy.uint8, layout)
+            scratch = self.get_conversion_scratch_buffer()[start:stop]
+            if not frame_lines.flags.c_contiguous:
+                # Copy frame to a contiguous buffer so pairs of pixels can be read as 16 bit values
+                numpy.copyto(scratch.view(numpy.uint8)[:, 0:DISPLAY_LINE_PIXELS], frame_lines)
+                frame_lines = scratch.view(numpy.uint8)[:, 0:DISPLAY_LINE_PIXELS]
+            # numpy.take allocates temporary arrays unless indexes are intp and output is contiguous, so use
+            # preallocated buffers for both
+            pair_indexes = self.get_index_scratch_buffer()[start:stop]
+            numpy.copyto(pair_indexes, frame_lines.view('<u2'))
+            pixel_pairs = scratch.view('<u4')
+            numpy.take(self.palette_pair_lut, pair_indexes, out=pixel_pairs, mode='wrap')
+            lines.view('<u4')[:, 0:DISPLAY_LINE_PIXELS // 2] = pixel_pairs
+            lines[:, DISPLAY_LINE_PIXELS:] = NP_PREPARED_FRAME_XOR_PATTERN[start:stop, DISPLAY_LINE_PIXELS:]
+            if timing_stats is not None:
+                timing_stats.add('convert', time.perf_counter() - start_time)  # XOR is included in the lookup table
+            return
+        self.convert_frame_into(frame_lines, lines[:, 0:DISPLAY_LINE_PIXELS], input_format=input_format, layout=layout,
+                                scratch=self.get_conversion_scratch_buffer()[start:stop])
+        if timing_stats is not None:
+            convert_end_time = time.perf_counter()
+            timing_stats.add('convert', convert_end_time - start_time)
+        lines[:, DISPLAY_LINE_PIXELS:] = 0
+        numpy.bitwise_xor(lines, NP_PREPARED_FRAME_XOR_PATTERN[start:stop], out=lines)
+        if timing_stats is not None:
+            timing_stats.add('xor', time.perf_counter() - convert_end_time)
+
+
+    def convert_frame_into(self, frame, lines, input_format=FRAME_FORMAT_BGR565, layout=FRAME_LAYOUT_COLUMN_MAJOR,
+                           scratch=None):
+        """Converts the given frame to bgr565 and writes it in "lines", a uint16 array (or array view) with one row
+        per display line. "frame" must have the same number of lines and pixels per line as "lines", in the format
+        and layout given by "input_format" and "layout" (see "prepare_frame"). "scratch" is an optional uint16 array
+        of at least the shape of "lines" used for intermediate results (the conversion scratch buffer is used if not
+        given).
+        """
+
+        assert input_format in [FRAME_FORMAT_BGR565, FRAME_FORMAT_RGB565, FRAME_FORMAT_RGB, FRAME_FORMAT_INDEXED8] + \
+            list(RGB888_FRAME_FORMATS_CHANNEL_INDEXES.keys()), 'Invalid frame format'
+        assert layout in [FRAME_LAYOUT_COLUMN_MAJOR, FRAME_LAYOUT_ROW_MAJOR], 'Invalid frame layout'
+
+        n_lines, n_line_pixels = lines.shape
+        if scratch is None:
+            scratch = self.get_conversion_scratch_buffer()
+        scratch = scratch[0:n_lines, 0:n_line_pixels]
+
+        if input_format in RGB888_FRAME_FORMATS_CHANNEL_INDEXES:
+            n_channels = 3 if input_format == FRAME_FORMAT_RGB888 else 4
+            assert type(frame) == numpy.ndarray
+            assert frame.dtype == numpy.dtype('uint8')
+            assert frame.shape == (n_lines, n_line_pixels, n_channels), 'Wrong frame shape ({0})'.format(frame.shape)
+            # Convert directly into the prepared frame lines
+            rgb888_to_bgr565(frame, RGB888_FRAME_FORMATS_CHANNEL_INDEXES[input_format], out=lines, scratch=scratch)
+        else:
+            if input_format == FRAME_FORMAT_RGB:
+                # If format is rgb, do conversion before the rest as frame must be reshaped
+                # from (h, w, 3) to (h, w)
+                frame = rgb_to_bgr565(frame).transpose()
+                layout = FRAME_LAYOUT_ROW_MAJOR
+
+            frame_lines = self.get_single_channel_frame_lines(
+                frame, n_lines, n_line_pixels, numpy.uint8 if input_format == FRAME_FORMAT_INDEXED8 else numpy.uint16,
+                layout)
 
-        assert input_format in [FRAME_FORMAT_BGR565, FRAME_FORMAT_RGB565, FRAME_FORMAT_RGB], 'Invalid frame format'
+            if input_format == FRAME_FORMAT_INDEXED8:
+                assert self.palette is not None, 'A palette must be set with "set_palette" to use FRAME_FORMAT_INDEXED8'
+                # numpy.take allocates a temporary array unless indexes are intp, so copy them to the (contiguous part
+                # of the) index scratch buffer first
+                indexes = self.get_index_scratch_buffer().reshape(-1)[0:lines.size].reshape(lines.shape)
+                numpy.copyto(indexes, frame_lines)
+                numpy.take(self.palette, indexes, out=lines, mode='clip')
+            elif input_format == FRAME_FORMAT_RGB565:
+                # Swap R and B components: t = (R ^ B), then R ^= t and B ^= t. Reading non contiguous frames (e.g.
+                # transposed column major frames) several times is slow, so these are copied to the lines once (as done
+                # for bgr565) and swapped there in place. Contiguous frames are read directly, so that only the last two
+                # operations write to the lines (which are not contiguous because of the filler pixels).
+                if not frame_lines.flags.c_contiguous:
+                    numpy.copyto(lines, frame_lines)
+                    frame_lines = lines
+                numpy.right_shift(frame_lines, 11, out=scratch)
+                numpy.bitwise_xor(scratch, frame_lines, out=scratch)
+                numpy.bitwise_and(scratch, 0b0000000000011111, out=scratch)
+                numpy.bitwise_xor(frame_lines, scratch, out=lines)
+                numpy.left_shift(scratch, 11, out=scratch)
+                numpy.bitwise_xor(lines, scratch, out=lines)
+            else:
+                lines[:] = frame_lines  # BGR565 needs no conversion, and RGB conversion was already done
 
-        if input_format == FRAME_FORMAT_RGB:
-            # If format is rgb, do conversion before the rest as frame must be reshaped
-            # from (w, h, 3) to (w, h)
-            frame = rgb_to_bgr565(frame)
 
+    def get_single_channel_frame_lines(self, frame, n_lines, n_line_pixels, dtype, layout):
+        """Checks type and shape of a frame with one value per pixel and returns a view of it with one row per display
+        line (no data is copied).
+        """
         assert type(frame) == numpy.ndarray
-        assert frame.dtype == numpy.dtype('uint16')
-        assert frame.shape[0] == DISPLAY_LINE_PIXELS, 'Wrong number of pixels in line ({0})'.format(
-            frame.shape[0])
-        assert frame.shape[1] == DISPLAY_N_LINES, 'Wrong number of lines in frame ({0})'.format(
-            frame.shape[1])
-
-        width = DISPLAY_LINE_PIXELS + DISPLAY_LINE_FILLER_BYTES // 2
-        height = DISPLAY_N_LINES
-        prepared_frame = numpy.zeros(shape=(width, height), dtype=numpy.uint16)
-        prepared_frame[0:frame.shape[0], 0:frame.shape[1]] = frame
-        prepared_frame = prepared_frame.transpose().flatten()
-        if input_format == FRAME_FORMAT_RGB565:
-            prepared_frame = rgb565_to_bgr565(prepared_frame)
-        elif input_format == FRAME_FORMAT_BGR565:
-            pass  # Nothing to do as this is already the requested format
-        elif input_format == FRAME_FORMAT_RGB:
-            pass  # Nothing as conversion was done before
-        prepared_frame = prepared_frame.byteswap()  # Change to little endian
-        prepared_frame = numpy.bitwise_xor(prepared_frame, NP_DISPLAY_FRAME_XOR_PATTERN)
-
-        self.last_prepared_frame = prepared_frame
-        return prepared_frame.byteswap().tobytes()
+        assert frame.dtype == numpy.dtype(dtype)
+        if layout == FRAME_LAYOUT_ROW_MAJOR:
+            assert frame.shape == (n_lines, n_line_pixels), 'Wrong frame shape ({0})'.format(frame.shape)
+            return frame
+        else:
+            assert frame.shape[0] == n_line_pixels, 'Wrong number of pixels in line ({0})'.format(
+                frame.shape[0])
+            assert frame.shape[1] == n_lines, 'Wrong number of lines in frame ({0})'.format(
+                frame.shape[1])
+            return frame.transpose()  # View with one line per row, no data is copied
+
+
+    def set_palette(self, palette):
+        """Sets the palette used to display FRAME_FORMAT_INDEXED8 frames. 'palette' must be a numpy array with up to
+        256 colors, either as uint16 BGR565 values (shape N) or as uint8 RGB values (shape Nx3). Palette indexes
+        without color are black. A lookup table for expanding palette indexes (with the XOR pattern already applied) is
+        computed once here, so changing the palette is cheap and the next indexed frame displayed will use the new
+        colors (even if it is the same frame, it will not be skipped as identical to the last one).
+        """
+        palette = numpy.asarray(palette)
+        if palette.ndim == 2:
+            assert palette.shape[1] == 3 and palette.dtype == numpy.uint8, 'RGB palettes must be uint8 of shape Nx3'
+            palette = rgb888_to_bgr565(palette.reshape(1, -1, 3)).reshape(-1)
+        assert palette.ndim == 1 and palette.shape[0] <= 256, 'Palettes must have at most 256 colors'
+        full_palette = numpy.zeros(256, dtype=numpy.uint16)
+        full_palette[0:palette.shape[0]] = palette
+        self.palette = full_palette
+
+        # The XOR pattern alternates every pixel and lines have an even number of pixels, so a lookup table indexed by
+        # pairs of (even pixel, odd pixel) indexes read as 16 bit little endian values can give both prepared pixels
+        # (as a 32 bit little endian value) with the XOR pattern applied
+        even_pixels = numpy.bitwise_xor(full_palette, NP_PREPARED_FRAME_XOR_PATTERN[0, 0]).astype(numpy.uint32)
+        odd_pixels = numpy.bitwise_xor(full_palette, NP_PREPARED_FRAME_XOR_PATTERN[0, 1]).astype(numpy.uint32)
+        pair_indexes = numpy.arange(0, 256 * 256, dtype=numpy.uint32)
+        self.palette_pair_lut = (even_pixels[pair_indexes & 0xFF] | (odd_pixels[pair_indexes >> 8] << 16)).astype('<u4')
+
+        # Same index frames now result in different prepared frames
+        if self.last_source_frame_format == FRAME_FORMAT_INDEXED8:
+            self.last_source_frame = None
+
+    def enable_parallel_conversion(self, n_threads=None):
+        """Prepare frames using a pool of 'n_threads' threads (by default, the number of CPUs). The display lines are
+        split in one stripe per thread (of at least DISPLAY_PARALLEL_CONVERSION_MIN_STRIPE_LINES lines), and each stripe
+        is converted, padded and XORed concurrently in the prepared frame. As numpy releases the GIL while processing
+        arrays, this can make preparing frames which need color conversion faster in multi-core machines, but handing
+        stripes to threads has a cost: in single core machines it is slower than preparing frames in a single thread, so
+        parallel conversion is not enabled if 'n_threads' is not given and there is only one CPU. Formats which need no
+        color conversion (FRAME_FORMAT_BGR565 and FRAME_FORMAT_INDEXED8) are always prepared in a single thread. Check
+        the gain in your machine with 'python -m push2_python.benchmark --threads N'. Prepared frames are exactly the
+        same as when preparing them in a single thread.
+        """
+        self.disable_parallel_conversion()
+        if n_threads is None:
+            n_threads = os.cpu_count() or 1
+            if n_threads <= 1:
+                logging.info('Parallel conversion needs several CPUs, frames will be prepared in a single thread.')
+                return
+        n_threads = max(1, min(n_threads, DISPLAY_N_LINES // DISPLAY_PARALLEL_CONVERSION_MIN_STRIPE_LINES))
+        if n_threads <= 1:
+            return
+        boundaries = [(DISPLAY_N_LINES * i) // n_threads for i in range(0, n_threads + 1)]
+        self.conversion_stripes = list(zip(boundaries[:-1], boundaries[1:]))
+        self.conversion_pool = concurrent.futures.ThreadPoolExecutor(max_workers=n_threads)
+
+    def disable_parallel_conversion(self):
+        if self.conversion_pool is not None:
+            conversion_pool = self.conversion_pool
+            self.conversion_pool = None
+            self.conversion_stripes = None
+            conversion_pool.shutdown()
+
+    def enable_frame_cache(self, max_bytes=DISPLAY_FRAME_CACHE_DEFAULT_MAX_BYTES):
+        """Keep prepared frames in an LRU cache keyed by a hash of the contents of the source frame (and its format
+        and layout), using up to 'max_bytes' bytes of memory. When a frame which is in the cache is displayed again,
+        it is not prepared again but copied from the cache. This is useful for apps which cycle through a limited set
+        of screens using formats with 8 bit color channels, as hashing these frames is cheaper than converting them
+        (but it is not cheaper than preparing FRAME_FORMAT_BGR565 frames, nor than converting the much bigger float
+        frames of FRAME_FORMAT_RGB). Installing the 'xxhash' package makes hashing faster. See 'get_frame_cache_stats'.
+        """
+        self.frame_cache = PreparedFrameCache(max_bytes=max_bytes)
+
+    def disable_frame_cache(self):
+        self.frame_cache = None
+
+    def get_frame_cache_stats(self):
+        """Returns a dictionary with frame cache statistics (see 'PreparedFrameCache.get_stats'), or None if the frame
+        cache is not enabled.
+        """
+        if self.frame_cache is None:
+            return None
+        return self.frame_cache.get_stats()
+
+    def get_conversion_scratch_buffer(self):
+        if self.conversion_scratch_buffer is None:
+            self.conversion_scratch_buffer = numpy.zeros((DISPLAY_N_LINES, DISPLAY_LINE_PIXELS), dtype=numpy.uint16)
+        return self.conversion_scratch_buffer
+
+
+    def get_index_scratch_buffer(self):
+        if self.index_scratch_buffer is None:
+            self.index_scratch_buffer = numpy.zeros((DISPLAY_N_LINES, DISPLAY_LINE_PIXELS // 2), dtype=numpy.intp)
+        return self.index_scratch_buffer
 
 
     def make_black_frame(self):
@@ -162,11 +724,13 @@ class Push2Display(AbstractPush2Section):
         """Sends a prepared frame to Push2 display.
         First sends frame header and then sends prepared_frame in buffers of BUFFER_SIZE.
         'prepared_frame' must be a flattened array of (DISPLAY_LINE_PIXELS + (DISPLAY_LINE_FILLER_BYTES // 2)) * DISPLAY_N_LINES 16bit BGR 565 values
-        as returned by the 'Push2Display.prepare_frame' method.
+        as returned by the 'Push2Display.prepare_frame' method, or a buffer filled by the 'Push2Display.prepare_frame_into' method.
         See https://github.com/Ableton/push-interface/blob/master/doc/AbletonPush2MIDIDisplayInterface.asc#326-allocating-libusb-transfers
         """
 
         if self.usb_endpoint is None:
+            if self.connection_watcher is not None:
+                return  # Display disconnected, the connection watcher will reconnect when it becomes available
             try:
                 self.configure_usb_device()
             except (Push2USBDeviceNotFound, Push2USBDeviceConfigurationError) as e:
@@ -180,31 +744,457 @@ class Push2Display(AbstractPush2Section):
                 if log_error:
                     logging.error('Could not initialize Push 2 Display: {0}'.format(e))         
 
-        if self.usb_endpoint is not None:
-            try:
-                self.usb_endpoint.write(
-                    DISPLAY_FRAME_HEADER, USB_TRANSFER_TIMEOUT)
+        with self.send_lock:
+            if self.usb_endpoint is not None:
+                try:
+                    if self.transport is None:
+                        self.transport = PyUSBDisplayTransport(self.usb_endpoint)
+                    send_start_time = time.monotonic()
+                    self.transport.send_frame(prepared_frame, timing_stats=self.timing_stats)
+                    self.last_send_duration = time.monotonic() - send_start_time
+                    self.n_measured_sends += 1
+                    if self.timing_stats is not None:
+                        self.timing_stats.add('send', self.last_send_duration)
+                except usb.core.USBError as e:
+                    # USB connection error, disable connection, will try to reconnect next time a frame is sent
+                    self.n_usb_errors += 1
+                    if isinstance(e, usb.core.USBTimeoutError):
+                        self.n_usb_timeouts += 1
+                    self.close_transport()
+                    self.usb_endpoint = None
+                    self.push.trigger_action(ACTION_DISPLAY_DISCONNECTED)
+                    if self.connection_watcher is not None:
+                        self.connection_watcher.notify_disconnected()
 
-                self.usb_endpoint.write(prepared_frame, USB_TRANSFER_TIMEOUT)
+        if self.timing_stats is not None:
+            self.timing_stats.end_frame()
+                
 
-                # NOTE: code below was commented because the frames were apparently being
-                # sent twice!! (nice bug...). There seems to be no need to send frame in chunks...
-                #for i in range(0, len(prepared_frame), DISPLAY_BUFFER_SIZE):
-                #    buffer_data = prepared_frame[i: i + DISPLAY_BUFFER_SIZE]
-                #    self.usb_endpoint.write(buffer_data, USB_TRANSFER_TIMEOUT)
-            
+    def make_transport(self, usb_endpoint):
+        """Returns the object that will be used to send frames to Push2 display through the given endpoint. If
+        asynchronous transfers are enabled and available, this will be an AsyncDisplayTransport, otherwise frames
+        will be sent with pyusb synchronous writes.
+        """
+        if self.use_async_transfers:
+            if not async_transfers_available():
+                logging.error('Asynchronous display transfers require \'libusb1\' Python package. Using pyusb instead.')
+            else:
+                try:
+                    # Release interface claimed by pyusb so the asynchronous backend can claim it
+                    usb.util.dispose_resources(usb_endpoint.device)
+                    backend = Libusb1TransferBackend(n_transfers=self.n_transfers_in_flight)
+                    return AsyncDisplayTransport(backend, n_transfers=self.n_transfers_in_flight)
+                except Exception as e:
+                    logging.error('Could not set up asynchronous display transfers: {0}. Using pyusb instead.'.format(e))
+        return PyUSBDisplayTransport(usb_endpoint)
+
+    def close_transport(self):
+        if self.transport is not None:
+            try:
+                self.transport.close()
             except usb.core.USBError:
-                # USB connection error, disable connection, will try to reconnect next time a frame is sent
-                self.usb_endpoint = None
-                self.push.trigger_action(ACTION_DISPLAY_DISCONNECTED)
-                
+                pass
+            self.transport = None
 
-    def display_frame(self, frame, input_format=FRAME_FORMAT_BGR565):
-        prepared_frame = self.prepare_frame(frame.copy(), input_format=input_format)
-        self.send_to_display(prepared_frame)
+    def enable_async_transfers(self, n_transfers=DISPLAY_N_TRANSFERS_IN_FLIGHT):
+        """Send frames to Push2 display keeping 'n_transfers' USB bulk transfers in flight using libusb asynchronous
+        API (requires 'libusb1' Python package). Frames are sent in chunks of DISPLAY_BUFFER_SIZE bytes and
+        'send_to_display' returns as soon as all chunks have been submitted. If 'libusb1' is not available, frames
+        will still be sent using pyusb.
+        """
+        self.use_async_transfers = True
+        self.n_transfers_in_flight = n_transfers
+        self.close_transport()
+        if self.usb_endpoint is not None:
+            self.transport = self.make_transport(self.usb_endpoint)
+
+    def disable_async_transfers(self):
+        self.use_async_transfers = False
+        self.close_transport()
 
+
+    def display_frame(self, frame, input_format=FRAME_FORMAT_BGR565, layout=FRAME_LAYOUT_COLUMN_MAJOR):
+        """Prepare the given frame and send it to Push2 display. The frame is prepared in a buffer owned by the display
+        object (two buffers are used alternately, so the last prepared frame can be re-sent while preparing a new one).
+        See 'Push2Display.prepare_frame' for information about 'frame', 'input_format' and 'layout'.
+
+        If skipping identical frames is enabled (see 'enable_skip_identical_frames'), frames equal to the last displayed
+        frame are neither prepared nor sent, except for re-sending the last prepared frame every 'keep_alive_interval'
+        seconds so that the display does not go black.
+
+        After calling this method, 'last_prepared_frame' is the buffer with the prepared frame. This buffer is reused
+        for preparing the next frames, so copy it if it is needed after the next frame is displayed.
+
+        Returns True if the frame was prepared ('last_prepare_duration' is its preparation time), or False if it was
+        skipped. The frame is sent from the calling thread, or later by the sender thread if it is running, and
+        'n_measured_sends' is incremented when it has been sent ('last_send_duration' is then its sending time).
+        """
+        if self.skip_identical_frames:
+            self.n_frames_checked += 1
+            if self.is_last_source_frame(frame, input_format, layout):
+                self.n_frames_skipped += 1
+                if time.monotonic() - self.last_frame_sent_time >= self.keep_alive_interval:
+                    if self.display_last_frame():
+                        self.n_keep_alive_frames += 1
+                    self.display_in_simulator(frame, input_format=input_format, layout=layout)
+                return False
+            self.store_last_source_frame(frame, input_format, layout)
+
+        self.last_frame_sent_time = time.monotonic()
+        prepare_start_time = time.monotonic()
+        if self.sender is not None:
+            prepared_frame = self.prepare_frame_into_using_cache(frame, self.sender.get_free_buffer(),
+                                                                 input_format=input_format, layout=layout)
+            self.last_prepare_duration = time.monotonic() - prepare_start_time
+            if self.timing_stats is not None:
+                self.timing_stats.add('prepare', self.last_prepare_duration)
+            self.submit_prepared_frame(prepared_frame)
+        else:
+            if self.prepared_frame_buffer is None:
+                self.prepared_frame_buffer = self.make_prepared_frame_buffer()
+            prepared_frame = self.prepare_frame_into_using_cache(frame, self.prepared_frame_buffer,
+                                                                 input_format=input_format, layout=layout)
+            self.last_prepare_duration = time.monotonic() - prepare_start_time
+            if self.timing_stats is not None:
+                self.timing_stats.add('prepare', self.last_prepare_duration)
+            self.submit_prepared_frame(prepared_frame)
+
+        self.display_in_simulator(frame, input_format=input_format, layout=layout)
+        return True
+
+    def display_in_simulator(self, frame, input_format=FRAME_FORMAT_BGR565, layout=FRAME_LAYOUT_COLUMN_MAJOR):
         if self.push.simulator_controller is not None:
-            self.push.simulator_controller.prepare_and_display_in_simulator(frame.copy(), input_format=input_format)
+            if input_format == FRAME_FORMAT_INDEXED8:
+                frame = self.palette[frame]  # Simulator does not know about palettes
+                input_format = FRAME_FORMAT_BGR565
+            scale = self.get_frame_scale(frame, input_format=input_format, layout=layout)
+            if scale != 1:
+                frame = frame.repeat(scale, axis=0).repeat(scale, axis=1)  # Simulator only handles full resolution
+            self.push.simulator_controller.prepare_and_display_in_simulator(frame, input_format=input_format, layout=layout)
 
     def display_last_frame(self):
-        self.send_to_display(self.last_prepared_frame)
+        """Sends the last prepared frame to Push2 display again. Returns False if there is no last prepared frame to send.
+        """
+        if self.last_prepared_frame is None:
+            return False
+        self.last_frame_sent_time = time.monotonic()
+        if self.sender is not None:
+            # Submit a copy of the last prepared frame as it could be a buffer not owned by the sender (e.g. one
+            # prepared with 'prepare_frame'). The lock makes sure it is not replaced and reused while copying it.
+            with self.last_prepared_frame_lock:
+                prepared_frame = self.sender.get_free_buffer()
+                prepared_frame[:] = self.last_prepared_frame
+                self.last_prepared_frame = prepared_frame
+                self.sender.submit(prepared_frame)
+        else:
+            # Hold the lock while sending so the last prepared frame buffer is not reused for a new frame meanwhile
+            with self.send_lock, self.last_prepared_frame_lock:
+                self.send_to_display(self.last_prepared_frame)
+        return True
+
+    def submit_prepared_frame(self, prepared_frame):
+        """Makes the given prepared frame buffer the last prepared frame and sends it to Push2 display (or hands it to
+        the sender thread if it is running). If the given buffer is the display's prepared frame buffer, the buffer of
+        the previous frame becomes the prepared frame buffer, so new frames are never prepared in the last prepared
+        frame buffer while other threads (e.g. the keep-alive thread) could be sending it.
+        """
+        with self.last_prepared_frame_lock:
+            previous_prepared_frame = self.last_prepared_frame
+            self.last_prepared_frame = prepared_frame
+            if self.sender is not None:
+                self.sender.submit(prepared_frame)
+                return
+            if prepared_frame is self.prepared_frame_buffer:
+                self.prepared_frame_buffer = previous_prepared_frame  # Created again when needed if None
+        self.send_to_display(prepared_frame)
+
+    def display_prepared_frame(self, prepared_frame):
+        """Sends an already prepared frame (e.g. a frame returned by 'prepare_frame' or read from a clip file, see
+        'push2_python.clip') to Push2 display. 'prepared_frame' can be any object supporting the buffer protocol with
+        DISPLAY_FRAME_SIZE bytes. No conversion is done, frame data is only copied to a prepared frame buffer (so the
+        given object can be reused or unmapped right after calling this method).
+        """
+        if self.sender is not None:
+            prepared_frame_buffer = self.sender.get_free_buffer()
+        else:
+            if self.prepared_frame_buffer is None:
+                self.prepared_frame_buffer = self.make_prepared_frame_buffer()
+            prepared_frame_buffer = self.prepared_frame_buffer
+        numpy.frombuffer(prepared_frame_buffer, dtype=numpy.uint8)[:] = numpy.frombuffer(prepared_frame, dtype=numpy.uint8)
+
+        # Frame is now different from last source frame (if any)
+        self.last_source_frame = None
+        self.last_frame_sent_time = time.monotonic()
+        self.submit_prepared_frame(prepared_frame_buffer)
+
+        if self.push.simulator_controller is not None:
+            # Undo XOR pattern and remove filler to get back the bgr565 frame
+            lines = numpy.frombuffer(prepared_frame_buffer, dtype=PREPARED_FRAME_DTYPE).reshape(
+                DISPLAY_N_LINES, PREPARED_FRAME_LINE_PIXELS)
+            frame = numpy.bitwise_xor(lines, NP_PREPARED_FRAME_XOR_PATTERN)[:, 0:DISPLAY_LINE_PIXELS].astype(numpy.uint16)
+            self.push.simulator_controller.prepare_and_display_in_simulator(frame, input_format=FRAME_FORMAT_BGR565,
+                                                                            layout=FRAME_LAYOUT_ROW_MAJOR)
+
+    def update_region(self, x, y, width, height, pixels, input_format=FRAME_FORMAT_BGR565, layout=FRAME_LAYOUT_COLUMN_MAJOR):
+        """Updates a rectangular region of the last displayed frame and sends the updated frame to Push2 display.
+        Only the given region of the last prepared frame is converted and XORed, so updating a small region (e.g.
+        one of the 8 columns of 120 pixels below the encoders) is much cheaper than preparing the whole frame.
+        'pixels' must be a numpy array with the contents of the region in the given 'input_format' and 'layout'
+        (see 'prepare_frame'), e.g. of shape (width, height) for FRAME_FORMAT_BGR565 with the default column major
+        layout. If no frame has been displayed yet, the rest of the frame is black. When frames are sent from the
+        calling thread, the last prepared frame is patched in place. When the sender thread is running (see
+        'start_sender_thread'), the sender could be sending the last prepared frame, so it is first copied to a free
+        sender buffer.
+        """
+        assert 0 <= x and x + width <= DISPLAY_LINE_PIXELS and 0 <= y and y + height <= DISPLAY_N_LINES, \
+            'Region out of display bounds'
+
+        # Frame will be different from last source frame (if any)
+        self.last_source_frame = None
+        self.last_frame_sent_time = time.monotonic()
+
+        if self.sender is None:
+            # Holding the send lock, no other thread can be sending the last prepared frame while it is patched
+            with self.send_lock:
+                with self.last_prepared_frame_lock:
+                    prepared_frame = self.last_prepared_frame
+                    if prepared_frame is not None:
+                        self.patch_prepared_frame(prepared_frame, x, y, width, height, pixels, input_format, layout)
+                if prepared_frame is not None:
+                    self.send_to_display(prepared_frame)
+                    return
+
+        if self.sender is not None:
+            # Patch a copy of the last prepared frame as the sender could be sending it
+            prepared_frame = self.sender.get_free_buffer()
+        else:
+            if self.prepared_frame_buffer is None:
+                self.prepared_frame_buffer = self.make_prepared_frame_buffer()
+            prepared_frame = self.prepared_frame_buffer
+        with self.last_prepared_frame_lock:
+            if self.last_prepared_frame is None:
+                self.prepare_frame_into(self.make_black_frame(), prepared_frame)
+            else:
+                prepared_frame[:] = self.last_prepared_frame
+        self.patch_prepared_frame(prepared_frame, x, y, width, height, pixels, input_format, layout)
+        self.submit_prepared_frame(prepared_frame)
+
+    def patch_prepared_frame(self, prepared_frame, x, y, width, height, pixels, input_format, layout):
+        # Converts and XORs the given region of a prepared frame (see 'update_region')
+        prepared_frame_lines = numpy.frombuffer(prepared_frame, dtype=PREPARED_FRAME_DTYPE).reshape(
+            DISPLAY_N_LINES, PREPARED_FRAME_LINE_PIXELS)
+        region = prepared_frame_lines[y:y + height, x:x + width]
+        self.convert_frame_into(pixels, region, input_format=input_format, layout=layout)
+        # XOR pattern alternates every pixel and lines have an even number of pixels, so slicing the pattern with
+        # the region coordinates gives the right pattern alignment for the region
+        numpy.bitwise_xor(region, NP_PREPARED_FRAME_XOR_PATTERN[y:y + height, x:x + width], out=region)
+
+    def is_last_source_frame(self, frame, input_format, layout):
+        return self.last_source_frame is not None and input_format == self.last_source_frame_format \
+            and layout == self.last_source_frame_layout and numpy.array_equal(frame, self.last_source_frame)
+
+    def store_last_source_frame(self, frame, input_format, layout):
+        if self.last_source_frame is not None and self.last_source_frame.shape == frame.shape \
+                and self.last_source_frame.dtype == frame.dtype:
+            numpy.copyto(self.last_source_frame, frame)  # Reuse existing array
+        else:
+            self.last_source_frame = frame.copy()
+        self.last_source_frame_format = input_format
+        self.last_source_frame_layout = layout
+
+    def enable_skip_identical_frames(self, keep_alive_interval=DISPLAY_KEEP_ALIVE_INTERVAL):
+        """Make 'display_frame' skip preparing and sending frames which are identical to the last displayed frame.
+        Because Push2 display goes black if it does not receive frames for 2 seconds, the last prepared frame will
+        still be re-sent if no frame has been sent in the last 'keep_alive_interval' seconds.
+        """
+        self.skip_identical_frames = True
+        self.keep_alive_interval = keep_alive_interval
+
+    def disable_skip_identical_frames(self):
+        self.skip_identical_frames = False
+        self.last_source_frame = None
+        self.last_source_frame_format = None
+
+    def get_skip_stats(self):
+        """Returns a dictionary with the number of frames checked and skipped because they were identical to the last
+        displayed frame, the number of those which were re-sent to keep the display alive, the skip rate, and the number
+        of bytes which did not need to be sent to Push2 because of skipping frames.
+        """
+        return {
+            'frames_checked': self.n_frames_checked,
+            'frames_skipped': self.n_frames_skipped,
+            'keep_alive_frames': self.n_keep_alive_frames,
+            'skip_rate': self.n_frames_skipped / self.n_frames_checked if self.n_frames_checked else 0.0,
+            'bytes_saved': (self.n_frames_skipped - self.n_keep_alive_frames) * DISPLAY_FRAME_SIZE,
+        }
+
+    def start_frame_clock(self, render_function, fps=DISPLAY_FRAME_CLOCK_DEFAULT_FPS, input_format=FRAME_FORMAT_BGR565,
+                          layout=FRAME_LAYOUT_COLUMN_MAJOR, adaptive=True, min_fps=DISPLAY_FRAME_CLOCK_MIN_FPS):
+        """Start a thread which calls 'render_function' at 'fps' frames per second and displays the frames it returns
+        (if 'render_function' returns None, no frame is displayed). Frames are scheduled using monotonic deadlines so
+        frame rate does not drift with the time it takes to render and send each frame. If 'adaptive' is True, the
+        frame rate is automatically lowered (down to 'min_fps') when sending frames to Push2 takes longer than the
+        frame budget, and raised back towards 'fps' when it does not. See 'get_frame_clock_stats' for timing statistics.
+        """
+        self.stop_frame_clock()
+        self.frame_clock = DisplayFrameClock(self, render_function, fps=fps, input_format=input_format, layout=layout,
+                                             adaptive=adaptive, min_fps=min_fps)
+        self.frame_clock.start()
+
+    def stop_frame_clock(self):
+        if self.frame_clock is not None:
+            frame_clock = self.frame_clock
+            self.frame_clock = None
+            frame_clock.stop()
+
+    def get_frame_clock_stats(self):
+        """Returns a dictionary with timing statistics of the frame clock (see 'DisplayFrameClock.get_stats'), or None
+        if the frame clock is not running.
+        """
+        if self.frame_clock is None:
+            return None
+        return self.frame_clock.get_stats()
+
+    def start_sender_thread(self):
+        """Start a dedicated thread to send frames to Push2 display. Once the thread is started, 'display_frame' will
+        prepare frames and hand them to that thread instead of sending them to Push2 itself, so the caller does not
+        block while frames are being transferred via USB. If a new frame is displayed before the previous one has been
+        sent, the previous frame is dropped. Use 'get_sender_stats' to get the number of submitted, sent and dropped
+        frames.
+        """
+        if self.sender is None:
+            self.sender = DisplayFrameSender(self.send_to_display, self.make_prepared_frame_buffer)
+            self.sender.start()
+
+    def stop_sender_thread(self):
+        """Stop the display sender thread (if running). Frames will be sent synchronously by 'display_frame' again.
+        """
+        if self.sender is not None:
+            sender = self.sender
+            self.sender = None
+            sender.stop()
+
+    def get_sender_stats(self):
+        """Returns a dictionary with the number of frames submitted to, sent by and dropped by the display sender
+        thread. Returns None if sender thread is not running.
+        """
+        if self.sender is None:
+            return None
+        return self.sender.get_stats()
+
+    def start_keep_alive_thread(self, interval=DISPLAY_KEEP_ALIVE_INTERVAL):
+        """Start a thread which re-sends the last prepared frame to Push2 display whenever no frame has been sent in the
+        last 'interval' seconds (see 'DisplayKeepAlive'). Push2 display goes black if it does not receive frames for 2
+        seconds, so with the keep-alive thread running apps only need to display frames when their contents change.
+        """
+        self.stop_keep_alive_thread()
+        self.keep_alive = DisplayKeepAlive(self, interval=interval)
+        self.keep_alive.start()
+
+    def stop_keep_alive_thread(self):
+        if self.keep_alive is not None:
+            keep_alive = self.keep_alive
+            self.keep_alive = None
+            keep_alive.stop()
+
+    def get_keep_alive_stats(self):
+        """Returns a dictionary with the keep-alive interval and the number of frames re-sent by the keep-alive thread,
+        or None if the keep-alive thread is not running.
+        """
+        if self.keep_alive is None:
+            return None
+        return self.keep_alive.get_stats()
+
+    def start_server(self, address=DISPLAY_SERVER_DEFAULT_ADDRESS, authkey=None, n_buffers=DISPLAY_SERVER_N_BUFFERS):
+        """Start a display server so that other local processes can draw in Push2 display using
+        'push2_python.display_server.DisplayClient'. Frames are shared through a shared memory block of 'n_buffers'
+        BGR565 frames (160x960, row major layout) so they are never copied between processes. The server displays the
+        newest frame flipped by a client. If the keep-alive thread is not running, it is started with the server (and
+        stopped with it) so the display does not go black (see 'start_keep_alive_thread').
+        'address' and 'authkey' are those of the control channel (see 'multiprocessing.connection.Listener'). By
+        default the server listens on a Unix socket only accessible by the current user. If a TCP address is given
+        without authkey, a random one is generated (available as 'server.authkey') and must be passed to clients.
+        See 'get_server_stats' for the number of flipped, displayed and dropped frames.
+        """
+        self.stop_server()
+        self.server = DisplayServer(self, address=address, authkey=authkey, n_buffers=n_buffers,
+                                    keep_alive_interval=self.keep_alive_interval)
+        self.server.start()
+
+    def stop_server(self):
+        if self.server is not None:
+            server = self.server
+            self.server = None
+            server.stop()
+
+    def get_server_stats(self):
+        """Returns a dictionary with display server statistics (see 'DisplayServer.get_stats'), or None if the display
+        server is not running.
+        """
+        if self.server is None:
+            return None
+        return self.server.get_stats()
+
+    def start_connection_watcher(self, use_hotplug=True):
+        """Start a background thread which connects to Push2 display when it becomes available, instead of scanning
+        the USB bus from 'send_to_display' every time a frame is sent while the display is disconnected. While the
+        display is disconnected, sending frames does nothing. If 'use_hotplug' is True and libusb hotplug notifications
+        are available (requires 'libusb1' package), the watcher waits for Push2 to be plugged in. Otherwise, it tries
+        to connect periodically with exponential backoff. Note that ACTION_DISPLAY_CONNECTED will be triggered from
+        the watcher thread.
+        """
+        if self.connection_watcher is None:
+            self.connection_watcher = DisplayConnectionWatcher(self, use_hotplug=use_hotplug)
+            self.connection_watcher.start()
+
+    def stop_connection_watcher(self):
+        """Stop the display connection watcher thread (if running). Display will be reconnected from 'send_to_display'
+        again.
+        """
+        if self.connection_watcher is not None:
+            connection_watcher = self.connection_watcher
+            self.connection_watcher = None
+            connection_watcher.stop()
+
+    def enable_timing_stats(self, window=DISPLAY_TIMING_STATS_WINDOW, frame_callback=None):
+        """Keep rolling histograms of the time spent in each stage of preparing and sending frames (see 'stats').
+        The durations of the last 'window' frames are kept for each stage. If 'frame_callback' is given, it is called
+        every time a frame is sent with a dictionary with the duration (in seconds) of each of the stages of that frame.
+        Note that the callback is called from the thread which sends frames (which can be the display sender thread).
+        When timing stats are not enabled, no timing is done at all.
+        """
+        self.timing_stats = DisplayTimingStats(window=window, frame_callback=frame_callback)
+
+    def disable_timing_stats(self):
+        self.timing_stats = None
+
+    def stats(self):
+        """Returns a snapshot of the display statistics as a dictionary with the following keys:
+            * connected: whether Push2 display is currently connected
+            * usb_errors, usb_timeouts: number of USB errors (and how many of them were timeouts) while sending frames
+            * reconnects: number of times the display was connected again after the first connection
+            * stages: if timing stats are enabled (see 'enable_timing_stats'), a dictionary with the timing statistics
+              of each stage (see 'RollingHistogram.get_stats'), in seconds. Stages are 'prepare' (the whole frame
+              preparation), 'convert' (color conversion), 'upscale' (only for reduced resolution frames) and 'xor'
+              (filler and XOR pattern), and 'send' (the whole frame transfer), 'header' and 'bulk' (transfer of the
+              frame header and of the frame data). Conversion and XOR stages are not timed when frames are prepared
+              with parallel conversion. Empty dictionary if timing stats are not enabled.
+            * histogram_bounds: upper bounds (in seconds) of the histogram buckets of the stages
+            * skip, sender, keep_alive, frame_clock, frame_cache, server, connection_watcher: the statistics of these features
+              (see 'get_skip_stats', 'get_sender_stats', etc.), None if the feature is not enabled
+        """
+        return {
+            'connected': self.usb_endpoint is not None,
+            'usb_errors': self.n_usb_errors,
+            'usb_timeouts': self.n_usb_timeouts,
+            'reconnects': max(0, self.n_connections - 1),
+            'stages': self.timing_stats.get_stats() if self.timing_stats is not None else {},
+            'histogram_bounds': list(DISPLAY_TIMING_HISTOGRAM_BOUNDS),
+            'skip': self.get_skip_stats() if self.skip_identical_frames else None,
+            'sender': self.get_sender_stats(),
+            'keep_alive': self.get_keep_alive_stats(),
+            'frame_clock': self.get_frame_clock_stats(),
+            'frame_cache': self.get_frame_cache_stats(),
+            'server': self.get_server_stats(),
+            'connection_watcher': self.connection_watcher.get_stats() if self.connection_watcher is not None else None,
+        }
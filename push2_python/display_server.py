@@ -0,0 +1,352 @@
+import logging
+import os
+import socket
+import stat
+import struct
+import tempfile
+import threading
+import numpy
+from multiprocessing import AuthenticationError, resource_tracker, shared_memory
+from multiprocessing.connection import Listener, Client
+from .constants import DISPLAY_N_LINES, DISPLAY_LINE_PIXELS, DISPLAY_PIXEL_BYTES, FRAME_FORMAT_BGR565, \
+    FRAME_LAYOUT_ROW_MAJOR, DISPLAY_KEEP_ALIVE_INTERVAL, DISPLAY_SERVER_DEFAULT_ADDRESS, DISPLAY_SERVER_TCP_ADDRESS, \
+    DISPLAY_SERVER_SOCKET_NAME, DISPLAY_SERVER_AUTHKEY_SIZE, DISPLAY_SERVER_N_BUFFERS
+
+SHARED_FRAME_SHAPE = (DISPLAY_N_LINES, DISPLAY_LINE_PIXELS)
+SHARED_FRAME_SIZE = DISPLAY_N_LINES * DISPLAY_LINE_PIXELS * DISPLAY_PIXEL_BYTES
+
+# Messages between server and clients have a fixed binary format (they are never pickled, so a client can not make
+# the server run arbitrary code and vice versa):
+#   * Server info (server to client, once connected): number of buffers, index of the client's first buffer and name
+#     of the shared memory block (UTF-8, rest of the message).
+#   * Flip (client to server): index of the flipped buffer.
+#   * Buffer (server to client, reply to flip): index of the client's next buffer.
+SERVER_INFO_MESSAGE = struct.Struct('<II')
+BUFFER_INDEX_MESSAGE = struct.Struct('<I')
+MAX_MESSAGE_SIZE = 1024
+
+
+def get_default_address():
+    """Returns the default address of the display server: a Unix socket in a directory only accessible by the
+    current user ($XDG_RUNTIME_DIR if set, otherwise a 'push2-python-<uid>' directory in the temporary directory), or
+    DISPLAY_SERVER_TCP_ADDRESS if Unix sockets are not available.
+    """
+    if not hasattr(socket, 'AF_UNIX') or not hasattr(os, 'getuid'):
+        return DISPLAY_SERVER_TCP_ADDRESS
+    directory = os.environ.get('XDG_RUNTIME_DIR', None)
+    if not directory:
+        directory = os.path.join(tempfile.gettempdir(), 'push2-python-{0}'.format(os.getuid()))
+    return os.path.join(directory, DISPLAY_SERVER_SOCKET_NAME)
+
+
+def is_unix_socket_address(address):
+    return isinstance(address, str) and not address.startswith('\\\\')  # Windows named pipes start with two backslashes
+
+
+def make_private_socket_directory(directory):
+    """Creates the directory of a Unix socket (if needed) and checks that only the current user can access it.
+    """
+    os.makedirs(directory, mode=0o700, exist_ok=True)
+    directory_stat = os.stat(directory)
+    if directory_stat.st_uid != os.getuid() or directory_stat.st_mode & (stat.S_IRWXG | stat.S_IRWXO):
+        raise PermissionError('Display server socket directory {0} must be owned by the current user and not '
+                              'accessible by other users'.format(directory))
+
+
+def remove_stale_socket(path):
+    """Removes the Unix socket at 'path' if no server is listening on it (e.g. left behind by a crashed process).
+    """
+    if not os.path.exists(path):
+        return
+    test_socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        test_socket.connect(path)
+    except ConnectionRefusedError:
+        os.unlink(path)
+    except OSError:
+        pass
+    finally:
+        test_socket.close()
+
+
+def make_shared_frames(shared_memory_block, n_buffers):
+    return [numpy.ndarray(SHARED_FRAME_SHAPE, dtype=numpy.uint16, buffer=shared_memory_block.buf,
+                          offset=i * SHARED_FRAME_SIZE) for i in range(0, n_buffers)]
+
+
+def attach_shared_memory(name):
+    """Maps an existing shared memory block without registering it in this process' resource tracker (otherwise the
+    block would be destroyed when this process exits, even though it is owned by the display server).
+    """
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)  # Python >= 3.13
+    except TypeError:
+        block = shared_memory.SharedMemory(name=name)
+        try:
+            resource_tracker.unregister(block._name, 'shared_memory')
+        except Exception:
+            pass
+        return block
+
+
+def shutdown_connection(connection):
+    """Shuts down the socket of a connection so that threads blocked receiving from it are woken up.
+    """
+    try:
+        connection_socket = socket.socket(fileno=os.dup(connection.fileno()))  # Address family is detected from fd
+        connection_socket.shutdown(socket.SHUT_RDWR)
+        connection_socket.close()
+    except (OSError, ValueError):
+        pass
+
+
+def close_shared_memory(shared_memory_block):
+    try:
+        shared_memory_block.close()
+    except BufferError:
+        # Some frame arrays are still referenced, memory will be unmapped when they are garbage collected
+        pass
+
+
+class DisplayServer(object):
+    """Lets other local processes draw in Push2 display without copying frames between processes. The server
+    allocates 'n_buffers' BGR565 frames (shape 160x960, row major layout) in a shared memory block and listens for
+    clients in 'address' (see 'DisplayClient'). Clients map the shared memory, draw in the buffer they have been
+    given and "flip" it. Flipping publishes the buffer as the newest frame and gives the client a different buffer
+    to draw the next frame in. The server displays the newest published frame (frames published while the server was
+    still busy with the previous one are dropped). If the display keep-alive thread is not running (see
+    'Push2Display.start_keep_alive_thread'), the server starts it with 'keep_alive_interval' so that the last frame is
+    re-sent when clients stop publishing frames and the display does not go black.
+
+    A buffer is never given to a client while it is being displayed or while it is the newest published frame,
+    so with the default of 3 buffers one client never has to wait to get a buffer.
+
+    By default the server listens on a Unix socket only accessible by the current user (see 'get_default_address').
+    If 'address' is a TCP address and no 'authkey' is given, a random authkey is generated ('authkey' attribute),
+    which clients need to connect.
+    """
+
+    def __init__(self, display, address=DISPLAY_SERVER_DEFAULT_ADDRESS, authkey=None,
+                 n_buffers=DISPLAY_SERVER_N_BUFFERS, keep_alive_interval=DISPLAY_KEEP_ALIVE_INTERVAL):
+        assert n_buffers >= 2, 'Display server needs at least 2 buffers'
+        if address is None:
+            address = get_default_address()
+        if authkey is None and not is_unix_socket_address(address):
+            authkey = os.urandom(DISPLAY_SERVER_AUTHKEY_SIZE)
+        self.display = display
+        self.address = address
+        self.authkey = authkey
+        self.n_buffers = n_buffers
+        self.keep_alive_interval = keep_alive_interval
+        self.shared_memory = None
+        self.frames = []
+        self.listener = None
+        self.condition = threading.Condition()
+        self.stopped = False
+        self.free_buffers = []
+        self.newest_buffer = None
+        self.connections = []
+        self.threads = []
+        self.n_frames_flipped = 0
+        self.n_frames_displayed = 0
+        self.n_frames_dropped = 0
+        self.started_keep_alive = False
+
+    def start(self):
+        if is_unix_socket_address(self.address):
+            make_private_socket_directory(os.path.dirname(os.path.abspath(self.address)))
+            remove_stale_socket(self.address)
+        self.shared_memory = shared_memory.SharedMemory(create=True, size=self.n_buffers * SHARED_FRAME_SIZE)
+        self.frames = make_shared_frames(self.shared_memory, self.n_buffers)
+        for frame in self.frames:
+            frame.fill(0)
+        self.free_buffers = list(range(0, self.n_buffers))
+        self.newest_buffer = None
+        self.stopped = False
+        self.listener = Listener(self.address, authkey=self.authkey)
+        self.address = self.listener.address  # In case address was chosen by the OS
+        if is_unix_socket_address(self.address):
+            os.chmod(self.address, stat.S_IRUSR | stat.S_IWUSR)
+        self.threads = [threading.Thread(target=self.accept_clients, daemon=True),
+                        threading.Thread(target=self.run, daemon=True)]
+        for thread in self.threads:
+            thread.start()
+        if self.display.keep_alive is None:
+            self.display.start_keep_alive_thread(interval=self.keep_alive_interval)
+            self.started_keep_alive = True
+
+    def stop(self):
+        if self.started_keep_alive:
+            self.display.stop_keep_alive_thread()
+            self.started_keep_alive = False
+        with self.condition:
+            self.stopped = True
+            self.condition.notify_all()
+        try:
+            Client(self.address, authkey=self.authkey).close()  # Wake up thread waiting for new clients
+        except Exception:
+            pass
+        self.listener.close()
+        for connection in list(self.connections):
+            shutdown_connection(connection)
+        for thread in self.threads:
+            if thread is not threading.current_thread():
+                thread.join()
+        self.threads = []
+        self.frames = []
+        close_shared_memory(self.shared_memory)
+        self.shared_memory.unlink()
+        self.shared_memory = None
+
+    def accept_clients(self):
+        while not self.stopped:
+            try:
+                connection = self.listener.accept()
+            except AuthenticationError as e:
+                logging.error('Display client failed to authenticate: {0}'.format(e))
+                continue
+            except (OSError, EOFError) as e:
+                if not self.stopped:
+                    logging.error('Error accepting display client connection: {0}'.format(e))
+                    continue
+                break
+            if self.stopped:
+                connection.close()
+                break
+            self.connections.append(connection)
+            thread = threading.Thread(target=self.handle_client, args=(connection, ), daemon=True)
+            self.threads.append(thread)
+            thread.start()
+
+    def acquire_buffer(self):
+        """Waits for a free buffer and returns its index, or None if server was stopped.
+        """
+        with self.condition:
+            while not self.free_buffers and not self.stopped:
+                self.condition.wait()
+            if self.stopped:
+                return None
+            return self.free_buffers.pop()
+
+    def release_buffer(self, index):
+        with self.condition:
+            self.free_buffers.append(index)
+            self.condition.notify_all()
+
+    def flip(self, index):
+        with self.condition:
+            if self.newest_buffer is not None:
+                # Previous frame was not displayed yet, replace it with the new one
+                self.free_buffers.append(self.newest_buffer)
+                self.n_frames_dropped += 1
+            self.newest_buffer = index
+            self.n_frames_flipped += 1
+            self.condition.notify_all()
+
+    def handle_client(self, connection):
+        buffer_index = self.acquire_buffer()
+        try:
+            if buffer_index is None:
+                return
+            connection.send_bytes(SERVER_INFO_MESSAGE.pack(self.n_buffers, buffer_index) +
+                                  self.shared_memory.name.encode('utf-8'))
+            while True:
+                message = connection.recv_bytes(MAX_MESSAGE_SIZE)
+                if len(message) != BUFFER_INDEX_MESSAGE.size or BUFFER_INDEX_MESSAGE.unpack(message)[0] != buffer_index:
+                    logging.error('Invalid display client message: {0}'.format(message))
+                    break
+                self.flip(buffer_index)
+                buffer_index = self.acquire_buffer()
+                if buffer_index is None:
+                    break
+                connection.send_bytes(BUFFER_INDEX_MESSAGE.pack(buffer_index))
+        except (EOFError, OSError):
+            pass  # Client disconnected
+        finally:
+            if buffer_index is not None:
+                self.release_buffer(buffer_index)
+            self.connections.remove(connection)
+            connection.close()
+
+    def run(self):
+        while True:
+            with self.condition:
+                while self.newest_buffer is None and not self.stopped:
+                    self.condition.wait()
+                if self.stopped:
+                    break
+                index = self.newest_buffer
+                self.newest_buffer = None
+            try:
+                self.display.display_frame(self.frames[index], input_format=FRAME_FORMAT_BGR565,
+                                           layout=FRAME_LAYOUT_ROW_MAJOR)
+                self.n_frames_displayed += 1
+            except Exception as e:
+                logging.error('Error displaying frame from display client: {0}'.format(e))
+            finally:
+                self.release_buffer(index)
+
+    def get_stats(self):
+        """Returns a dictionary with the number of connected clients, and the number of frames flipped by clients,
+        displayed and dropped (replaced by a newer frame before being displayed). Frames re-sent to keep the display on
+        are counted by the display keep-alive thread (see 'Push2Display.get_keep_alive_stats').
+        """
+        with self.condition:
+            return {
+                'clients': len(self.connections),
+                'frames_flipped': self.n_frames_flipped,
+                'frames_displayed': self.n_frames_displayed,
+                'frames_dropped': self.n_frames_dropped,
+            }
+
+
+class DisplayClient(object):
+    """Connects to a DisplayServer (possibly running in another process) to draw in Push2 display. 'frame' is a uint16
+    array of shape 160x960 (BGR565 colors, row major layout) which lives in memory shared with the server. Draw the
+    whole frame in it and call 'flip' to display it. 'flip' returns the array where the next frame should be drawn
+    (also available as 'frame'), which does not contain the frame that was just flipped, so it must be fully redrawn.
+    Frame arrays must not be used after calling 'flip' or 'close'. 'address' and 'authkey' must be those of the
+    server (the server's default address needs no authkey, see 'DisplayServer').
+
+    Example:
+
+        client = DisplayClient()
+        while True:
+            client.frame[:] = render_my_frame()  # Or draw in client.frame directly
+            client.flip()
+    """
+
+    def __init__(self, address=DISPLAY_SERVER_DEFAULT_ADDRESS, authkey=None):
+        if address is None:
+            address = get_default_address()
+        self.connection = Client(address, authkey=authkey)
+        message = self.connection.recv_bytes(MAX_MESSAGE_SIZE)
+        n_buffers, self.buffer_index = SERVER_INFO_MESSAGE.unpack_from(message)
+        if not 0 <= self.buffer_index < n_buffers:
+            raise ValueError('Invalid display server message')
+        self.shared_memory = attach_shared_memory(message[SERVER_INFO_MESSAGE.size:].decode('utf-8'))
+        self.frames = make_shared_frames(self.shared_memory, n_buffers)
+
+    @property
+    def frame(self):
+        return self.frames[self.buffer_index]
+
+    def flip(self):
+        self.connection.send_bytes(BUFFER_INDEX_MESSAGE.pack(self.buffer_index))
+        message = self.connection.recv_bytes(MAX_MESSAGE_SIZE)
+        buffer_index = BUFFER_INDEX_MESSAGE.unpack(message)[0]
+        if not 0 <= buffer_index < len(self.frames):
+            raise ValueError('Invalid display server message')
+        self.buffer_index = buffer_index
+        return self.frame
+
+    def close(self):
+        self.connection.close()
+        self.frames = []
+        close_shared_memory(self.shared_memory)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
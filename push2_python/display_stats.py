@@ -0,0 +1,81 @@
+import logging
+import threading
+import numpy
+from .constants import DISPLAY_TIMING_STATS_WINDOW, DISPLAY_TIMING_HISTOGRAM_BOUNDS
+
+
+class RollingHistogram(object):
+    """Keeps the last 'window' durations (in seconds) in a ring buffer. Adding a duration only writes it in the ring
+    buffer, percentiles and histogram counts are computed when 'get_stats' is called.
+    """
+
+    def __init__(self, window=DISPLAY_TIMING_STATS_WINDOW, bounds=DISPLAY_TIMING_HISTOGRAM_BOUNDS):
+        self.durations = numpy.zeros(window, dtype=numpy.float64)
+        self.bounds = numpy.array(bounds, dtype=numpy.float64)
+        self.n_durations = 0
+
+    def add(self, duration):
+        self.durations[self.n_durations % len(self.durations)] = duration
+        self.n_durations += 1
+
+    def get_stats(self):
+        """Returns a dictionary with the total number of durations added ('count'), and the mean, percentiles and
+        maximum of the durations in the window. 'histogram' has the number of durations in the window which are lower
+        than each of the histogram bounds (and higher than the previous bound), plus the number of durations higher
+        than the last bound.
+        """
+        durations = self.durations[0:min(self.n_durations, len(self.durations))]
+        if len(durations) == 0:
+            return {'count': 0, 'mean': 0.0, 'p50': 0.0, 'p90': 0.0, 'p99': 0.0, 'max': 0.0,
+                    'histogram': [0] * (len(self.bounds) + 1)}
+        p50, p90, p99 = numpy.percentile(durations, [50, 90, 99])
+        histogram = numpy.bincount(numpy.searchsorted(self.bounds, durations), minlength=len(self.bounds) + 1)
+        return {
+            'count': self.n_durations,
+            'mean': float(durations.mean()),
+            'p50': float(p50),
+            'p90': float(p90),
+            'p99': float(p99),
+            'max': float(durations.max()),
+            'histogram': histogram.tolist(),
+        }
+
+
+class DisplayTimingStats(object):
+    """Collects the durations of the stages of preparing and sending frames to Push2 display in a RollingHistogram per
+    stage. Stages are identified by name (e.g. 'convert', 'xor', 'header', 'bulk'). If 'frame_callback' is given, it is
+    called after each frame is sent with a dictionary of the durations of the stages of that frame.
+    """
+
+    def __init__(self, window=DISPLAY_TIMING_STATS_WINDOW, frame_callback=None):
+        self.window = window
+        self.frame_callback = frame_callback
+        self.histograms = {}
+        self.frame_durations = {}
+        self.lock = threading.Lock()
+
+    def add(self, stage, duration):
+        with self.lock:
+            histogram = self.histograms.get(stage, None)
+            if histogram is None:
+                histogram = RollingHistogram(window=self.window)
+                self.histograms[stage] = histogram
+            histogram.add(duration)
+            self.frame_durations[stage] = duration
+
+    def end_frame(self):
+        """Called when a frame has been sent. Calls the frame callback (if any) with the durations of the stages
+        recorded since the previous frame was sent.
+        """
+        with self.lock:
+            frame_durations = self.frame_durations
+            self.frame_durations = {}
+        if self.frame_callback is not None:
+            try:
+                self.frame_callback(frame_durations)
+            except Exception as e:
+                logging.error('Error in display timing frame callback: {0}'.format(e))
+
+    def get_stats(self):
+        with self.lock:
+            return {stage: histogram.get_stats() for stage, histogram in self.histograms.items()}
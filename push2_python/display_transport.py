@@ -0,0 +1,235 @@
+import usb.core
+import usb.util
+import collections
+import functools
+import time
+from .constants import ABLETON_VENDOR_ID, PUSH2_PRODUCT_ID, USB_TRANSFER_TIMEOUT, DISPLAY_FRAME_HEADER, \
+    DISPLAY_BUFFER_SIZE, DISPLAY_N_TRANSFERS_IN_FLIGHT, PUSH2_DISPLAY_ENDPOINT_ADDRESS, PUSH2_DISPLAY_INTERFACE_NUMBER
+
+try:
+    import usb1  # python-libusb1, only needed for asynchronous transfers
+except ImportError:
+    usb1 = None
+
+
+def async_transfers_available():
+    """Returns True if the libusb asynchronous API can be used from Python (i.e. 'libusb1' package is installed).
+    """
+    return usb1 is not None
+
+
+class PyUSBDisplayTransport(object):
+    """Sends frames to Push2 display using pyusb synchronous bulk writes: first the frame header is written
+    and then the whole prepared frame is written at once.
+    """
+
+    def __init__(self, usb_endpoint):
+        self.usb_endpoint = usb_endpoint
+
+    def send_frame(self, prepared_frame, timing_stats=None):
+        if timing_stats is not None:
+            start_time = time.perf_counter()
+        self.usb_endpoint.write(DISPLAY_FRAME_HEADER, USB_TRANSFER_TIMEOUT)
+        if timing_stats is not None:
+            header_end_time = time.perf_counter()
+            timing_stats.add('header', header_end_time - start_time)
+        # NOTE: there seems to be no need to send the frame in chunks of DISPLAY_BUFFER_SIZE when using
+        # synchronous writes (and doing it in addition to the whole frame results in frames sent twice!)
+        self.usb_endpoint.write(prepared_frame, USB_TRANSFER_TIMEOUT)
+        if timing_stats is not None:
+            timing_stats.add('bulk', time.perf_counter() - header_end_time)
+
+    def close(self):
+        pass
+
+
+class AsyncDisplayTransport(object):
+    """Sends frames to Push2 display keeping several bulk transfers in flight at the same time, as recommended in
+    the Push2 display interface specification. Each frame is sent as a header transfer followed by transfers of
+    DISPLAY_BUFFER_SIZE bytes. Frame data is copied to buffers owned by the transport, so 'send_frame' returns as
+    soon as all transfers of the frame have been submitted and the prepared frame can be reused right away.
+
+    The actual transfers are done by a 'backend' object implementing the following methods:
+
+        * submit(data, callback): start a bulk transfer of 'data' and call 'callback(success)' when it finishes
+        * handle_events(): wait for transfers to finish (calling their callbacks) for a short amount of time
+        * close(): cancel pending transfers and release resources
+
+    See Libusb1TransferBackend (real device) and FakeTransferBackend (no device needed).
+    See https://github.com/Ableton/push-interface/blob/master/doc/AbletonPush2MIDIDisplayInterface.asc#326-allocating-libusb-transfers
+    """
+
+    def __init__(self, backend, n_transfers=DISPLAY_N_TRANSFERS_IN_FLIGHT):
+        self.backend = backend
+        self.n_transfers = n_transfers
+        self.header = bytearray(DISPLAY_FRAME_HEADER)
+        self.free_buffers = [bytearray(DISPLAY_BUFFER_SIZE) for _ in range(0, n_transfers)]
+        self.n_transfers_in_flight = 0
+        self.n_failed_transfers = 0
+        self.n_frames_sent = 0
+        self.n_bytes_sent = 0
+
+    def on_transfer_done(self, buffer, success):
+        self.n_transfers_in_flight -= 1
+        if buffer is not self.header:
+            self.free_buffers.append(buffer)
+        if success:
+            self.n_bytes_sent += len(buffer)
+        else:
+            self.n_failed_transfers += 1
+
+    def check_failed_transfers(self):
+        if self.n_failed_transfers:
+            # Report failed transfers so display object can handle disconnection
+            self.n_failed_transfers = 0
+            raise usb.core.USBError('Push2 display transfer failed')
+
+    def wait_for_free_transfer(self):
+        while self.n_transfers_in_flight >= self.n_transfers:
+            self.backend.handle_events()
+        self.check_failed_transfers()
+
+    def submit(self, buffer):
+        self.n_transfers_in_flight += 1
+        try:
+            self.backend.submit(buffer, functools.partial(self.on_transfer_done, buffer))
+        except usb.core.USBError:
+            self.n_transfers_in_flight -= 1
+            if buffer is not self.header:
+                self.free_buffers.append(buffer)
+            raise
+
+    def send_frame(self, prepared_frame, timing_stats=None):
+        """Submits the transfers of the given frame. If 'timing_stats' is given, the time spent waiting for a free
+        transfer and submitting the header ('header') and the rest of the frame ('bulk') is added to it. Note that
+        transfers complete asynchronously, so these are not the times of the actual USB transfers. Raises
+        usb.core.USBError if any transfer failed, including transfers of this frame which failed while it was being
+        submitted (failures of the last transfers of a frame are raised by the next 'send_frame' or 'flush' call).
+        """
+        if timing_stats is not None:
+            start_time = time.perf_counter()
+        frame_data = memoryview(prepared_frame).cast('B')
+        self.wait_for_free_transfer()
+        self.submit(self.header)
+        if timing_stats is not None:
+            header_end_time = time.perf_counter()
+            timing_stats.add('header', header_end_time - start_time)
+        for i in range(0, len(frame_data), DISPLAY_BUFFER_SIZE):
+            self.wait_for_free_transfer()
+            buffer = self.free_buffers.pop()
+            buffer[:] = frame_data[i:i + DISPLAY_BUFFER_SIZE]
+            self.submit(buffer)
+        if timing_stats is not None:
+            timing_stats.add('bulk', time.perf_counter() - header_end_time)
+        self.n_frames_sent += 1
+        self.check_failed_transfers()
+
+    def flush(self):
+        """Wait until all submitted transfers have finished. Raises usb.core.USBError if any transfer failed.
+        """
+        while self.n_transfers_in_flight > 0:
+            self.backend.handle_events()
+        self.check_failed_transfers()
+
+    def close(self):
+        self.backend.close()
+        self.n_transfers_in_flight = 0
+
+
+class Libusb1TransferBackend(object):
+    """Transfer backend for AsyncDisplayTransport which uses libusb's asynchronous API through the 'libusb1' Python
+    package. It opens Push2 USB device and claims the display interface, so make sure no other handle to the device
+    has the interface claimed.
+    """
+
+    def __init__(self, n_transfers=DISPLAY_N_TRANSFERS_IN_FLIGHT):
+        self.context = usb1.USBContext()
+        self.handle = self.context.openByVendorIDAndProductID(ABLETON_VENDOR_ID, PUSH2_PRODUCT_ID)
+        if self.handle is None:
+            self.context.close()
+            raise usb.core.USBError('Push2 USB device not found')
+        self.handle.claimInterface(PUSH2_DISPLAY_INTERFACE_NUMBER)
+        # One extra transfer for the frame header
+        self.transfers = [self.handle.getTransfer() for _ in range(0, n_transfers + 1)]
+        self.free_transfers = list(self.transfers)
+        self.callbacks = {}
+
+    def on_transfer_done(self, transfer):
+        self.free_transfers.append(transfer)
+        callback = self.callbacks.pop(id(transfer))
+        callback(transfer.getStatus() == usb1.TRANSFER_COMPLETED)
+
+    def submit(self, data, callback):
+        transfer = self.free_transfers.pop()
+        transfer.setBulk(PUSH2_DISPLAY_ENDPOINT_ADDRESS, data, callback=self.on_transfer_done, timeout=USB_TRANSFER_TIMEOUT)
+        self.callbacks[id(transfer)] = callback
+        try:
+            transfer.submit()
+        except usb1.USBError as e:
+            self.callbacks.pop(id(transfer))
+            self.free_transfers.append(transfer)
+            raise usb.core.USBError(str(e))
+
+    def handle_events(self):
+        try:
+            self.context.handleEventsTimeout(tv=USB_TRANSFER_TIMEOUT / 1000)
+        except usb1.USBError as e:
+            raise usb.core.USBError(str(e))
+
+    def close(self):
+        for transfer in self.transfers:
+            if transfer.isSubmitted():
+                transfer.cancel()
+        try:
+            self.handle.releaseInterface(PUSH2_DISPLAY_INTERFACE_NUMBER)
+            self.handle.close()
+        except usb1.USBError:
+            pass
+        self.context.close()
+
+
+class FakeTransferBackend(object):
+    """Transfer backend for AsyncDisplayTransport which does not need a Push2 device. Transfers are completed in
+    submission order as if they were sent through a bus which needs 'transfer_time' seconds to complete each transfer.
+    This can be used to test and measure the display transport without hardware. If 'record_data' is set to True,
+    the data of all transfers will be appended to 'received_data'. Transfers can be made to fail by setting
+    'fail_transfers' to True. 'max_pending' is the maximum number of transfers which were in flight at the same time.
+    """
+
+    def __init__(self, transfer_time=0.0, record_data=False):
+        self.transfer_time = transfer_time
+        self.record_data = record_data
+        self.fail_transfers = False
+        self.received_data = bytearray()
+        self.n_transfers = 0
+        self.n_bytes = 0
+        self.max_pending = 0
+        self.pending = collections.deque()
+        self.last_completion_time = 0
+
+    def submit(self, data, callback):
+        completion_time = max(self.last_completion_time, time.monotonic()) + self.transfer_time
+        self.last_completion_time = completion_time
+        self.pending.append((completion_time, bytes(data) if self.record_data else len(data), callback))
+        self.max_pending = max(self.max_pending, len(self.pending))
+
+    def handle_events(self):
+        if not self.pending:
+            return
+        completion_time, data, callback = self.pending.popleft()
+        wait_time = completion_time - time.monotonic()
+        if wait_time > 0:
+            time.sleep(wait_time)
+        if self.fail_transfers:
+            callback(False)
+            return
+        self.n_transfers += 1
+        if self.record_data:
+            self.received_data += data
+            self.n_bytes += len(data)
+        else:
+            self.n_bytes += data
+        callback(True)
+
+    def close(self):
+        self.pending.clear()
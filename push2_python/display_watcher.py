@@ -0,0 +1,142 @@
+import logging
+import threading
+import time
+import usb.core
+from .exceptions import Push2USBDeviceConfigurationError, Push2USBDeviceNotFound
+from .constants import ABLETON_VENDOR_ID, PUSH2_PRODUCT_ID, DISPLAY_RECONNECT_MIN_INTERVAL, \
+    DISPLAY_RECONNECT_MAX_INTERVAL
+
+try:
+    import usb1  # python-libusb1, only needed for hotplug notifications
+except ImportError:
+    usb1 = None
+
+
+def hotplug_available():
+    """Returns True if libusb hotplug notifications can be used from Python (i.e. 'libusb1' package is installed and
+    libusb supports hotplug in this platform).
+    """
+    if usb1 is None:
+        return False
+    try:
+        return bool(usb1.hasCapability(usb1.CAP_HAS_HOTPLUG))
+    except (AttributeError, OSError, usb1.USBError):  # OSError if libusb library can't be loaded
+        return False
+
+
+class DisplayConnectionWatcher(object):
+    """Connects Push2Display to Push2 USB device from a background thread whenever it is disconnected. Connection is
+    retried with exponential backoff from DISPLAY_RECONNECT_MIN_INTERVAL up to DISPLAY_RECONNECT_MAX_INTERVAL seconds
+    between attempts. If libusb hotplug notifications are available (and 'use_hotplug' is True), the USB bus is not
+    scanned periodically: once the backoff interval reaches its maximum (or right away if Push2 is not plugged in when
+    the watcher starts), the thread only waits until Push2 is plugged in, and then retries with backoff again as Push2
+    could still be starting. While connected, the thread just waits for 'notify_disconnected' to be called.
+    """
+
+    def __init__(self, display, use_hotplug=True, min_interval=DISPLAY_RECONNECT_MIN_INTERVAL,
+                 max_interval=DISPLAY_RECONNECT_MAX_INTERVAL):
+        self.display = display
+        self.use_hotplug = use_hotplug and hotplug_available()
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.hotplug_context = None
+        self.device_arrived = threading.Event()
+        self.disconnected = threading.Event()
+        self.stop_event = threading.Event()
+        self.thread = None
+        self.n_connection_attempts = 0
+        self.n_connections = 0
+
+    def start(self):
+        if self.use_hotplug:
+            self.hotplug_context = usb1.USBContext()
+            self.hotplug_context.hotplugRegisterCallback(
+                self.on_hotplug_event, events=usb1.HOTPLUG_EVENT_DEVICE_ARRIVED,
+                vendor_id=ABLETON_VENDOR_ID, product_id=PUSH2_PRODUCT_ID)
+        self.stop_event.clear()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.stop_event.set()
+        self.disconnected.set()  # Wake up thread if waiting while connected
+        if self.thread is not None and self.thread is not threading.current_thread():
+            self.thread.join()
+        self.thread = None
+        self.close_hotplug_context()
+
+    def notify_disconnected(self):
+        self.disconnected.set()
+
+    def on_hotplug_event(self, context, device, event):
+        # No USB I/O can be done inside libusb callbacks, connection happens in the watcher thread
+        self.device_arrived.set()
+        return False  # Keep callback registered
+
+    def wait_for_device(self, timeout=None):
+        """Waits until Push2 is plugged in (if hotplug is used) or for 'timeout' seconds. If 'timeout' is None, waits
+        until Push2 is plugged in or the watcher is stopped (only if hotplug is used). Returns True if Push2 was plugged
+        in. If hotplug events can't be handled, hotplug is disabled and the watcher falls back to polling.
+        """
+        if self.hotplug_context is None:
+            self.stop_event.wait(timeout if timeout is not None else self.max_interval)
+            return False
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        while not self.stop_event.is_set() and not self.device_arrived.is_set():
+            remaining = deadline - time.monotonic() if deadline is not None else 0.1
+            if remaining <= 0:
+                break
+            try:
+                self.hotplug_context.handleEventsTimeout(tv=min(remaining, 0.1))
+            except usb1.USBError as e:
+                logging.error('Error handling USB hotplug events, polling for Push2 instead: {0}'.format(e))
+                self.close_hotplug_context()
+                return False
+        arrived = self.device_arrived.is_set()
+        self.device_arrived.clear()
+        return arrived
+
+    def close_hotplug_context(self):
+        if self.hotplug_context is not None:
+            self.hotplug_context.close()
+            self.hotplug_context = None
+
+    def try_to_connect(self):
+        self.n_connection_attempts += 1
+        try:
+            self.display.connect_usb_device()
+        except (Push2USBDeviceNotFound, Push2USBDeviceConfigurationError, usb.core.USBError) as e:
+            logging.debug('Could not connect to Push 2 Display: {0}'.format(e))
+        return self.display.usb_endpoint is not None
+
+    def run(self):
+        # With hotplug, don't retry unless Push2 is plugged in or was just disconnected
+        interval = self.max_interval if self.hotplug_context is not None else self.min_interval
+        while not self.stop_event.is_set():
+            if self.display.usb_endpoint is not None:
+                self.disconnected.wait()
+                self.disconnected.clear()
+                interval = self.min_interval
+                continue
+
+            if self.try_to_connect():
+                self.n_connections += 1
+                continue
+
+            if self.hotplug_context is not None and interval >= self.max_interval:
+                # Push2 is not plugged in, wait for it without scanning the USB bus
+                if self.wait_for_device():
+                    interval = self.min_interval  # Push2 was just plugged in, retry soon as it could still be starting
+                continue
+
+            if self.wait_for_device(interval):
+                interval = self.min_interval  # Push2 was just plugged in, retry soon as it could still be starting
+            else:
+                interval = min(interval * 2, self.max_interval)
+
+    def get_stats(self):
+        return {
+            'hotplug': self.hotplug_context is not None,
+            'connection_attempts': self.n_connection_attempts,
+            'connections': self.n_connections,
+        }
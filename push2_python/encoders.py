@@ -1,6 +1,8 @@
 import mido
-from .constants import ANIMATION_DEFAULT, MIDO_CONTROLCHANGE, \
-    MIDO_NOTEON, MIDO_NOTEOFF, ACTION_ENCODER_ROTATED, ACTION_ENCODER_TOUCHED, ACTION_ENCODER_RELEASED
+import sys
+from .constants import ANIMATION_DEFAULT, \
+    ACTION_ENCODER_ROTATED, ACTION_ENCODER_TOUCHED, ACTION_ENCODER_RELEASED, \
+    MIDI_STATUS_CONTROLCHANGE, MIDI_STATUS_NOTEON, MIDI_STATUS_NOTEOFF, MIDI_ROUTE_COALESCE_INCREMENT
 from .classes import AbstractPush2Section
 
 
@@ -8,6 +10,40 @@ def get_individual_encoder_action_name(action_name, encoder_name):
         return '{0} - {1}'.format(action_name, encoder_name)
 
 
+def make_encoder_rotated_route(encoder_name):
+    """Returns a MIDI route (see 'push2_python.midi_routing') triggering the generic and individual encoder rotated
+    actions with the increment given by the CC value.
+    """
+    rotated_action_name = sys.intern(get_individual_encoder_action_name(ACTION_ENCODER_ROTATED, encoder_name))
+
+    def encoder_rotated_route(push, data1, data2):
+        increment = data2
+        if data2 > 63:
+            # Counter-clockwise movement, see https://github.com/Ableton/push-interface/blob/master/doc/AbletonPush2MIDIDisplayInterface.asc#Encoders
+            increment = -1 * (128 - data2)
+        push.trigger_action(ACTION_ENCODER_ROTATED, encoder_name, increment)  # Trigger generic rotate encoder action
+        push.trigger_action(rotated_action_name, increment)  # Trigger individual rotate encoder action as well
+    encoder_rotated_route.coalesce = MIDI_ROUTE_COALESCE_INCREMENT
+    return encoder_rotated_route
+
+
+def make_encoder_touch_route(encoder_name):
+    """Returns a MIDI route (see 'push2_python.midi_routing') triggering the generic and individual encoder touched
+    actions if the note velocity is 127, and the encoder released actions otherwise.
+    """
+    touched_action_name = sys.intern(get_individual_encoder_action_name(ACTION_ENCODER_TOUCHED, encoder_name))
+    released_action_name = sys.intern(get_individual_encoder_action_name(ACTION_ENCODER_RELEASED, encoder_name))
+
+    def encoder_touch_route(push, data1, data2):
+        if data2 == 127:
+            push.trigger_action(ACTION_ENCODER_TOUCHED, encoder_name)  # Trigger generic touch encoder action
+            push.trigger_action(touched_action_name)  # Trigger individual touch encoder action as well
+        else:
+            push.trigger_action(ACTION_ENCODER_RELEASED, encoder_name)
+            push.trigger_action(released_action_name)
+    return encoder_touch_route
+
+
 class Push2Encoders(AbstractPush2Section):
     """Class to interface with Ableton's Push2 encoders.
     See https://github.com/Ableton/push-interface/blob/master/doc/AbletonPush2MIDIDisplayInterface.asc#Encoders
@@ -39,25 +75,15 @@ class Push2Encoders(AbstractPush2Section):
         """
         return self.encoder_names_index.get(encoder_name, None)
 
-    def on_midi_message(self, message):
-        if message.type == MIDO_CONTROLCHANGE:  # Encoder rotated
-            if message.control in self.encoder_map:  # CC number corresponds to one of the encoders
-                if message.type == MIDO_CONTROLCHANGE:
-                    encoder = self.encoder_map[message.control]
-                    action = ACTION_ENCODER_ROTATED
-                    value = message.value
-                    if message.value > 63:
-                        # Counter-clockwise movement, see https://github.com/Ableton/push-interface/blob/master/doc/AbletonPush2MIDIDisplayInterface.asc#Encoders
-                        value = -1 * (128 - message.value)
-                    self.push.trigger_action(action, encoder['Name'], value)  # Trigger generic rotate encoder action
-                    self.push.trigger_action(get_individual_encoder_action_name(
-                        action, encoder['Name']), value)  # Trigger individual rotate encoder action as well
-                    return True
-        elif message.type in [MIDO_NOTEON, MIDO_NOTEOFF]:  # Encoder touched or released
-            if message.note in self.encoder_touch_map:  # Note number corresponds to one of the encoders in touch mode
-                encoder = self.encoder_touch_map[message.note]
-                action = ACTION_ENCODER_TOUCHED if message.velocity == 127 else ACTION_ENCODER_RELEASED
-                self.push.trigger_action(action, encoder['Name'])  # Trigger generic touch/release encoder action
-                self.push.trigger_action(get_individual_encoder_action_name(
-                    action, encoder['Name']))  # Trigger individual touch/release encoder action as well
-                return True
+    def get_midi_routes(self):
+        """Returns a dictionary with the MIDI routes of the messages handled by the encoders, keyed by
+        (status nibble, data1). See 'push2_python.midi_routing'.
+        """
+        routes = {}
+        for encoder_n, encoder in self.encoder_map.items():
+            routes[(MIDI_STATUS_CONTROLCHANGE, encoder_n)] = make_encoder_rotated_route(encoder['Name'])
+        for touch_n, encoder in self.encoder_touch_map.items():
+            encoder_touch_route = make_encoder_touch_route(encoder['Name'])
+            routes[(MIDI_STATUS_NOTEON, touch_n)] = encoder_touch_route
+            routes[(MIDI_STATUS_NOTEOFF, touch_n)] = encoder_touch_route
+        return routes
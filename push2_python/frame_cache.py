@@ -0,0 +1,95 @@
+import hashlib
+import numpy
+from collections import OrderedDict
+from .constants import DISPLAY_FRAME_CACHE_DEFAULT_MAX_BYTES
+
+try:
+    import xxhash  # Optional, much faster than hashlib for hashing frames
+except ImportError:
+    xxhash = None
+
+
+def hash_frame(frame):
+    """Returns a digest of the contents of the given numpy array. Uses xxhash's 128 bit XXH3 if the 'xxhash' package is
+    installed, and SHA1 otherwise (which is the fastest hashlib algorithm in most machines).
+    """
+    if not frame.flags.c_contiguous:
+        frame = numpy.ascontiguousarray(frame)
+    data = memoryview(frame).cast('B')
+    if xxhash is not None:
+        return xxhash.xxh3_128_digest(data)
+    return hashlib.sha1(data).digest()
+
+
+class PreparedFrameCache(object):
+    """LRU cache of prepared frames keyed by a hash of the contents of the source frame, its shape, type, format and
+    layout. When the total size of the cached prepared frames exceeds 'max_bytes', least recently used frames are
+    evicted. Prepared frames are stored as bytes objects.
+    """
+
+    def __init__(self, max_bytes=DISPLAY_FRAME_CACHE_DEFAULT_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.prepared_frames = OrderedDict()
+        self.n_bytes = 0
+        self.n_hits = 0
+        self.n_misses = 0
+        self.n_evictions = 0
+
+    def make_key(self, frame, input_format, layout):
+        return hash_frame(frame), frame.shape, frame.dtype.str, input_format, layout
+
+    def get(self, key):
+        """Returns the prepared frame cached for the given key (see 'make_key'), or None if it is not in the cache.
+        """
+        prepared_frame = self.prepared_frames.get(key, None)
+        if prepared_frame is None:
+            self.n_misses += 1
+            return None
+        self.n_hits += 1
+        self.prepared_frames.move_to_end(key)
+        return prepared_frame
+
+    def get_into(self, key, out):
+        """Copies the prepared frame cached for the given key to the 'out' buffer. Returns False if the frame is not in
+        the cache.
+        """
+        prepared_frame = self.get(key)
+        if prepared_frame is None:
+            return False
+        numpy.frombuffer(out, dtype=numpy.uint8)[:] = numpy.frombuffer(prepared_frame, dtype=numpy.uint8)
+        return True
+
+    def put(self, key, prepared_frame):
+        """Stores a copy of the given prepared frame in the cache, evicting least recently used frames if needed.
+        """
+        prepared_frame = bytes(prepared_frame)
+        if len(prepared_frame) > self.max_bytes:
+            return
+        previous = self.prepared_frames.pop(key, None)
+        if previous is not None:
+            self.n_bytes -= len(previous)
+        self.prepared_frames[key] = prepared_frame
+        self.n_bytes += len(prepared_frame)
+        while self.n_bytes > self.max_bytes:
+            _, evicted = self.prepared_frames.popitem(last=False)
+            self.n_bytes -= len(evicted)
+            self.n_evictions += 1
+
+    def clear(self):
+        self.prepared_frames.clear()
+        self.n_bytes = 0
+
+    def get_stats(self):
+        """Returns a dictionary with the number of cache hits, misses and evictions, the hit rate, and the number of
+        frames and bytes currently in the cache.
+        """
+        n_lookups = self.n_hits + self.n_misses
+        return {
+            'hits': self.n_hits,
+            'misses': self.n_misses,
+            'evictions': self.n_evictions,
+            'hit_rate': self.n_hits / n_lookups if n_lookups else 0.0,
+            'frames': len(self.prepared_frames),
+            'bytes': self.n_bytes,
+            'max_bytes': self.max_bytes,
+        }
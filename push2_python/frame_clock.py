@@ -0,0 +1,155 @@
+import collections
+import logging
+import math
+import threading
+import time
+from .constants import FRAME_FORMAT_BGR565, FRAME_LAYOUT_COLUMN_MAJOR, DISPLAY_FRAME_CLOCK_DEFAULT_FPS, \
+    DISPLAY_FRAME_CLOCK_MIN_FPS, DISPLAY_FRAME_CLOCK_STATS_WINDOW
+
+
+def mean(values):
+    return sum(values) / len(values) if values else 0.0
+
+
+class DisplayFrameClock(object):
+    """Calls a render function at a target frame rate and displays the returned frames in Push2 display.
+    Frames are scheduled at fixed monotonic deadlines (start time + n * frame period) so that the time spent rendering,
+    preparing and sending frames does not make the frame rate drift. If a frame takes longer than the frame period,
+    the deadlines that were missed are skipped instead of rendering several frames in a burst.
+
+    If 'adaptive' is True, the clock keeps an exponential moving average of the time it takes to send frames to Push2.
+    When it gets longer than the frame budget, the frame rate is lowered (down to 'min_fps') so that USB transfers do
+    not keep piling up. When sending gets faster again, the frame rate is progressively raised back to 'fps'.
+    """
+
+    send_duration_smoothing = 0.2
+    fps_decrease_margin = 1.1  # When lowering frame rate, leave 10% margin over the average send time
+    fps_increase_factor = 1.1
+    fps_increase_max_budget_usage = 0.5  # Only raise frame rate if send time is less than half the new budget
+
+    def __init__(self, display, render_function, fps=DISPLAY_FRAME_CLOCK_DEFAULT_FPS, input_format=FRAME_FORMAT_BGR565,
+                 layout=FRAME_LAYOUT_COLUMN_MAJOR, adaptive=True, min_fps=DISPLAY_FRAME_CLOCK_MIN_FPS):
+        self.display = display
+        self.render_function = render_function
+        self.target_fps = fps
+        self.current_fps = fps
+        self.min_fps = min(min_fps, fps)
+        self.input_format = input_format
+        self.layout = layout
+        self.adaptive = adaptive
+        self.stop_event = threading.Event()
+        self.thread = None
+        self.lock = threading.Lock()
+        self.average_send_duration = 0.0
+        self.last_n_measured_sends = display.n_measured_sends
+        self.n_frames = 0
+        self.n_missed_deadlines = 0
+        self.frame_start_times = collections.deque(maxlen=DISPLAY_FRAME_CLOCK_STATS_WINDOW)
+        self.jitters = collections.deque(maxlen=DISPLAY_FRAME_CLOCK_STATS_WINDOW)
+        self.prepare_durations = collections.deque(maxlen=DISPLAY_FRAME_CLOCK_STATS_WINDOW)
+        self.send_durations = collections.deque(maxlen=DISPLAY_FRAME_CLOCK_STATS_WINDOW)
+
+    def start(self):
+        """Run the clock in a new thread.
+        """
+        self.stop_event.clear()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.stop_event.set()
+        if self.thread is not None and self.thread is not threading.current_thread():
+            self.thread.join()
+        self.thread = None
+
+    def run(self):
+        """Run the clock in the current thread until 'stop' is called.
+        """
+        next_deadline = time.monotonic()
+        while not self.stop_event.is_set():
+            wait_time = next_deadline - time.monotonic()
+            if wait_time > 0:
+                self.stop_event.wait(wait_time)
+                if self.stop_event.is_set():
+                    break
+
+            frame_start_time = time.monotonic()
+            self.display_next_frame(frame_start_time, frame_start_time - next_deadline)
+
+            period = 1.0 / self.current_fps
+            next_deadline += period
+            now = time.monotonic()
+            if now > next_deadline:
+                # Frame took longer than its budget, skip the deadlines which were missed
+                n_missed = int(math.ceil((now - next_deadline) / period))
+                next_deadline += n_missed * period
+                with self.lock:
+                    self.n_missed_deadlines += n_missed
+
+    def display_next_frame(self, frame_start_time, jitter):
+        try:
+            frame = self.render_function()
+        except Exception as e:
+            logging.error('Error in display frame clock render function: {0}'.format(e))
+            return
+        if frame is None:
+            return
+
+        prepared = self.display.display_frame(frame, input_format=self.input_format, layout=self.layout)
+        # Only use send durations measured since the last frame: none if the frame was skipped or could not be sent,
+        # and the frame could still be being sent by the display sender thread
+        n_measured_sends = self.display.n_measured_sends
+        sent = n_measured_sends != self.last_n_measured_sends
+        self.last_n_measured_sends = n_measured_sends
+
+        with self.lock:
+            self.n_frames += 1
+            self.frame_start_times.append(frame_start_time)
+            self.jitters.append(jitter)
+            if prepared:
+                self.prepare_durations.append(self.display.last_prepare_duration)
+            if sent:
+                self.send_durations.append(self.display.last_send_duration)
+        if self.adaptive and sent:
+            self.adapt_frame_rate(self.display.last_send_duration)
+
+    def adapt_frame_rate(self, send_duration):
+        self.average_send_duration += self.send_duration_smoothing * (send_duration - self.average_send_duration)
+        if self.average_send_duration > 1.0 / self.current_fps:
+            new_fps = max(self.min_fps, 1.0 / (self.average_send_duration * self.fps_decrease_margin))
+            if new_fps < self.current_fps:
+                logging.debug('Lowering display frame rate to {0:.1f} fps'.format(new_fps))
+                self.current_fps = new_fps
+        elif self.current_fps < self.target_fps:
+            new_fps = min(self.target_fps, self.current_fps * self.fps_increase_factor)
+            if self.average_send_duration < self.fps_increase_max_budget_usage / new_fps:
+                self.current_fps = new_fps
+
+    def get_stats(self):
+        """Returns a dictionary with the following frame clock statistics:
+            * target_fps: frame rate requested when starting the clock
+            * current_fps: frame rate currently used (lower than target_fps if it was adapted)
+            * measured_fps: actual frame rate in the last frames
+            * frames: total number of frames displayed
+            * missed_deadlines: total number of frame deadlines missed because frames took too long
+            * jitter_mean, jitter_max: mean and max delay (in seconds) between frame deadlines and the actual
+              frame start in the last frames
+            * prepare_time_mean, send_time_mean: mean time (in seconds) spent preparing and sending frames in the
+              last frames (frames which were skipped or not sent are not counted)
+        """
+        with self.lock:
+            n = len(self.frame_start_times)
+            measured_fps = 0.0
+            if n > 1 and self.frame_start_times[-1] > self.frame_start_times[0]:
+                measured_fps = (n - 1) / (self.frame_start_times[-1] - self.frame_start_times[0])
+            return {
+                'target_fps': self.target_fps,
+                'current_fps': self.current_fps,
+                'measured_fps': measured_fps,
+                'frames': self.n_frames,
+                'missed_deadlines': self.n_missed_deadlines,
+                'jitter_mean': sum(self.jitters) / n if n else 0.0,
+                'jitter_max': max(self.jitters) if n else 0.0,
+                'prepare_time_mean': mean(self.prepare_durations),
+                'send_time_mean': mean(self.send_durations),
+            }
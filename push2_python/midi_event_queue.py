@@ -0,0 +1,176 @@
+import collections
+import logging
+import threading
+from .constants import MIDI_EVENT_QUEUE_DEFAULT_MAX_SIZE, MIDI_EVENT_QUEUE_DROP_OLDEST, MIDI_EVENT_QUEUE_COALESCE, \
+    MIDI_EVENT_QUEUE_BLOCK, MIDI_ROUTE_COALESCE_VALUE, MIDI_ROUTE_COALESCE_INCREMENT
+
+
+def add_encoder_increments(value1, value2):
+    """Returns the CC value of an encoder rotation with the sum of the increments of the given encoder rotation CC
+    values (which are 7 bit two's complement numbers), or None if the sum is too big to fit in a CC value.
+    """
+    increment = (value1 - 128 if value1 > 63 else value1) + (value2 - 128 if value2 > 63 else value2)
+    if not -64 <= increment <= 63:
+        return None
+    return increment & 0x7F
+
+
+class MIDIEventQueue(object):
+    """Bounded queue of incoming MIDI events between the MIDI input callback and the execution of action handlers.
+    Events are routed MIDI messages (see 'push2_python.midi_routing'), queued by 'put' from the MIDI input thread and
+    handled (i.e. their action handlers are called) by a worker thread (see 'start') or by calling 'process_events'
+    from the app's own loop. When the queue has 'max_size' events, new events are handled according to
+    'overflow_policy':
+
+        * MIDI_EVENT_QUEUE_DROP_OLDEST: the oldest queued event is dropped to make room for the new one.
+        * MIDI_EVENT_QUEUE_COALESCE: if the new event is from a continuous control (see 'coalesce' in
+          'push2_python.midi_routing') and an event of the same control is queued, the queued event is updated with
+          the value of the new event (aftertouch, touchstrip) or the sum of both increments (encoder rotation) instead
+          of queueing a new one. Otherwise (including pad and button press/release events, which are never coalesced),
+          the oldest event is dropped.
+        * MIDI_EVENT_QUEUE_BLOCK: 'put' waits until there is room in the queue (MIDI messages will then be buffered
+          by the MIDI library until handlers catch up).
+    """
+
+    def __init__(self, push, max_size=MIDI_EVENT_QUEUE_DEFAULT_MAX_SIZE, overflow_policy=MIDI_EVENT_QUEUE_DROP_OLDEST):
+        assert overflow_policy in [MIDI_EVENT_QUEUE_DROP_OLDEST, MIDI_EVENT_QUEUE_COALESCE, MIDI_EVENT_QUEUE_BLOCK], \
+            'Invalid overflow policy'
+        assert max_size > 0, 'Queue size must be positive'
+        self.push = push
+        self.max_size = max_size
+        self.overflow_policy = overflow_policy
+        self.events = collections.deque()
+        self.queued_events_by_route = {}  # Latest queued event of each continuous control, only used when coalescing
+        self.condition = threading.Condition()
+        self.stopping = False
+        self.thread = None
+        self.max_depth = 0
+        self.n_events_queued = 0
+        self.n_events_handled = 0
+        self.n_events_dropped = 0
+        self.n_events_coalesced = 0
+
+    def put(self, route, data1, data2):
+        """Queues an event which will be handled by calling 'route(push, data1, data2)'.
+        """
+        with self.condition:
+            coalesce = None
+            if self.overflow_policy == MIDI_EVENT_QUEUE_COALESCE:
+                coalesce = getattr(route, 'coalesce', None)
+                if coalesce is not None and len(self.events) >= self.max_size and self.coalesce_event(
+                        route, coalesce, data1, data2):
+                    self.n_events_coalesced += 1
+                    return
+            if self.overflow_policy == MIDI_EVENT_QUEUE_BLOCK:
+                while len(self.events) >= self.max_size and not self.stopping:
+                    self.condition.wait()
+            if len(self.events) >= self.max_size:
+                # Also reached when a blocked 'put' is released by 'stop'
+                self.remove_event()
+                self.n_events_dropped += 1
+            event = [route, data1, data2]
+            self.events.append(event)
+            if coalesce is not None:
+                self.queued_events_by_route[route] = event
+            self.n_events_queued += 1
+            self.max_depth = max(self.max_depth, len(self.events))
+            self.condition.notify_all()
+
+    def coalesce_event(self, route, coalesce, data1, data2):
+        # Must be called with self.condition acquired. Returns True if the event was merged with a queued event.
+        queued_event = self.queued_events_by_route.get(route, None)
+        if queued_event is None:
+            return False
+        if coalesce == MIDI_ROUTE_COALESCE_INCREMENT:
+            data2 = add_encoder_increments(queued_event[2], data2)
+            if data2 is None:
+                return False
+        elif coalesce != MIDI_ROUTE_COALESCE_VALUE:
+            return False
+        queued_event[1] = data1
+        queued_event[2] = data2
+        return True
+
+    def remove_event(self):
+        # Must be called with self.condition acquired
+        event = self.events.popleft()
+        if self.queued_events_by_route.get(event[0], None) is event:
+            del self.queued_events_by_route[event[0]]
+        self.condition.notify_all()  # Wake up 'put' calls blocked because the queue was full
+        return event
+
+    def get_event(self, timeout=None):
+        """Removes and returns the oldest queued event. If the queue is empty, waits up to 'timeout' seconds (or until
+        'stop' is called) for an event to be queued and returns None if none was.
+        """
+        with self.condition:
+            if not self.events and timeout != 0:
+                self.condition.wait_for(lambda: self.events or self.stopping, timeout=timeout)
+            if not self.events:
+                return None
+            return self.remove_event()
+
+    def handle_event(self, event):
+        route, data1, data2 = event
+        try:
+            route(self.push, data1, data2)
+        except Exception as e:
+            logging.error('Error in MIDI event handler: {0}'.format(e))
+        with self.condition:
+            self.n_events_handled += 1
+
+    def process_events(self, max_events=None, timeout=0):
+        """Handles queued events in the current thread, waiting up to 'timeout' seconds for the first one if the queue
+        is empty. At most 'max_events' events are handled (all queued events if None). Returns the number of events
+        handled. Use this to handle events from the app's own loop instead of using a worker thread.
+        """
+        n_handled = 0
+        while max_events is None or n_handled < max_events:
+            event = self.get_event(timeout=timeout if n_handled == 0 else 0)
+            if event is None:
+                break
+            self.handle_event(event)
+            n_handled += 1
+        return n_handled
+
+    def start(self):
+        """Handle events in a new worker thread.
+        """
+        with self.condition:
+            self.stopping = False
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        """Stops the worker thread (if running) and releases 'put' calls waiting for room in the queue. Events which
+        are still queued are not handled.
+        """
+        with self.condition:
+            self.stopping = True
+            self.condition.notify_all()
+        if self.thread is not None and self.thread is not threading.current_thread():
+            self.thread.join()
+        self.thread = None
+
+    def run(self):
+        while True:
+            with self.condition:
+                if self.stopping:
+                    return
+            event = self.get_event()
+            if event is not None:
+                self.handle_event(event)
+
+    def get_stats(self):
+        """Returns a dictionary with the current number of queued events ('depth'), the maximum number of events
+        queued at once, and the number of events queued, handled, dropped and coalesced.
+        """
+        with self.condition:
+            return {
+                'depth': len(self.events),
+                'max_depth': self.max_depth,
+                'events_queued': self.n_events_queued,
+                'events_handled': self.n_events_handled,
+                'events_dropped': self.n_events_dropped,
+                'events_coalesced': self.n_events_coalesced,
+            }
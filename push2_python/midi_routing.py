@@ -0,0 +1,64 @@
+from .constants import MIDO_NOTEON, MIDO_NOTEOFF, MIDO_POLYAT, MIDO_AFTERTOUCH, MIDO_PITCWHEEL, MIDO_CONTROLCHANGE, \
+    MIDI_STATUS_NOTEOFF, MIDI_STATUS_NOTEON, MIDI_STATUS_POLYAT, MIDI_STATUS_CONTROLCHANGE, MIDI_STATUS_AFTERTOUCH, \
+    MIDI_STATUS_PITCHWHEEL, MIDI_SUSTAIN_PEDAL_CC, ACTION_SUSTAIN_PEDAL
+
+# Incoming MIDI messages are dispatched with a routing table with an entry for every combination of the upper 4 bits
+# of the status byte (the message type) and the first data byte (e.g. note or CC number). Entries are "routes":
+# functions called as 'route(push, data1, data2)' which trigger the corresponding actions, with all action names
+# already computed when the table is built. Entries are None for messages which trigger no action.
+# Each section of Push2 provides the routes for the messages it handles with a 'get_midi_routes' method.
+# Routes of continuous controls also have a 'coalesce' attribute telling how the MIDI event queue can merge their
+# queued events when it is full: MIDI_ROUTE_COALESCE_VALUE (only the latest value matters, e.g. aftertouch) or
+# MIDI_ROUTE_COALESCE_INCREMENT (values are relative increments which are added, i.e. encoder rotation).
+N_MIDI_STATUS_NIBBLES = 16
+N_MIDI_DATA_VALUES = 128
+
+# Functions returning (status nibble, data1, data2) for the types of mido messages which can be routed
+MIDO_MESSAGE_ROUTE_DATA = {
+    MIDO_NOTEON: lambda message: (MIDI_STATUS_NOTEON, message.note, message.velocity),
+    MIDO_NOTEOFF: lambda message: (MIDI_STATUS_NOTEOFF, message.note, message.velocity),
+    MIDO_POLYAT: lambda message: (MIDI_STATUS_POLYAT, message.note, message.value),
+    MIDO_CONTROLCHANGE: lambda message: (MIDI_STATUS_CONTROLCHANGE, message.control, message.value),
+    MIDO_AFTERTOUCH: lambda message: (MIDI_STATUS_AFTERTOUCH, message.value, 0),
+    MIDO_PITCWHEEL: lambda message: (MIDI_STATUS_PITCHWHEEL, (message.pitch + 8192) & 0x7F, (message.pitch + 8192) >> 7),
+}
+
+
+def get_route_index(status_nibble, data1):
+    return (status_nibble << 7) | data1
+
+
+def get_mido_message_route_data(message):
+    """Returns (status nibble, data1, data2) for the given mido message, or None if messages of its type are not
+    routed.
+    """
+    get_route_data = MIDO_MESSAGE_ROUTE_DATA.get(message.type, None)
+    if get_route_data is None:
+        return None
+    return get_route_data(message)
+
+
+def make_sustain_pedal_route(route):
+    """Returns a route which calls the given route (if any) and then triggers the sustain pedal action.
+    """
+    def sustain_pedal_route(push, data1, data2):
+        if route is not None:
+            route(push, data1, data2)
+        push.trigger_action(ACTION_SUSTAIN_PEDAL, data2 >= 64)
+    return sustain_pedal_route
+
+
+def build_midi_routing_table(sections):
+    """Builds the MIDI routing table (a list of N_MIDI_STATUS_NIBBLES * N_MIDI_DATA_VALUES routes, see
+    'get_route_index') from the routes of the given Push2 sections. If several sections handle the same message, the
+    route of the first section in 'sections' is used.
+    """
+    table = [None] * (N_MIDI_STATUS_NIBBLES * N_MIDI_DATA_VALUES)
+    for section in sections:
+        for (status_nibble, data1), route in section.get_midi_routes().items():
+            index = get_route_index(status_nibble, data1)
+            if table[index] is None:
+                table[index] = route
+    sustain_pedal_index = get_route_index(MIDI_STATUS_CONTROLCHANGE, MIDI_SUSTAIN_PEDAL_CC)
+    table[sustain_pedal_index] = make_sustain_pedal_route(table[sustain_pedal_index])
+    return table
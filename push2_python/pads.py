@@ -1,7 +1,9 @@
 import mido
-from .constants import ANIMATION_DEFAULT, MIDO_NOTEON, MIDO_NOTEOFF, \
-    MIDO_POLYAT, MIDO_AFTERTOUCH, ACTION_PAD_PRESSED, ACTION_PAD_RELEASED, ACTION_PAD_AFTERTOUCH, PUSH2_SYSEX_PREFACE_BYTES, \
-    PUSH2_SYSEX_END_BYTES, ANIMATION_STATIC
+import sys
+from .constants import ANIMATION_DEFAULT, MIDO_NOTEON, \
+    ACTION_PAD_PRESSED, ACTION_PAD_RELEASED, ACTION_PAD_AFTERTOUCH, PUSH2_SYSEX_PREFACE_BYTES, \
+    PUSH2_SYSEX_END_BYTES, ANIMATION_STATIC, MIDI_STATUS_NOTEON, MIDI_STATUS_NOTEOFF, MIDI_STATUS_POLYAT, \
+    MIDI_STATUS_AFTERTOUCH, MIDI_ROUTE_COALESCE_VALUE
 from .classes import AbstractPush2Section
 
 
@@ -32,6 +34,28 @@ def get_individual_pad_action_name(action_name, pad_n=None, pad_ij=None):
     return '{0} - {1}'.format(action_name, n)
 
 
+def make_pad_route(action_name, pad_n):
+    """Returns a MIDI route (see 'push2_python.midi_routing') triggering the given generic and individual pad actions
+    with the second data byte of the message (velocity or pressure) as value.
+    """
+    pad_ij = pad_n_to_pad_ij(pad_n)
+    individual_action_name = sys.intern(get_individual_pad_action_name(action_name, pad_n=pad_n))
+
+    def pad_route(push, data1, data2):
+        push.trigger_action(action_name, pad_n, pad_ij, data2)  # Trigger generic pad action
+        push.trigger_action(individual_action_name, data2)  # Trigger individual pad action as well
+    if action_name == ACTION_PAD_AFTERTOUCH:
+        pad_route.coalesce = MIDI_ROUTE_COALESCE_VALUE
+    return pad_route
+
+
+def channel_aftertouch_route(push, data1, data2):
+    push.trigger_action(ACTION_PAD_AFTERTOUCH, None, None, data1)
+
+
+channel_aftertouch_route.coalesce = MIDI_ROUTE_COALESCE_VALUE
+
+
 class Push2Pads(AbstractPush2Section):
     """Class to interface with Ableton's Push2 pads.
     See https://github.com/Ableton/push-interface/blob/master/doc/AbletonPush2MIDIDisplayInterface.asc#Pads
@@ -175,31 +199,15 @@ class Push2Pads(AbstractPush2Section):
     def set_all_pads_to_blue(self, animation=ANIMATION_DEFAULT, animation_end_color='black'):
         self.set_all_pads_to_color('blue', animation=animation, animation_end_color=animation_end_color)
 
-    def on_midi_message(self, message):
-        if message.type in [MIDO_NOTEON, MIDO_NOTEOFF, MIDO_POLYAT, MIDO_AFTERTOUCH]:
-            if message.type != MIDO_AFTERTOUCH:
-                if 36 <= message.note <= 99:  # Min and max pad MIDI values according to Push Spec
-                    pad_n = message.note
-                    pad_ij = self.pad_n_to_pad_ij(pad_n)
-                    if message.type == MIDO_POLYAT:
-                        velocity = message.value
-                    else:
-                        velocity = message.velocity
-                    if message.type == MIDO_NOTEON:
-                        self.push.trigger_action(ACTION_PAD_PRESSED, pad_n, pad_ij, velocity)  # Trigger generic pad action
-                        self.push.trigger_action(get_individual_pad_action_name(
-                            ACTION_PAD_PRESSED, pad_n=pad_n), velocity)  # Trigger individual pad action as well
-                        return True
-                    elif message.type == MIDO_NOTEOFF:
-                        self.push.trigger_action(ACTION_PAD_RELEASED, pad_n, pad_ij, velocity)
-                        self.push.trigger_action(get_individual_pad_action_name(
-                            ACTION_PAD_RELEASED, pad_n=pad_n), velocity)  # Trigger individual pad action as well
-                        return True
-                    elif message.type == MIDO_POLYAT:
-                        self.push.trigger_action(ACTION_PAD_AFTERTOUCH, pad_n, pad_ij, velocity)
-                        self.push.trigger_action(get_individual_pad_action_name(
-                            ACTION_PAD_AFTERTOUCH, pad_n=pad_n), velocity)  # Trigger individual pad action as well
-                        return True
-            elif message.type == MIDO_AFTERTOUCH:
-                self.push.trigger_action(ACTION_PAD_AFTERTOUCH, None, None, message.value)
-                return True
+    def get_midi_routes(self):
+        """Returns a dictionary with the MIDI routes of the messages handled by the pads, keyed by (status nibble, data1).
+        See 'push2_python.midi_routing'.
+        """
+        routes = {}
+        for pad_n in range(36, 100):  # Min and max pad MIDI values according to Push Spec
+            routes[(MIDI_STATUS_NOTEON, pad_n)] = make_pad_route(ACTION_PAD_PRESSED, pad_n)
+            routes[(MIDI_STATUS_NOTEOFF, pad_n)] = make_pad_route(ACTION_PAD_RELEASED, pad_n)
+            routes[(MIDI_STATUS_POLYAT, pad_n)] = make_pad_route(ACTION_PAD_AFTERTOUCH, pad_n)
+        for value in range(0, 128):
+            routes[(MIDI_STATUS_AFTERTOUCH, value)] = channel_aftertouch_route  # Value is the first data byte
+        return routes
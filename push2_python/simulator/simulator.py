@@ -115,18 +115,26 @@ class SimulatorController(object):
         if client_connected:
             self.emit_ws_message('setElementColor', {'midiTrigger':midiTrigger, 'rgb': rgb, 'bwRgb': bw_rgb, 'blink': animation_idx != 0})            
 
-    def prepare_and_display_in_simulator(self, frame, input_format=push2_python.constants.FRAME_FORMAT_BGR565, force=False):
+    def prepare_and_display_in_simulator(self, frame, input_format=push2_python.constants.FRAME_FORMAT_BGR565, force=False,
+                                         layout=push2_python.constants.FRAME_LAYOUT_COLUMN_MAJOR):
 
         if time.time() - self.last_time_frame_prepared > 1.0/5.0 or force:  # Limit to 5 fps to save recources
             self.last_time_frame_prepared = time.time()
             
             # 'frame' should be an array as in display.display_frame method input
             # We need to convert the frame to RGBA format first (so Pillow can read it later)
+            # Frame is first converted to a 16 bit frame with one row per display line
             
             if input_format == push2_python.constants.FRAME_FORMAT_RGB:
-                frame = push2_python.display.rgb_to_bgr565(frame)
-
-            frame = frame.transpose().flatten()
+                frame = push2_python.display.rgb_to_bgr565(frame).transpose()
+            elif input_format in push2_python.display.RGB888_FRAME_FORMATS_CHANNEL_INDEXES:
+                frame = push2_python.display.rgb888_to_bgr565(
+                    frame, push2_python.display.RGB888_FRAME_FORMATS_CHANNEL_INDEXES[input_format])
+                input_format = push2_python.constants.FRAME_FORMAT_BGR565
+            elif layout != push2_python.constants.FRAME_LAYOUT_ROW_MAJOR:
+                frame = frame.transpose()
+
+            frame = frame.flatten()
             rgb_frame = numpy.zeros(shape=(len(frame), 1), dtype=numpy.uint32).flatten()
             rgb_frame[:] = frame[:]
             
@@ -191,7 +199,7 @@ def pad_pressed(midiTrigger):
     msg = make_midi_message_from_midi_trigger(midiTrigger)
     if midi_out is not None:
         midi_out.send(msg)
-    push_object.pads.on_midi_message(msg)
+    push_object.dispatch_midi_message(msg)
 
 
 @sim_app.on('padReleased')
@@ -199,7 +207,7 @@ def pad_released(midiTrigger):
     msg = make_midi_message_from_midi_trigger(midiTrigger, releasing=True)
     if midi_out is not None:
         midi_out.send(msg)
-    push_object.pads.on_midi_message(msg)
+    push_object.dispatch_midi_message(msg)
 
 
 @sim_app.on('buttonPressed')
@@ -207,7 +215,7 @@ def button_pressed(midiTrigger):
     msg = make_midi_message_from_midi_trigger(midiTrigger)
     if midi_out is not None:
         midi_out.send(msg)
-    push_object.buttons.on_midi_message(msg)
+    push_object.dispatch_midi_message(msg)
 
 
 @sim_app.on('buttonReleased')
@@ -215,7 +223,7 @@ def button_released(midiTrigger):
     msg = make_midi_message_from_midi_trigger(midiTrigger, releasing=True)
     if midi_out is not None:
         midi_out.send(msg)
-    push_object.buttons.on_midi_message(msg)
+    push_object.dispatch_midi_message(msg)
 
 
 @sim_app.on('encdoerTouched')
@@ -223,7 +231,7 @@ def encoder_pressed(midiTrigger):
     msg = make_midi_message_from_midi_trigger(midiTrigger, velocity=127)
     if midi_out is not None:
         midi_out.send(msg)
-    push_object.encoders.on_midi_message(msg)
+    push_object.dispatch_midi_message(msg)
 
 
 @sim_app.on('encdoerReleased')
@@ -231,7 +239,7 @@ def encoder_released(midiTrigger):
     msg = make_midi_message_from_midi_trigger(midiTrigger, velocity=0)
     if midi_out is not None:
         midi_out.send(msg)
-    push_object.encoders.on_midi_message(msg)
+    push_object.dispatch_midi_message(msg)
 
 
 @sim_app.on('encdoerRotated')
@@ -239,7 +247,7 @@ def encoder_rotated(midiTrigger, value):
     msg = make_midi_message_from_midi_trigger(midiTrigger, value=value)
     if midi_out is not None:
         midi_out.send(msg)
-    push_object.encoders.on_midi_message(msg)
+    push_object.dispatch_midi_message(msg)
 
 
 @app.route('/')
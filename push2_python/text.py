@@ -0,0 +1,172 @@
+import numpy
+from collections import OrderedDict
+from PIL import Image, ImageDraw, ImageFont
+from .constants import FRAME_LAYOUT_ROW_MAJOR, TEXT_RENDERER_DEFAULT_FONT_SIZE, TEXT_RENDERER_STRING_CACHE_SIZE
+
+
+def bgr565_color(r, g, b):
+    """Returns the BGR565 value of the given color with 8 bit r, g and b components.
+    """
+    return ((b & 0b11111000) << 8) | ((g & 0b11111100) << 3) | (r >> 3)
+
+
+def make_blend_lut(color, background_color):
+    """Returns a 256-element uint16 array which maps an 8 bit alpha value to the BGR565 color resulting of drawing
+    'color' with that alpha over 'background_color' (both BGR565 values).
+    """
+    alpha = numpy.arange(0, 256, dtype=numpy.uint32)
+    lut = numpy.zeros(256, dtype=numpy.uint32)
+    for shift, mask in [(0, 0b11111), (5, 0b111111), (11, 0b11111)]:
+        foreground_channel = (color >> shift) & mask
+        background_channel = (background_color >> shift) & mask
+        channel = (foreground_channel * alpha + background_channel * (255 - alpha) + 127) // 255
+        lut |= channel << shift
+    return lut.astype(numpy.uint16)
+
+
+class GlyphAtlas(object):
+    """Rasterizes the glyphs of a font once (using Pillow) and keeps them as 8 bit alpha masks. All glyphs have
+    the same height (the line height of the font) so they can be placed next to each other to compose strings.
+    Glyphs are rasterized the first time they are needed.
+    """
+
+    def __init__(self, font):
+        self.font = font
+        ascent, descent = font.getmetrics()
+        self.line_height = ascent + descent
+        self.glyphs = dict()
+
+    def get_glyph(self, character):
+        """Returns (alpha_mask, advance) for the given character. 'alpha_mask' can be wider than 'advance' if the
+        glyph extends over the next character.
+        """
+        glyph = self.glyphs.get(character, None)
+        if glyph is None:
+            advance = int(round(self.font.getlength(character)))
+            bbox = self.font.getbbox(character)
+            width = max(1, advance, bbox[2])
+            image = Image.new('L', (width, self.line_height), 0)
+            ImageDraw.Draw(image).text((0, 0), character, font=self.font, fill=255)
+            glyph = (numpy.array(image, dtype=numpy.uint8), advance)
+            self.glyphs[character] = glyph
+        return glyph
+
+    def render_alpha(self, text):
+        """Returns an alpha mask of shape (line height, text width) with the given text.
+        """
+        glyphs = [self.get_glyph(character) for character in text]
+        width = 0
+        x = 0
+        for alpha_mask, advance in glyphs:
+            width = max(width, x + alpha_mask.shape[1])
+            x += advance
+        text_alpha = numpy.zeros((self.line_height, width), dtype=numpy.uint8)
+        x = 0
+        for alpha_mask, advance in glyphs:
+            region = text_alpha[:, x:x + alpha_mask.shape[1]]
+            numpy.maximum(region, alpha_mask, out=region)
+            x += advance
+        return text_alpha
+
+
+class TextRenderer(object):
+    """Draws text directly into BGR565 frames that can be passed to 'Push2Display.display_frame'.
+    Glyphs are rasterized once in a GlyphAtlas and rendered strings are kept in an LRU cache (keyed by text and
+    colors) already converted to BGR565, so drawing a string which was drawn before is just a numpy copy into the
+    frame.
+
+    If 'background_color' is given when drawing, glyph edges are blended with that color and the whole text
+    rectangle is written in the frame. Otherwise, text is drawn over the existing frame contents without
+    anti-aliasing (only pixels with more than 50% coverage are drawn).
+
+    Example:
+
+        text_renderer = TextRenderer(font_size=20)
+        frame = numpy.zeros((160, 960), dtype=numpy.uint16)
+        text_renderer.draw_text(frame, 10, 10, 'Volume: 64', color=bgr565_color(255, 255, 255))
+        push.display.display_frame(frame, layout=push2_python.constants.FRAME_LAYOUT_ROW_MAJOR)
+    """
+
+    def __init__(self, font_path=None, font_size=TEXT_RENDERER_DEFAULT_FONT_SIZE,
+                 string_cache_size=TEXT_RENDERER_STRING_CACHE_SIZE):
+        if font_path is not None:
+            font = ImageFont.truetype(font_path, font_size)
+        else:
+            try:
+                font = ImageFont.load_default(size=font_size)
+            except TypeError:
+                # Default font can only be loaded with a given size since pillow 10.1
+                raise ValueError('Loading the default font needs pillow>=10.1, upgrade pillow or give a font_path')
+        self.atlas = GlyphAtlas(font)
+        self.string_cache_size = string_cache_size
+        self.string_cache = OrderedDict()
+        self.blend_luts = dict()
+
+    @property
+    def line_height(self):
+        return self.atlas.line_height
+
+    def get_blend_lut(self, color, background_color):
+        key = (color, background_color)
+        lut = self.blend_luts.get(key, None)
+        if lut is None:
+            lut = make_blend_lut(color, background_color)
+            self.blend_luts[key] = lut
+        return lut
+
+    def render_string(self, text, color, background_color=None):
+        """Returns (pixels, mask) for the given text. 'pixels' is a uint16 BGR565 array of shape (line height, text
+        width) and 'mask' is a boolean array of the same shape indicating which pixels should be drawn, or None if all
+        pixels should be drawn (when 'background_color' is given).
+        """
+        key = (text, color, background_color)
+        rendered = self.string_cache.get(key, None)
+        if rendered is not None:
+            self.string_cache.move_to_end(key)
+            return rendered
+
+        text_alpha = self.atlas.render_alpha(text)
+        if background_color is not None:
+            rendered = (self.get_blend_lut(color, background_color)[text_alpha], None)
+        else:
+            rendered = (numpy.full(text_alpha.shape, color, dtype=numpy.uint16), text_alpha >= 128)
+        self.string_cache[key] = rendered
+        if len(self.string_cache) > self.string_cache_size:
+            self.string_cache.popitem(last=False)
+        return rendered
+
+    def measure_text(self, text):
+        """Returns (width, height) in pixels of the given text.
+        """
+        width = 0
+        x = 0
+        for character in text:
+            alpha_mask, advance = self.atlas.get_glyph(character)
+            width = max(width, x + alpha_mask.shape[1])
+            x += advance
+        return width, self.line_height
+
+    def draw_text(self, frame, x, y, text, color=0xFFFF, background_color=None, layout=FRAME_LAYOUT_ROW_MAJOR):
+        """Draws text in the given uint16 BGR565 frame with its top-left corner at display position (x, y). Colors
+        are BGR565 values (see 'bgr565_color'). 'layout' indicates whether the frame has one row per display line
+        (FRAME_LAYOUT_ROW_MAJOR, shape 160x960) or one row per display column (FRAME_LAYOUT_COLUMN_MAJOR, shape
+        960x160). Text outside of the frame is clipped. Returns the frame.
+        """
+        if not text:
+            return frame
+        pixels, mask = self.render_string(text, color, background_color=background_color)
+        lines = frame if layout == FRAME_LAYOUT_ROW_MAJOR else frame.transpose()
+
+        # Clip text to frame bounds
+        height, width = pixels.shape
+        x0, y0 = max(x, 0), max(y, 0)
+        x1, y1 = min(x + width, lines.shape[1]), min(y + height, lines.shape[0])
+        if x0 >= x1 or y0 >= y1:
+            return frame
+        region = lines[y0:y1, x0:x1]
+        pixels = pixels[y0 - y:y1 - y, x0 - x:x1 - x]
+        if mask is None:
+            region[:] = pixels
+        else:
+            numpy.copyto(region, pixels, where=mask[y0 - y:y1 - y, x0 - x:x1 - x])
+        return frame
@@ -1,9 +1,24 @@
 import mido
 import weakref
-from .constants import MIDO_PITCWHEEL, MIDO_CONTROLCHANGE, ACTION_TOUCHSTRIP_TOUCHED, PUSH2_SYSEX_PREFACE_BYTES, PUSH2_SYSEX_END_BYTES
+from .constants import ACTION_TOUCHSTRIP_TOUCHED, PUSH2_SYSEX_PREFACE_BYTES, PUSH2_SYSEX_END_BYTES, \
+    MIDI_STATUS_PITCHWHEEL, MIDI_STATUS_CONTROLCHANGE, MIDI_ROUTE_COALESCE_VALUE
 from .classes import AbstractPush2Section
 
 
+def touchstrip_pitch_bend_route(push, data1, data2):
+    push.trigger_action(ACTION_TOUCHSTRIP_TOUCHED, ((data2 << 7) | data1) - 8192)  # Same value as mido's pitch
+
+
+touchstrip_pitch_bend_route.coalesce = MIDI_ROUTE_COALESCE_VALUE
+
+
+def touchstrip_modulation_wheel_route(push, data1, data2):
+    push.trigger_action(ACTION_TOUCHSTRIP_TOUCHED, data2)
+
+
+touchstrip_modulation_wheel_route.coalesce = MIDI_ROUTE_COALESCE_VALUE
+
+
 class Push2TouchStrip(AbstractPush2Section):
     """Class to interface with Ableton's Touch Strip.
     See https://github.com/Ableton/push-interface/blob/master/doc/AbletonPush2MIDIDisplayInterface.asc#Touch%20Strip
@@ -23,12 +38,12 @@ class Push2TouchStrip(AbstractPush2Section):
         msg = mido.Message.from_bytes(PUSH2_SYSEX_PREFACE_BYTES + [0x17, 0x68] + PUSH2_SYSEX_END_BYTES)
         self.push.send_midi_to_push(msg)
 
-    def on_midi_message(self, message):
-        if message.type == MIDO_PITCWHEEL:
-            value = message.pitch
-            self.push.trigger_action(ACTION_TOUCHSTRIP_TOUCHED, value)
-            return True
-        elif message.type == MIDO_CONTROLCHANGE:
-            value = message.value
-            self.push.trigger_action(ACTION_TOUCHSTRIP_TOUCHED, value)
-            return True
+    def get_midi_routes(self):
+        """Returns a dictionary with the MIDI routes of the messages handled by the touchstrip, keyed by
+        (status nibble, data1). See 'push2_python.midi_routing'.
+        """
+        routes = {}
+        for data1 in range(0, 128):
+            routes[(MIDI_STATUS_PITCHWHEEL, data1)] = touchstrip_pitch_bend_route
+            routes[(MIDI_STATUS_CONTROLCHANGE, data1)] = touchstrip_modulation_wheel_route
+        return routes
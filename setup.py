@@ -8,6 +8,7 @@ setup(name='push2-python',
       author_email='frederic.font@gmail.com',
       license='MIT',
       install_requires=['numpy', 'pyusb', 'python-rtmidi', 'mido', 'flask', 'flask-socketio', 'eventlet' , 'pillow'],
+      extras_require={'async': ['libusb1']},
       python_requires='>=3',
       setup_requires=['setuptools_scm'],
       include_package_data=True,
@@ -0,0 +1,40 @@
+"""Frame preparation as done by Push2Display.prepare_frame before frames were prepared in place (column major
+FRAME_FORMAT_BGR565, FRAME_FORMAT_RGB565 and FRAME_FORMAT_RGB frames only). Used as reference by the tests to check
+that prepared frames are exactly the same as before.
+"""
+import numpy
+from push2_python.constants import DISPLAY_FRAME_XOR_PATTERN, DISPLAY_N_LINES, DISPLAY_LINE_PIXELS, \
+    DISPLAY_LINE_FILLER_BYTES, FRAME_FORMAT_BGR565, FRAME_FORMAT_RGB565, FRAME_FORMAT_RGB
+
+NP_DISPLAY_FRAME_XOR_PATTERN = numpy.array(DISPLAY_FRAME_XOR_PATTERN, dtype=numpy.uint16)
+
+
+def rgb565_to_bgr565(rgb565_frame):
+    frame_r_shifted = numpy.right_shift(numpy.bitwise_and(rgb565_frame, 0b1111100000000000), 11)
+    frame_g_shifted = numpy.bitwise_and(rgb565_frame, 0b0000011111100000)
+    frame_b_shifted = numpy.left_shift(numpy.bitwise_and(rgb565_frame, 0b0000000000011111), 11)
+    return frame_r_shifted + frame_g_shifted + frame_b_shifted
+
+
+def rgb_to_bgr565(rgb_frame):
+    rgb_frame = rgb_frame * 255  # NOTE: the original function multiplied the given frame in place
+    frame_r_shifted = numpy.right_shift(numpy.bitwise_and(rgb_frame[:, :, 0].astype(numpy.uint16), 0b11111000), 3)
+    frame_g_shifted = numpy.left_shift(numpy.bitwise_and(rgb_frame[:, :, 1].astype(numpy.uint16), 0b11111100), 3)
+    frame_b_shifted = numpy.left_shift(numpy.bitwise_and(rgb_frame[:, :, 2].astype(numpy.uint16), 0b11111000), 8)
+    return (frame_r_shifted + frame_g_shifted + frame_b_shifted).transpose()
+
+
+def prepare_frame(frame, input_format=FRAME_FORMAT_BGR565):
+    if input_format == FRAME_FORMAT_RGB:
+        frame = rgb_to_bgr565(frame)
+    assert frame.dtype == numpy.dtype('uint16')
+    assert frame.shape == (DISPLAY_LINE_PIXELS, DISPLAY_N_LINES)
+    prepared_frame = numpy.zeros(shape=(DISPLAY_LINE_PIXELS + DISPLAY_LINE_FILLER_BYTES // 2, DISPLAY_N_LINES),
+                                 dtype=numpy.uint16)
+    prepared_frame[0:DISPLAY_LINE_PIXELS, 0:DISPLAY_N_LINES] = frame
+    prepared_frame = prepared_frame.transpose().flatten()
+    if input_format == FRAME_FORMAT_RGB565:
+        prepared_frame = rgb565_to_bgr565(prepared_frame)
+    prepared_frame = prepared_frame.byteswap()
+    prepared_frame = numpy.bitwise_xor(prepared_frame, NP_DISPLAY_FRAME_XOR_PATTERN)
+    return prepared_frame.byteswap().tobytes()
@@ -0,0 +1,72 @@
+import time
+import pytest
+from push2_python.benchmark import BenchmarkPush, ConnectedFakeDisplay, FakeUSBEndpoint, make_test_frame
+from push2_python.clip import ClipPlayer, ClipWriter, write_clip
+from push2_python.constants import DISPLAY_FRAME_HEADER, DISPLAY_FRAME_SIZE, FRAME_FORMAT_BGR565, FRAME_FORMAT_RGB565
+from baseline_display import prepare_frame as baseline_prepare_frame
+
+
+@pytest.fixture
+def push():
+    return BenchmarkPush()  # Sections only keep a weak reference to the push object
+
+
+def wait_for(condition, timeout=2.0):
+    end_time = time.monotonic() + timeout
+    while not condition() and time.monotonic() < end_time:
+        time.sleep(0.01)
+    return condition()
+
+
+def get_sent_frames(endpoint):
+    frame_size = len(DISPLAY_FRAME_HEADER) + DISPLAY_FRAME_SIZE
+    return [bytes(endpoint.data[i + len(DISPLAY_FRAME_HEADER):i + frame_size])
+            for i in range(0, len(endpoint.data), frame_size)]
+
+
+@pytest.mark.parametrize('input_format', [FRAME_FORMAT_BGR565, FRAME_FORMAT_RGB565])
+def test_clip_frames_are_prepared_as_before(push, tmp_path, input_format):
+    display = ConnectedFakeDisplay(push, FakeUSBEndpoint())
+    frames = [make_test_frame(input_format, seed=seed) for seed in range(0, 5)]
+    path = str(tmp_path / 'clip.p2clip')
+    assert write_clip(path, frames, fps=25, display=display, input_format=input_format) == len(frames)
+    with ClipPlayer(display, path) as player:
+        assert player.n_frames == len(frames)
+        assert player.fps == 25
+        for index, frame in enumerate(frames):
+            prepared_frame = player.get_prepared_frame(index)
+            assert bytes(prepared_frame) == baseline_prepare_frame(frame, input_format=input_format)
+            prepared_frame.release()
+
+
+def test_clip_is_played_in_order_and_stops_at_last_frame(push, tmp_path):
+    endpoint = FakeUSBEndpoint(record_data=True)
+    display = ConnectedFakeDisplay(push, endpoint)
+    path = str(tmp_path / 'clip.p2clip')
+    with ClipWriter(path, fps=200) as writer:
+        prepared_frames = [display.prepare_frame(make_test_frame(FRAME_FORMAT_BGR565, seed=seed))
+                           for seed in range(0, 10)]
+        for prepared_frame in prepared_frames:
+            writer.add_prepared_frame(prepared_frame)
+    with ClipPlayer(display, path) as player:
+        player.play()
+        assert wait_for(lambda: not player.is_playing())
+        assert player.position == len(prepared_frames) - 1
+    sent_frames = get_sent_frames(endpoint)
+    sent_indexes = [prepared_frames.index(frame) for frame in sent_frames]  # Frames can be skipped if late
+    assert sent_indexes == sorted(sent_indexes)
+    assert sent_indexes[0] == 0 and sent_indexes[-1] == len(prepared_frames) - 1
+
+
+def test_invalid_and_truncated_clip_files_are_refused(push, tmp_path):
+    display = ConnectedFakeDisplay(push, FakeUSBEndpoint())
+    path = str(tmp_path / 'clip.p2clip')
+    with open(path, 'wb') as f:
+        f.write(b'not a clip file' * 10)
+    with pytest.raises(ValueError):
+        ClipPlayer(display, path)
+    write_clip(path, [make_test_frame(FRAME_FORMAT_BGR565, seed=seed) for seed in range(0, 2)], display=display)
+    with open(path, 'r+b') as f:
+        f.truncate(f.seek(0, 2) - 1)
+    with pytest.raises(ValueError):
+        ClipPlayer(display, path)
@@ -0,0 +1,295 @@
+import logging
+import os
+import time
+import tracemalloc
+import numpy
+import pytest
+from push2_python.benchmark import BenchmarkPush, ConnectedFakeDisplay, FakeUSBEndpoint, make_test_frame
+from push2_python.display import Push2Display
+from push2_python.constants import FRAME_FORMAT_BGR565, FRAME_FORMAT_RGB565, FRAME_FORMAT_INDEXED8, FRAME_FORMAT_RGB, \
+    FRAME_FORMAT_RGB888, FRAME_FORMAT_RGBA8888, FRAME_FORMAT_BGRA8888, FRAME_LAYOUT_COLUMN_MAJOR, \
+    FRAME_LAYOUT_ROW_MAJOR, DISPLAY_REDUCED_RESOLUTION_SCALES, DISPLAY_FRAME_SIZE, DISPLAY_LINE_PIXELS, \
+    DISPLAY_N_LINES, DISPLAY_FRAME_HEADER
+from baseline_display import prepare_frame as baseline_prepare_frame
+
+# Preparing frames in a buffer never allocates line or frame sized arrays. Only numpy views and the fixed size buffers
+# numpy uses to iterate over strided views (numpy.getbufsize() elements per operand) are allocated.
+MAX_ALLOCATED_BYTES = 64 * 1024
+
+FORMATS = [(FRAME_FORMAT_BGR565, FRAME_LAYOUT_COLUMN_MAJOR), (FRAME_FORMAT_BGR565, FRAME_LAYOUT_ROW_MAJOR),
+           (FRAME_FORMAT_RGB565, FRAME_LAYOUT_COLUMN_MAJOR), (FRAME_FORMAT_RGB565, FRAME_LAYOUT_ROW_MAJOR),
+           (FRAME_FORMAT_INDEXED8, FRAME_LAYOUT_COLUMN_MAJOR), (FRAME_FORMAT_INDEXED8, FRAME_LAYOUT_ROW_MAJOR)]
+
+
+@pytest.fixture
+def push():
+    return BenchmarkPush()  # Sections only keep a weak reference to the push object
+
+
+@pytest.fixture
+def display(push):
+    display = Push2Display(push)
+    display.set_palette(numpy.random.default_rng(0).integers(0, 2 ** 16, size=256, dtype=numpy.uint16))
+    return display
+
+
+def get_allocated_bytes(function):
+    function()  # Lazily created buffers are not counted
+    tracemalloc.start()
+    try:
+        memory_before = tracemalloc.get_traced_memory()[0]
+        function()
+        return tracemalloc.get_traced_memory()[1] - memory_before
+    finally:
+        tracemalloc.stop()
+
+
+def make_reduced_frame(input_format, layout, scale):
+    frame = make_test_frame(input_format, layout=layout)
+    return frame[::scale, ::scale].copy()
+
+
+def upscale_frame(frame, scale):
+    return frame.repeat(scale, axis=0).repeat(scale, axis=1)
+
+
+@pytest.mark.parametrize('input_format,layout', FORMATS)
+def test_prepare_frame_into_does_not_allocate(display, input_format, layout):
+    frame = make_test_frame(input_format, layout=layout)
+    out = display.make_prepared_frame_buffer()
+    assert get_allocated_bytes(
+        lambda: display.prepare_frame_into(frame, out, input_format=input_format, layout=layout)) < MAX_ALLOCATED_BYTES
+
+
+@pytest.mark.parametrize('scale', DISPLAY_REDUCED_RESOLUTION_SCALES)
+@pytest.mark.parametrize('input_format,layout', FORMATS)
+def test_prepare_reduced_frame_into_does_not_allocate(display, input_format, layout, scale):
+    frame = make_reduced_frame(input_format, layout, scale)
+    out = display.make_prepared_frame_buffer()
+    assert get_allocated_bytes(
+        lambda: display.prepare_frame_into(frame, out, input_format=input_format, layout=layout)) < MAX_ALLOCATED_BYTES
+
+
+@pytest.mark.parametrize('scale', DISPLAY_REDUCED_RESOLUTION_SCALES)
+@pytest.mark.parametrize('input_format,layout', FORMATS)
+def test_prepare_reduced_frame_into_repeats_pixels(display, input_format, layout, scale):
+    frame = make_reduced_frame(input_format, layout, scale)
+    reduced_out = display.prepare_frame_into(frame, display.make_prepared_frame_buffer(), input_format=input_format,
+                                             layout=layout)
+    full_out = display.prepare_frame_into(upscale_frame(frame, scale), display.make_prepared_frame_buffer(),
+                                          input_format=input_format, layout=layout)
+    assert reduced_out == full_out
+
+
+class SlowCheckingUSBEndpoint(object):
+    """Fake USB endpoint which takes some time to write frames and counts frames which were modified while being
+    written (as a real USB transfer would then send a mix of two frames).
+    """
+
+    def __init__(self, latency=0.002):
+        self.latency = latency
+        self.n_frames_written = 0
+        self.n_torn_frames = 0
+
+    def write(self, data, timeout=None):
+        if len(data) == DISPLAY_FRAME_SIZE:
+            data_before = bytes(data)
+            time.sleep(self.latency)
+            self.n_frames_written += 1
+            if bytes(data) != data_before:
+                self.n_torn_frames += 1
+        return len(data)
+
+
+@pytest.mark.parametrize('use_sender_thread', [False, True])
+def test_keep_alive_never_sends_frames_being_prepared(push, use_sender_thread):
+    endpoint = SlowCheckingUSBEndpoint()
+    display = ConnectedFakeDisplay(push, endpoint)
+    if use_sender_thread:
+        display.start_sender_thread()
+    display.start_keep_alive_thread(interval=0.001)
+    try:
+        for i in range(0, 200):
+            display.display_frame(numpy.full((DISPLAY_LINE_PIXELS, DISPLAY_N_LINES), i, dtype=numpy.uint16))
+    finally:
+        display.stop_keep_alive_thread()
+        display.stop_sender_thread()
+    assert endpoint.n_frames_written > 0
+    assert endpoint.n_torn_frames == 0
+
+
+@pytest.mark.parametrize('use_sender_thread', [False, True])
+def test_update_region_matches_displaying_whole_frame(push, use_sender_thread):
+    endpoint = SlowCheckingUSBEndpoint(latency=0)
+    display = ConnectedFakeDisplay(push, endpoint)
+    if use_sender_thread:
+        display.start_sender_thread()
+    try:
+        frame = make_test_frame(FRAME_FORMAT_BGR565)
+        region = make_test_frame(FRAME_FORMAT_BGR565, seed=1)[120:240, 0:DISPLAY_N_LINES]
+        display.display_frame(frame)
+        display.update_region(120, 0, 120, DISPLAY_N_LINES, region)
+        display.update_region(360, 40, 120, 80, region[:, 40:120])
+        expected_frame = frame.copy()
+        expected_frame[120:240, :] = region
+        expected_frame[360:480, 40:120] = region[:, 40:120]
+    finally:
+        display.stop_sender_thread()
+    last_prepared_frame = bytes(display.last_prepared_frame)
+    assert last_prepared_frame == display.prepare_frame(expected_frame)
+    assert endpoint.n_torn_frames == 0
+
+
+def test_keep_alive_is_not_affected_by_wall_clock_changes(push, monkeypatch):
+    endpoint = SlowCheckingUSBEndpoint(latency=0)
+    display = ConnectedFakeDisplay(push, endpoint)
+    display.display_frame(make_test_frame(FRAME_FORMAT_BGR565))
+    wall_clock_time = time.time
+    monkeypatch.setattr(time, 'time', lambda: wall_clock_time() - 3600)  # Clock set back one hour
+    display.start_keep_alive_thread(interval=0.02)
+    try:
+        time.sleep(0.2)
+    finally:
+        display.stop_keep_alive_thread()
+    assert endpoint.n_frames_written > 2
+
+
+def count_sent_frames(endpoint):
+    return endpoint.n_bytes // (len(DISPLAY_FRAME_HEADER) + DISPLAY_FRAME_SIZE)
+
+
+def test_identical_frames_are_skipped(push):
+    endpoint = FakeUSBEndpoint(record_data=True)
+    display = ConnectedFakeDisplay(push, endpoint)
+    display.enable_skip_identical_frames()
+    frame = make_test_frame(FRAME_FORMAT_BGR565)
+    for _ in range(0, 5):
+        display.display_frame(frame)
+    assert count_sent_frames(endpoint) == 1
+    frame[0, 0] += 1  # Frames are compared by contents, so a frame modified in place is not skipped
+    display.display_frame(frame)
+    display.display_frame(frame, input_format=FRAME_FORMAT_RGB565)  # Same data in another format is not skipped
+    assert count_sent_frames(endpoint) == 3
+    assert bytes(endpoint.data[-DISPLAY_FRAME_SIZE:]) == baseline_prepare_frame(frame, input_format=FRAME_FORMAT_RGB565)
+    assert display.get_skip_stats() == {'frames_checked': 7, 'frames_skipped': 4, 'keep_alive_frames': 0,
+                                        'skip_rate': 4 / 7, 'bytes_saved': 4 * DISPLAY_FRAME_SIZE}
+
+
+def test_skipped_frames_are_resent_after_keep_alive_interval(push):
+    endpoint = FakeUSBEndpoint(record_data=True)
+    display = ConnectedFakeDisplay(push, endpoint)
+    display.enable_skip_identical_frames(keep_alive_interval=0.05)
+    frame = make_test_frame(FRAME_FORMAT_BGR565)
+    display.display_frame(frame)
+    display.display_frame(frame)
+    time.sleep(0.06)
+    display.display_frame(frame)
+    display.display_frame(frame)
+    assert count_sent_frames(endpoint) == 2
+    assert bytes(endpoint.data[-DISPLAY_FRAME_SIZE:]) == baseline_prepare_frame(frame)
+    stats = display.get_skip_stats()
+    assert stats['frames_skipped'] == 3 and stats['keep_alive_frames'] == 1
+    assert stats['bytes_saved'] == 2 * DISPLAY_FRAME_SIZE
+
+
+def test_rgb_frames_are_prepared_as_before_and_not_modified(display):
+    frame = make_test_frame(FRAME_FORMAT_RGB)
+    frame_before = frame.copy()
+    assert display.prepare_frame(frame, input_format=FRAME_FORMAT_RGB) == \
+        baseline_prepare_frame(frame, input_format=FRAME_FORMAT_RGB)
+    assert numpy.array_equal(frame, frame_before)
+
+
+@pytest.mark.parametrize('input_format,channel_indexes', [(FRAME_FORMAT_RGB888, [0, 1, 2]),
+                                                          (FRAME_FORMAT_RGBA8888, [0, 1, 2, 3]),
+                                                          (FRAME_FORMAT_BGRA8888, [2, 1, 0, 3])])
+def test_uint8_rgb_frames_are_prepared_as_equivalent_float_rgb_frames(display, input_format, channel_indexes):
+    rgb888_frame = make_test_frame(FRAME_FORMAT_RGB888)
+    rgba8888_frame = numpy.concatenate([rgb888_frame, make_test_frame(FRAME_FORMAT_RGBA8888, seed=1)[:, :, 3:]], axis=2)
+    frame = rgba8888_frame[:, :, channel_indexes].copy()
+    frame_before = frame.copy()
+    float_frame = (rgb888_frame + 0.5) / 255  # Values which the float conversion truncates to the uint8 values
+    assert display.prepare_frame(frame, input_format=input_format) == \
+        baseline_prepare_frame(float_frame, input_format=FRAME_FORMAT_RGB)
+    assert numpy.array_equal(frame, frame_before)
+
+
+@pytest.mark.parametrize('input_format', [FRAME_FORMAT_BGR565, FRAME_FORMAT_RGB565])
+def test_column_major_frames_are_prepared_as_before(display, input_format):
+    frame = make_test_frame(input_format)
+    assert display.prepare_frame(frame, input_format=input_format) == \
+        baseline_prepare_frame(frame, input_format=input_format)
+
+
+@pytest.mark.parametrize('input_format', [FRAME_FORMAT_BGR565, FRAME_FORMAT_RGB565])
+def test_row_major_frames_are_prepared_as_transposed_column_major_frames(display, input_format):
+    frame = make_test_frame(input_format, layout=FRAME_LAYOUT_ROW_MAJOR)
+    assert display.prepare_frame(frame, input_format=input_format, layout=FRAME_LAYOUT_ROW_MAJOR) == \
+        baseline_prepare_frame(frame.transpose().copy(), input_format=input_format)
+
+
+def test_parallel_conversion_is_not_enabled_with_a_single_cpu(display, monkeypatch, caplog):
+    monkeypatch.setattr(os, 'cpu_count', lambda: 1)
+    with caplog.at_level(logging.INFO):
+        display.enable_parallel_conversion()
+    assert display.conversion_pool is None
+    assert not [record for record in caplog.records if record.levelno >= logging.WARNING]
+
+
+@pytest.mark.parametrize('n_threads', [2, 3, 4])
+@pytest.mark.parametrize('input_format,layout', [(FRAME_FORMAT_RGB565, FRAME_LAYOUT_COLUMN_MAJOR),
+                                                 (FRAME_FORMAT_RGB565, FRAME_LAYOUT_ROW_MAJOR),
+                                                 (FRAME_FORMAT_RGB, FRAME_LAYOUT_COLUMN_MAJOR),
+                                                 (FRAME_FORMAT_RGB888, FRAME_LAYOUT_COLUMN_MAJOR),
+                                                 (FRAME_FORMAT_RGBA8888, FRAME_LAYOUT_COLUMN_MAJOR),
+                                                 (FRAME_FORMAT_BGRA8888, FRAME_LAYOUT_COLUMN_MAJOR)])
+def test_parallel_conversion_prepares_the_same_frames(display, input_format, layout, n_threads):
+    frames = [make_test_frame(input_format, layout=layout, seed=seed) for seed in range(0, 3)]
+    serial_prepared_frames = [display.prepare_frame(frame, input_format=input_format, layout=layout)
+                              for frame in frames]
+    display.enable_parallel_conversion(n_threads=n_threads)
+    try:
+        assert display.conversion_pool is not None
+        assert [display.prepare_frame(frame, input_format=input_format, layout=layout)
+                for frame in frames] == serial_prepared_frames
+    finally:
+        display.disable_parallel_conversion()
+    if input_format in [FRAME_FORMAT_RGB565, FRAME_FORMAT_RGB] and layout == FRAME_LAYOUT_COLUMN_MAJOR:
+        assert serial_prepared_frames[0] == baseline_prepare_frame(frames[0], input_format=input_format)
+
+
+@pytest.mark.parametrize('layout', [FRAME_LAYOUT_COLUMN_MAJOR, FRAME_LAYOUT_ROW_MAJOR])
+def test_indexed_frames_are_prepared_as_bgr565_frames_of_palette_colors(display, layout):
+    frame = make_test_frame(FRAME_FORMAT_INDEXED8, layout=layout)
+    bgr565_frame = display.palette[frame]
+    if layout == FRAME_LAYOUT_ROW_MAJOR:
+        bgr565_frame = bgr565_frame.transpose().copy()
+    assert display.prepare_frame(frame, input_format=FRAME_FORMAT_INDEXED8, layout=layout) == \
+        baseline_prepare_frame(bgr565_frame)
+
+
+def test_rgb_palettes_are_converted_and_missing_colors_are_black(display):
+    rgb_palette = make_test_frame(FRAME_FORMAT_RGB888)[0, 0:16]
+    display.set_palette(rgb_palette)
+    frame = make_test_frame(FRAME_FORMAT_INDEXED8)
+    expected_bgr565_frame = numpy.zeros(frame.shape, dtype=numpy.uint16)
+    in_palette = frame < 16
+    r, g, b = [rgb_palette[:, i].astype(numpy.uint16) for i in range(0, 3)]
+    bgr565_palette = (r >> 3) | ((g & 0b11111100) << 3) | ((b & 0b11111000) << 8)
+    expected_bgr565_frame[in_palette] = bgr565_palette[frame[in_palette]]
+    assert display.prepare_frame(frame, input_format=FRAME_FORMAT_INDEXED8) == \
+        baseline_prepare_frame(expected_bgr565_frame)
+
+
+def test_same_indexed_frame_is_sent_again_after_changing_palette(push):
+    endpoint = FakeUSBEndpoint(record_data=True)
+    display = ConnectedFakeDisplay(push, endpoint)
+    display.enable_skip_identical_frames()
+    frame = make_test_frame(FRAME_FORMAT_INDEXED8)
+    palettes = [numpy.random.default_rng(seed).integers(0, 2 ** 16, size=256, dtype=numpy.uint16) for seed in [1, 2]]
+    for palette in palettes:
+        display.set_palette(palette)
+        display.display_frame(frame, input_format=FRAME_FORMAT_INDEXED8)
+        display.display_frame(frame, input_format=FRAME_FORMAT_INDEXED8)
+        assert bytes(endpoint.data[-DISPLAY_FRAME_SIZE:]) == baseline_prepare_frame(palette[frame])
+    assert count_sent_frames(endpoint) == 2
@@ -0,0 +1,106 @@
+import threading
+import time
+import pytest
+from push2_python.benchmark import BenchmarkPush, ConnectedFakeDisplay, FakeUSBEndpoint, make_test_frame
+from push2_python.display import DisplayFrameSender
+from push2_python.constants import DISPLAY_FRAME_HEADER, DISPLAY_FRAME_SIZE, FRAME_FORMAT_BGR565, FRAME_FORMAT_RGB565
+from baseline_display import prepare_frame as baseline_prepare_frame
+
+
+@pytest.fixture
+def push():
+    return BenchmarkPush()  # Sections only keep a weak reference to the push object
+
+
+class BlockingSendFunction(object):
+    """Send function which records the buffers it is called with and blocks until 'release' is called.
+    """
+
+    def __init__(self):
+        self.sent_buffers = []
+        self.sending = threading.Event()
+        self.released = threading.Event()
+
+    def __call__(self, buffer):
+        self.sent_buffers.append(buffer)
+        self.sending.set()
+        self.released.wait()
+
+    def release(self):
+        self.released.set()
+
+
+def wait_for(condition, timeout=2.0):
+    end_time = time.monotonic() + timeout
+    while not condition() and time.monotonic() < end_time:
+        time.sleep(0.001)
+    return condition()
+
+
+def split_sent_frames(data):
+    frame_size = len(DISPLAY_FRAME_HEADER) + DISPLAY_FRAME_SIZE
+    assert len(data) % frame_size == 0
+    frames = [bytes(data[i:i + frame_size]) for i in range(0, len(data), frame_size)]
+    assert all(frame.startswith(bytes(DISPLAY_FRAME_HEADER)) for frame in frames)
+    return [frame[len(DISPLAY_FRAME_HEADER):] for frame in frames]
+
+
+def test_only_latest_pending_frame_is_sent():
+    send_function = BlockingSendFunction()
+    sender = DisplayFrameSender(send_function, bytearray)
+    sender.start()
+    try:
+        buffers = [bytearray([i]) for i in range(0, 4)]
+        sender.submit(buffers[0])
+        assert send_function.sending.wait(2.0)  # First frame is being sent, next ones wait in the mailbox
+        for buffer in buffers[1:]:
+            sender.submit(buffer)
+        send_function.release()
+        assert wait_for(lambda: sender.get_stats()['frames_sent'] == 2)
+    finally:
+        sender.stop()
+    assert send_function.sent_buffers == [buffers[0], buffers[3]]
+    assert sender.get_stats() == {'frames_submitted': 4, 'frames_sent': 2, 'frames_dropped': 2}
+
+
+def test_buffers_are_recycled_and_never_handed_out_while_in_use():
+    n_buffers_made = []
+
+    def make_buffer():
+        n_buffers_made.append(1)
+        return bytearray(1)
+
+    sender = DisplayFrameSender(lambda buffer: time.sleep(0.0005), make_buffer)
+    sender.start()
+    try:
+        for _ in range(0, 200):
+            buffer = sender.get_free_buffer()
+            with sender.condition:
+                assert buffer is not sender.sending_buffer and buffer is not sender.latest_buffer
+            sender.submit(buffer)
+    finally:
+        sender.stop()
+    assert len(n_buffers_made) == 3  # Only the initial buffers are ever needed with a single producer
+    stats = sender.get_stats()
+    assert stats['frames_submitted'] == 200
+    assert stats['frames_dropped'] > 0
+
+
+@pytest.mark.parametrize('input_format', [FRAME_FORMAT_BGR565, FRAME_FORMAT_RGB565])
+def test_sender_thread_sends_frames_prepared_as_before(push, input_format):
+    endpoint = FakeUSBEndpoint(latency=0.001, record_data=True)
+    display = ConnectedFakeDisplay(push, endpoint)
+    frames = [make_test_frame(input_format, seed=seed) for seed in range(0, 10)]
+    display.start_sender_thread()
+    try:
+        for frame in frames:
+            display.display_frame(frame, input_format=input_format)
+        assert wait_for(lambda: display.get_sender_stats()['frames_sent'] + display.get_sender_stats()[
+            'frames_dropped'] == len(frames))
+    finally:
+        display.stop_sender_thread()
+    expected_frames = [baseline_prepare_frame(frame, input_format=input_format) for frame in frames]
+    sent_frames = split_sent_frames(endpoint.data)
+    assert all(sent_frame in expected_frames for sent_frame in sent_frames)
+    assert sent_frames[-1] == expected_frames[-1]  # The latest frame is never dropped
+    assert bytes(display.last_prepared_frame) == expected_frames[-1]
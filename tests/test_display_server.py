@@ -0,0 +1,91 @@
+import os
+import stat
+import time
+import pytest
+from multiprocessing import AuthenticationError
+from multiprocessing.connection import Client
+from push2_python.benchmark import BenchmarkPush, ConnectedFakeDisplay, FakeUSBEndpoint
+from push2_python.display_server import DisplayServer, DisplayClient, get_default_address
+
+pytestmark = pytest.mark.skipif(not hasattr(os, 'getuid'), reason='Unix sockets are not available')
+
+
+@pytest.fixture
+def push():
+    return BenchmarkPush()  # Sections only keep a weak reference to the push object
+
+
+@pytest.fixture
+def display(push):
+    return ConnectedFakeDisplay(push, FakeUSBEndpoint())
+
+
+def start_server(display, address):
+    server = DisplayServer(display, address=address)
+    server.start()
+    return server
+
+
+def wait_for(condition, timeout=2.0):
+    end_time = time.monotonic() + timeout
+    while not condition() and time.monotonic() < end_time:
+        time.sleep(0.01)
+    return condition()
+
+
+def test_default_address_is_unix_socket_in_private_directory(monkeypatch, tmp_path):
+    monkeypatch.setenv('XDG_RUNTIME_DIR', str(tmp_path))
+    assert get_default_address() == os.path.join(str(tmp_path), 'push2-python-display.sock')
+
+
+def test_client_flips_frames_through_unix_socket(display, tmp_path):
+    address = str(tmp_path / 'private' / 'display.sock')
+    server = start_server(display, address)
+    try:
+        assert server.authkey is None
+        assert stat.S_IMODE(os.stat(address).st_mode) == 0o600
+        assert stat.S_IMODE(os.stat(os.path.dirname(address)).st_mode) == 0o700
+        with DisplayClient(address=address) as client:
+            first_buffer_index = client.buffer_index
+            client.frame.fill(1)
+            client.flip()
+            assert client.buffer_index != first_buffer_index
+            assert wait_for(lambda: server.get_stats()['frames_displayed'] == 1)
+    finally:
+        server.stop()
+
+
+def test_server_refuses_socket_directory_accessible_by_other_users(display, tmp_path):
+    directory = tmp_path / 'shared'
+    directory.mkdir(mode=0o777)
+    os.chmod(str(directory), 0o777)
+    with pytest.raises(PermissionError):
+        start_server(display, str(directory / 'display.sock'))
+
+
+def test_tcp_server_generates_random_authkey(display):
+    server = start_server(display, ('127.0.0.1', 0))
+    try:
+        assert server.authkey is not None and len(server.authkey) == 32
+        with pytest.raises(AuthenticationError):
+            DisplayClient(address=server.address, authkey=b'push2-python')
+        with DisplayClient(address=server.address, authkey=server.authkey) as client:
+            client.flip()
+            assert wait_for(lambda: server.get_stats()['frames_displayed'] == 1)
+    finally:
+        server.stop()
+
+
+def test_server_closes_connection_on_invalid_message(display, tmp_path):
+    address = str(tmp_path / 'display.sock')
+    server = start_server(display, address)
+    try:
+        connection = Client(address)
+        connection.recv_bytes()
+        connection.send_bytes(b'not a flip message')
+        with pytest.raises(EOFError):
+            connection.recv_bytes()
+        connection.close()
+        assert server.get_stats()['frames_flipped'] == 0
+    finally:
+        server.stop()
@@ -0,0 +1,66 @@
+import pytest
+from push2_python.benchmark import BenchmarkPush, ConnectedFakeDisplay, FakeUSBEndpoint, make_test_frame
+from push2_python.display_stats import RollingHistogram
+from push2_python.constants import DISPLAY_FRAME_SIZE, FRAME_FORMAT_RGB565
+from baseline_display import prepare_frame as baseline_prepare_frame
+
+FRAME_STAGES = {'prepare', 'convert', 'xor', 'send', 'header', 'bulk'}
+
+
+@pytest.fixture
+def push():
+    return BenchmarkPush()  # Sections only keep a weak reference to the push object
+
+
+def test_rolling_histogram_only_uses_durations_in_window():
+    histogram = RollingHistogram(window=4, bounds=[0.01, 0.1])
+    for duration in [1.0, 1.0, 0.005, 0.05, 0.05, 0.5]:
+        histogram.add(duration)
+    stats = histogram.get_stats()
+    assert stats['count'] == 6
+    assert stats['mean'] == pytest.approx((0.005 + 0.05 + 0.05 + 0.5) / 4)
+    assert stats['p50'] == pytest.approx(0.05)
+    assert stats['max'] == 0.5
+    assert stats['histogram'] == [1, 2, 1]
+    assert RollingHistogram(window=4, bounds=[0.01, 0.1]).get_stats()['histogram'] == [0, 0, 0]
+
+
+def test_stages_are_timed_for_every_frame(push):
+    endpoint = FakeUSBEndpoint(record_data=True)
+    display = ConnectedFakeDisplay(push, endpoint)
+    frame_durations = []
+    display.enable_timing_stats(frame_callback=frame_durations.append)
+    frames = [make_test_frame(FRAME_FORMAT_RGB565, seed=seed) for seed in range(0, 3)]
+    for frame in frames:
+        display.display_frame(frame, input_format=FRAME_FORMAT_RGB565)
+        # Timing the stages does not change the prepared frames
+        assert bytes(endpoint.data[-DISPLAY_FRAME_SIZE:]) == \
+            baseline_prepare_frame(frame, input_format=FRAME_FORMAT_RGB565)
+    assert len(frame_durations) == len(frames)
+    assert all(set(durations.keys()) == FRAME_STAGES for durations in frame_durations)
+    stages = display.stats()['stages']
+    assert set(stages.keys()) == FRAME_STAGES
+    assert all(stage_stats['count'] == len(frames) for stage_stats in stages.values())
+    assert stages['prepare']['max'] >= stages['convert']['max']
+
+
+def test_errors_in_frame_callback_are_not_raised(push):
+    display = ConnectedFakeDisplay(push, FakeUSBEndpoint())
+    display.enable_timing_stats(frame_callback=lambda durations: 1 / 0)
+    display.display_frame(display.make_black_frame())
+    assert display.stats()['stages']['send']['count'] == 1
+
+
+def test_stats_snapshot(push):
+    display = ConnectedFakeDisplay(push, FakeUSBEndpoint(error_rate=1.0))
+    display.display_frame(display.make_black_frame())
+    stats = display.stats()
+    assert not stats['connected']
+    assert stats['usb_errors'] == 1
+    assert stats['stages'] == {}
+    assert stats['skip'] is None and stats['sender'] is None and stats['frame_cache'] is None
+    display.enable_skip_identical_frames()
+    display.enable_frame_cache()
+    stats = display.stats()
+    assert stats['skip'] == display.get_skip_stats()
+    assert stats['frame_cache'] == display.get_frame_cache_stats()
@@ -0,0 +1,108 @@
+import numpy
+import pytest
+import usb.core
+from push2_python.benchmark import BenchmarkPush, AsyncFakeDisplay, make_test_frame
+from push2_python.display_transport import AsyncDisplayTransport, FakeTransferBackend
+from push2_python.constants import DISPLAY_FRAME_HEADER, DISPLAY_BUFFER_SIZE, DISPLAY_FRAME_SIZE, FRAME_FORMAT_BGR565
+
+
+@pytest.fixture
+def push():
+    return BenchmarkPush()  # Sections only keep a weak reference to the push object
+
+
+def make_prepared_frame(seed):
+    return numpy.random.default_rng(seed).integers(0, 256, size=DISPLAY_FRAME_SIZE, dtype=numpy.uint8).tobytes()
+
+
+class FailingTransferBackend(FakeTransferBackend):
+    """Fake backend whose transfers fail from the given transfer number on (counting from 0). Failed transfers
+    complete right away when submitted if 'fail_on_submit' is True, otherwise they complete in order.
+    """
+
+    def __init__(self, first_failed_transfer, fail_on_submit=False):
+        super().__init__()
+        self.first_failed_transfer = first_failed_transfer
+        self.fail_on_submit = fail_on_submit
+        self.n_submitted = 0
+
+    def submit(self, data, callback):
+        fail = self.n_submitted >= self.first_failed_transfer
+        self.n_submitted += 1
+        if fail and self.fail_on_submit:
+            callback(False)
+        else:
+            super().submit(data, lambda success: callback(success and not fail))
+
+
+@pytest.mark.parametrize('n_transfers', [1, 2, 4])
+def test_frames_are_sent_byte_exact(n_transfers):
+    backend = FakeTransferBackend(record_data=True)
+    transport = AsyncDisplayTransport(backend, n_transfers=n_transfers)
+    frames = [make_prepared_frame(seed) for seed in range(0, 3)]
+    for frame in frames:
+        transport.send_frame(frame)
+    transport.flush()
+    assert bytes(backend.received_data) == b''.join(bytes(DISPLAY_FRAME_HEADER) + frame for frame in frames)
+    assert backend.n_transfers == len(frames) * (1 + DISPLAY_FRAME_SIZE // DISPLAY_BUFFER_SIZE)
+
+
+def test_prepared_frame_can_be_reused_after_send_frame():
+    backend = FakeTransferBackend(record_data=True)
+    transport = AsyncDisplayTransport(backend)
+    frame = bytearray(make_prepared_frame(0))
+    transport.send_frame(frame)
+    expected_data = bytes(DISPLAY_FRAME_HEADER) + bytes(frame)
+    frame[:] = make_prepared_frame(1)
+    transport.flush()
+    assert bytes(backend.received_data) == expected_data
+
+
+@pytest.mark.parametrize('n_transfers', [1, 2, 4])
+def test_transfers_in_flight_are_limited(n_transfers):
+    backend = FakeTransferBackend(transfer_time=0.0001)
+    transport = AsyncDisplayTransport(backend, n_transfers=n_transfers)
+    for seed in range(0, 3):
+        transport.send_frame(make_prepared_frame(seed))
+        assert transport.n_transfers_in_flight <= n_transfers
+    transport.flush()
+    assert backend.max_pending == n_transfers
+    assert transport.n_transfers_in_flight == 0
+
+
+def test_failed_transfers_are_raised():
+    backend = FakeTransferBackend()
+    transport = AsyncDisplayTransport(backend, n_transfers=2)
+    backend.fail_transfers = True
+    with pytest.raises(usb.core.USBError):
+        transport.send_frame(make_prepared_frame(0))
+    backend.fail_transfers = False
+    transport.flush()  # Failures were already reported
+    transport.send_frame(make_prepared_frame(1))
+    transport.flush()
+
+
+def test_failure_of_last_transfer_is_raised_by_flush():
+    n_transfers_per_frame = 1 + DISPLAY_FRAME_SIZE // DISPLAY_BUFFER_SIZE
+    backend = FailingTransferBackend(first_failed_transfer=n_transfers_per_frame - 1)
+    transport = AsyncDisplayTransport(backend, n_transfers=4)
+    transport.send_frame(make_prepared_frame(0))  # Last transfer is still in flight
+    with pytest.raises(usb.core.USBError):
+        transport.flush()
+
+
+def test_failure_of_last_transfer_is_raised_after_final_submit():
+    n_transfers_per_frame = 1 + DISPLAY_FRAME_SIZE // DISPLAY_BUFFER_SIZE
+    backend = FailingTransferBackend(first_failed_transfer=n_transfers_per_frame - 1, fail_on_submit=True)
+    transport = AsyncDisplayTransport(backend, n_transfers=4)
+    with pytest.raises(usb.core.USBError):
+        transport.send_frame(make_prepared_frame(0))
+
+
+def test_display_sends_frames_with_async_transport(push):
+    backend = FakeTransferBackend(record_data=True)
+    display = AsyncFakeDisplay(push, backend)
+    frame = make_test_frame(FRAME_FORMAT_BGR565)
+    display.display_frame(frame)
+    display.transport.flush()
+    assert bytes(backend.received_data) == bytes(DISPLAY_FRAME_HEADER) + bytes(display.prepare_frame(frame))
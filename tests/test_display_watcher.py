@@ -0,0 +1,116 @@
+import threading
+import time
+import usb1
+from push2_python.display_watcher import DisplayConnectionWatcher
+from push2_python.exceptions import Push2USBDeviceNotFound
+
+
+class FakeDisplay(object):
+    """Display whose USB device can be plugged in by the test. Counts connection attempts (i.e. USB bus scans).
+    """
+
+    def __init__(self):
+        self.usb_endpoint = None
+        self.plugged_in = False
+        self.n_connection_attempts = 0
+
+    def connect_usb_device(self):
+        self.n_connection_attempts += 1
+        if not self.plugged_in:
+            raise Push2USBDeviceNotFound
+        self.usb_endpoint = object()
+
+
+class FakeHotplugContext(object):
+    """Replacement for usb1.USBContext which delivers an arrival event to the watcher when 'plug_in' is called.
+    """
+
+    def __init__(self, watcher, fail=False):
+        self.watcher = watcher
+        self.fail = fail
+        self.arrived = threading.Event()
+        self.closed = False
+
+    def plug_in(self):
+        self.watcher.display.plugged_in = True
+        self.arrived.set()
+
+    def handleEventsTimeout(self, tv=0):
+        if self.fail:
+            raise usb1.USBError('Fake hotplug error')
+        if self.arrived.wait(tv):
+            self.arrived.clear()
+            self.watcher.on_hotplug_event(self, None, usb1.HOTPLUG_EVENT_DEVICE_ARRIVED)
+
+    def close(self):
+        self.closed = True
+
+
+def start_watcher(display, hotplug_fail=None):
+    watcher = DisplayConnectionWatcher(display, use_hotplug=False, min_interval=0.01, max_interval=0.04)
+    if hotplug_fail is not None:
+        watcher.hotplug_context = FakeHotplugContext(watcher, fail=hotplug_fail)
+    watcher.start()
+    return watcher
+
+
+def wait_for(condition, timeout=2.0):
+    end_time = time.monotonic() + timeout
+    while not condition() and time.monotonic() < end_time:
+        time.sleep(0.01)
+    return condition()
+
+
+def test_watcher_polls_without_hotplug():
+    display = FakeDisplay()
+    watcher = start_watcher(display)
+    try:
+        assert wait_for(lambda: display.n_connection_attempts >= 5)
+        display.plugged_in = True
+        assert wait_for(lambda: display.usb_endpoint is not None)
+    finally:
+        watcher.stop()
+
+
+def test_watcher_does_not_poll_with_hotplug():
+    display = FakeDisplay()
+    watcher = start_watcher(display, hotplug_fail=False)
+    hotplug_context = watcher.hotplug_context
+    try:
+        time.sleep(0.3)
+        assert display.n_connection_attempts == 1
+        hotplug_context.plug_in()
+        assert wait_for(lambda: display.usb_endpoint is not None)
+        assert display.n_connection_attempts == 2
+        assert watcher.get_stats()['connections'] == 1
+    finally:
+        watcher.stop()
+    assert hotplug_context.closed
+
+
+def test_watcher_retries_with_backoff_after_disconnection_with_hotplug():
+    display = FakeDisplay()
+    display.plugged_in = True
+    watcher = start_watcher(display, hotplug_fail=False)
+    try:
+        assert wait_for(lambda: display.usb_endpoint is not None)
+        display.plugged_in = False
+        display.usb_endpoint = None
+        watcher.notify_disconnected()
+        time.sleep(0.3)
+        n_connection_attempts = display.n_connection_attempts
+        assert 2 < n_connection_attempts < 10  # Backoff up to max interval, then wait for Push2 to be plugged in
+        time.sleep(0.2)
+        assert display.n_connection_attempts == n_connection_attempts
+    finally:
+        watcher.stop()
+
+
+def test_watcher_falls_back_to_polling_if_hotplug_fails():
+    display = FakeDisplay()
+    watcher = start_watcher(display, hotplug_fail=True)
+    try:
+        assert wait_for(lambda: display.n_connection_attempts >= 5)
+        assert not watcher.get_stats()['hotplug']
+    finally:
+        watcher.stop()
@@ -0,0 +1,61 @@
+import pytest
+from push2_python.benchmark import BenchmarkPush, ConnectedFakeDisplay, FakeUSBEndpoint, make_test_frame
+from push2_python.frame_cache import PreparedFrameCache
+from push2_python.constants import DISPLAY_FRAME_SIZE, FRAME_FORMAT_BGR565, FRAME_FORMAT_RGB565, FRAME_FORMAT_RGB888, \
+    FRAME_LAYOUT_COLUMN_MAJOR, FRAME_LAYOUT_ROW_MAJOR
+from baseline_display import prepare_frame as baseline_prepare_frame
+
+
+@pytest.fixture
+def push():
+    return BenchmarkPush()  # Sections only keep a weak reference to the push object
+
+
+def make_cache_key(cache, seed):
+    return cache.make_key(make_test_frame(FRAME_FORMAT_RGB888, seed=seed), FRAME_FORMAT_RGB888,
+                          FRAME_LAYOUT_COLUMN_MAJOR)
+
+
+def test_least_recently_used_frames_are_evicted_by_size():
+    cache = PreparedFrameCache(max_bytes=3 * 100)
+    keys = [make_cache_key(cache, seed) for seed in range(0, 4)]
+    for i in range(0, 3):
+        cache.put(keys[i], bytes([i]) * 100)
+    assert cache.get(keys[0]) == bytes([0]) * 100  # Key 1 is now the least recently used
+    cache.put(keys[3], bytes([3]) * 100)
+    assert cache.get(keys[1]) is None
+    assert cache.get(keys[2]) == bytes([2]) * 100
+    cache.put(keys[0], bytes([0]) * 200)  # Replacing a frame with a bigger one evicts enough frames to fit
+    assert cache.get(keys[3]) is None
+    assert cache.get_stats() == {'hits': 2, 'misses': 2, 'evictions': 2, 'hit_rate': 0.5, 'frames': 2, 'bytes': 300,
+                                 'max_bytes': 300}
+    cache.put(keys[1], bytes(400))  # Frames bigger than the cache are not stored
+    assert cache.get(keys[1]) is None
+    assert cache.get_stats()['bytes'] == 300
+
+
+def test_keys_depend_on_contents_format_and_layout():
+    cache = PreparedFrameCache()
+    frame = make_test_frame(FRAME_FORMAT_BGR565, layout=FRAME_LAYOUT_ROW_MAJOR)
+    key = cache.make_key(frame, FRAME_FORMAT_BGR565, FRAME_LAYOUT_ROW_MAJOR)
+    assert cache.make_key(frame.copy(), FRAME_FORMAT_BGR565, FRAME_LAYOUT_ROW_MAJOR) == key
+    assert cache.make_key(frame, FRAME_FORMAT_RGB565, FRAME_LAYOUT_ROW_MAJOR) != key
+    assert cache.make_key(frame.transpose(), FRAME_FORMAT_BGR565, FRAME_LAYOUT_COLUMN_MAJOR) != key
+    modified_frame = frame.copy()
+    modified_frame[0, 0] += 1
+    assert cache.make_key(modified_frame, FRAME_FORMAT_BGR565, FRAME_LAYOUT_ROW_MAJOR) != key
+
+
+@pytest.mark.parametrize('input_format', [FRAME_FORMAT_BGR565, FRAME_FORMAT_RGB565])
+def test_cached_frames_are_prepared_as_before(push, input_format):
+    display = ConnectedFakeDisplay(push, FakeUSBEndpoint())
+    display.enable_frame_cache(max_bytes=2 * DISPLAY_FRAME_SIZE)
+    frames = [make_test_frame(input_format, seed=seed) for seed in range(0, 3)]
+    expected_prepared_frames = [baseline_prepare_frame(frame, input_format=input_format) for frame in frames]
+    for _ in range(0, 2):
+        for frame, expected_prepared_frame in zip(frames[0:2], expected_prepared_frames[0:2]):
+            assert display.prepare_frame(frame, input_format=input_format) == expected_prepared_frame
+    assert display.prepare_frame(frames[2], input_format=input_format) == expected_prepared_frames[2]
+    assert display.prepare_frame(frames[0], input_format=input_format) == expected_prepared_frames[0]
+    stats = display.get_frame_cache_stats()
+    assert (stats['hits'], stats['misses'], stats['evictions'], stats['frames']) == (2, 4, 2, 2)
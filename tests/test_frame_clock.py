@@ -0,0 +1,74 @@
+import numpy
+from push2_python.benchmark import BenchmarkPush, ConnectedFakeDisplay, FakeUSBEndpoint, make_test_frame
+from push2_python.constants import FRAME_FORMAT_BGR565
+from push2_python.frame_clock import DisplayFrameClock
+
+
+class FakeSendDisplay(object):
+    """Display which takes 'send_duration' seconds to send frames, which are only sent if 'connected' is True.
+    """
+
+    def __init__(self, send_duration):
+        self.send_duration = send_duration
+        self.connected = True
+        self.skip = False
+        self.last_prepare_duration = 0.0
+        self.last_send_duration = 0.0
+        self.n_measured_sends = 0
+
+    def display_frame(self, frame, input_format=None, layout=None):
+        if self.skip:
+            return False
+        self.last_prepare_duration = 0.001
+        if self.connected:
+            self.last_send_duration = self.send_duration
+            self.n_measured_sends += 1
+        return True
+
+
+def make_clock(display, fps=60):
+    return DisplayFrameClock(display, lambda: numpy.zeros(1), fps=fps)
+
+
+def test_frame_rate_adapts_to_measured_send_durations():
+    display = FakeSendDisplay(send_duration=0.1)  # Longer than the 60 fps frame budget
+    clock = make_clock(display)
+    for _ in range(0, 20):
+        clock.display_next_frame(0.0, 0.0)
+    assert clock.current_fps < 10
+    display.send_duration = 0.001
+    for _ in range(0, 100):
+        clock.display_next_frame(0.0, 0.0)
+    assert clock.current_fps == 60
+
+
+def test_stale_send_durations_are_not_used():
+    display = FakeSendDisplay(send_duration=0.1)
+    clock = make_clock(display)
+    clock.display_next_frame(0.0, 0.0)
+    average_send_duration = clock.average_send_duration
+    n_send_durations = len(clock.send_durations)
+    display.skip = True  # Identical frames are skipped, last send duration is stale
+    for _ in range(0, 20):
+        clock.display_next_frame(0.0, 0.0)
+    display.skip = False
+    display.connected = False  # Frames are prepared but can not be sent
+    for _ in range(0, 20):
+        clock.display_next_frame(0.0, 0.0)
+    assert clock.average_send_duration == average_send_duration
+    assert len(clock.send_durations) == n_send_durations
+    assert len(clock.prepare_durations) == 21
+    stats = clock.get_stats()
+    assert stats['frames'] == 41
+    assert stats['send_time_mean'] == 0.1
+
+
+def test_display_reports_measured_sends():
+    push = BenchmarkPush()  # Sections only keep a weak reference to the push object
+    display = ConnectedFakeDisplay(push, FakeUSBEndpoint())
+    display.enable_skip_identical_frames()
+    frame = make_test_frame(FRAME_FORMAT_BGR565)
+    assert display.display_frame(frame)
+    assert display.n_measured_sends == 1
+    assert not display.display_frame(frame)
+    assert display.n_measured_sends == 1
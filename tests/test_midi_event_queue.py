@@ -0,0 +1,84 @@
+import mido
+import pytest
+from push2_python.benchmark import MIDIBenchmarkPush
+from push2_python.constants import MIDI_EVENT_QUEUE_COALESCE, ACTION_BUTTON_PRESSED, ACTION_BUTTON_RELEASED, \
+    ACTION_PAD_PRESSED, ACTION_PAD_RELEASED, ACTION_PAD_AFTERTOUCH, ACTION_ENCODER_ROTATED, ACTION_TOUCHSTRIP_TOUCHED
+
+
+@pytest.fixture
+def push():
+    push = MIDIBenchmarkPush()
+    push.triggered_actions = []
+    push.trigger_action = lambda *args: push.triggered_actions.append(args)
+    return push
+
+
+def handle_queued_messages(push, messages, max_size):
+    push.enable_midi_event_queue(max_size=max_size, overflow_policy=MIDI_EVENT_QUEUE_COALESCE, use_worker_thread=False)
+    try:
+        for message in messages:
+            push.dispatch_midi_message(message)
+        push.process_midi_events()
+        return push.get_midi_event_queue_stats()
+    finally:
+        push.disable_midi_event_queue()
+
+
+def get_generic_actions(push, action_names):
+    return [args for args in push.triggered_actions if args[0] in action_names]
+
+
+@pytest.mark.parametrize('max_size', [1, 2, 256])
+def test_button_taps_are_not_coalesced(push, max_size):
+    tap = [mido.Message('control_change', control=85, value=127), mido.Message('control_change', control=85, value=0)]
+    handle_queued_messages(push, tap, max_size)
+    if max_size == 1:
+        expected_actions = [(ACTION_BUTTON_RELEASED, 'Play')]  # Queue is full, oldest event is dropped
+    else:
+        expected_actions = [(ACTION_BUTTON_PRESSED, 'Play'), (ACTION_BUTTON_RELEASED, 'Play')]
+    assert get_generic_actions(push, [ACTION_BUTTON_PRESSED, ACTION_BUTTON_RELEASED]) == expected_actions
+
+
+def test_pad_press_release_press_is_not_coalesced(push):
+    messages = [mido.Message('note_on', note=36, velocity=100), mido.Message('note_off', note=36, velocity=0),
+                mido.Message('note_on', note=36, velocity=50)]
+    stats = handle_queued_messages(push, messages, 256)
+    assert get_generic_actions(push, [ACTION_PAD_PRESSED, ACTION_PAD_RELEASED]) == [
+        (ACTION_PAD_PRESSED, 36, (7, 0), 100), (ACTION_PAD_RELEASED, 36, (7, 0), 0),
+        (ACTION_PAD_PRESSED, 36, (7, 0), 50)]
+    assert stats['events_coalesced'] == 0
+
+
+def test_aftertouch_is_only_coalesced_when_queue_is_full(push):
+    messages = [mido.Message('polytouch', note=36, value=value) for value in [10, 20, 30, 40]]
+    handle_queued_messages(push, messages, 256)
+    assert [args[3] for args in get_generic_actions(push, [ACTION_PAD_AFTERTOUCH])] == [10, 20, 30, 40]
+    push.triggered_actions = []
+    stats = handle_queued_messages(push, messages, 2)
+    assert [args[3] for args in get_generic_actions(push, [ACTION_PAD_AFTERTOUCH])] == [10, 40]
+    assert stats['events_coalesced'] == 2
+
+
+def test_touchstrip_values_are_coalesced_when_queue_is_full(push):
+    messages = [mido.Message('note_on', note=36, velocity=100)] + \
+        [mido.Message('pitchwheel', pitch=pitch) for pitch in [-8192, -100, 0, 100, 8191]]
+    handle_queued_messages(push, messages, 2)
+    assert get_generic_actions(push, [ACTION_PAD_PRESSED, ACTION_TOUCHSTRIP_TOUCHED]) == [
+        (ACTION_PAD_PRESSED, 36, (7, 0), 100), (ACTION_TOUCHSTRIP_TOUCHED, 8191)]
+
+
+def test_encoder_increments_are_added_when_coalesced(push):
+    messages = [mido.Message('note_on', note=36, velocity=100)] + \
+        [mido.Message('control_change', control=71, value=value) for value in [1, 1, 3, 127, 2]]  # 127 is -1
+    stats = handle_queued_messages(push, messages, 2)
+    assert get_generic_actions(push, [ACTION_PAD_PRESSED, ACTION_ENCODER_ROTATED]) == [
+        (ACTION_PAD_PRESSED, 36, (7, 0), 100), (ACTION_ENCODER_ROTATED, 'Track1 Encoder', 6)]
+    assert stats['events_coalesced'] == 4
+    assert stats['events_dropped'] == 0
+
+
+def test_encoder_increments_are_not_coalesced_beyond_cc_range(push):
+    messages = [mido.Message('control_change', control=71, value=value) for value in [60, 60, 65]]  # 65 is -63
+    stats = handle_queued_messages(push, messages, 1)
+    assert [args[2] for args in get_generic_actions(push, [ACTION_ENCODER_ROTATED])] == [-3]
+    assert stats['events_dropped'] == 1
@@ -0,0 +1,24 @@
+import pytest
+from push2_python.benchmark import MIDIBenchmarkPush, make_test_midi_messages
+
+
+@pytest.fixture
+def push():
+    push = MIDIBenchmarkPush()
+    push.triggered_actions = []
+    push.trigger_action = lambda *args: push.triggered_actions.append(args)
+    return push
+
+
+def test_section_handlers_trigger_the_same_actions_as_the_routing_table(push):
+    messages = make_test_midi_messages(n_messages=2000)
+    for message in messages:
+        for section in [push.pads, push.buttons, push.encoders, push.touchstrip]:
+            if section.on_midi_message(message):
+                break
+    section_actions = push.triggered_actions
+    push.triggered_actions = []
+    for message in messages:
+        push.dispatch_midi_message(message)
+    assert section_actions == push.triggered_actions
+    assert len(section_actions) > 0
@@ -0,0 +1,19 @@
+import numpy
+import pytest
+from PIL import ImageFont
+from push2_python.text import TextRenderer, bgr565_color
+
+
+def test_default_font_is_drawn_with_the_given_size():
+    small_text_renderer = TextRenderer(font_size=10)
+    text_renderer = TextRenderer(font_size=20)
+    assert text_renderer.line_height > small_text_renderer.line_height
+    frame = numpy.zeros((160, 960), dtype=numpy.uint16)
+    text_renderer.draw_text(frame, 10, 10, 'Volume: 64', color=bgr565_color(255, 255, 255))
+    assert frame.any() and not frame[0:10].any()
+
+
+def test_default_font_needs_sized_default_font_support(monkeypatch):
+    monkeypatch.setattr(ImageFont, 'load_default', lambda: None)  # As in pillow < 10.1
+    with pytest.raises(ValueError):
+        TextRenderer(font_size=20)